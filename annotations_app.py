@@ -3,11 +3,25 @@ from flask import Flask
 from app.api.blueprints.annotation import annotation_blueprint
 from app.api.blueprints.comment import comment_blueprint
 from app.api.blueprints.image import image_blueprint
+from app.api.blueprints.media import media_blueprint
+from app.api.blueprints.upload import upload_blueprint
 from app.api.blueprints.user import user_blueprint
+from app.commands.annotation import annotation_cli
+from app.commands.comment import comment_cli
+from app.commands.image_summary import image_summary_cli
+from app.commands.storage import storage_cli
 from app.config import Config
 from app.services.annotation_service import AnnotationService
+from app.services.annotation_worker_service import AnnotationWorkerService
+from app.services.bulk_upload_service import BulkUploadService
 from app.services.core_services import init_core_services
+from app.services.image_service import ImageService
+from app.services.image_summary_cache_service import ImageSummaryCacheService
 from app.services.image_summary_service import ImageSummaryService
+from app.services.nlp_process_pool import NlpProcessPool
+from app.services.signed_url_service import SignedUrlService
+from app.services.summary_worker_service import SummaryWorkerService
+from app.services.upload_service import UploadService
 from app.utils.auth import AuthUtils
 from app.utils.password import PasswordUtils
 
@@ -15,8 +29,16 @@ from app.utils.password import PasswordUtils
 def init_app(app: Flask) -> Flask:
     app.config.from_object(Config)
     init_core_services(app)
+    ImageService.initialize(app)
     ImageSummaryService.initialize(app)
+    NlpProcessPool.initialize(app)
+    SummaryWorkerService.initialize(app)
+    ImageSummaryCacheService.initialize(app)
     AnnotationService.initialize(app)
+    AnnotationWorkerService.initialize(app)
+    UploadService.initialize(app)
+    BulkUploadService.initialize(app)
+    SignedUrlService.initialize(app)
     PasswordUtils.initialize(app)
     AuthUtils.initialize(app)
     return app
@@ -28,6 +50,8 @@ def register_blueprints(app: Flask) -> Flask:
         annotation_blueprint,
         comment_blueprint,
         image_blueprint,
+        media_blueprint,
+        upload_blueprint,
     ]
     for bp in blueprints:
         app.register_blueprint(bp)
@@ -35,11 +59,25 @@ def register_blueprints(app: Flask) -> Flask:
     return app
 
 
+def register_commands(app: Flask) -> Flask:
+    commands = [
+        annotation_cli,
+        comment_cli,
+        image_summary_cli,
+        storage_cli,
+    ]
+    for command in commands:
+        app.cli.add_command(command)
+
+    return app
+
+
 def create_app() -> Flask:
     app = Flask(__name__)
 
     init_app(app)
     register_blueprints(app)
+    register_commands(app)
 
     return app
 
@@ -124,8 +124,15 @@ def create_comment(requesting_user: User):
         return jsonify({"error": "Unauthorized"}), 401
 
     body = data.get("body")
-    new_comment = CommentRepo.create(body=body, user_id=user_id, image_id=image_id)
-    ImageSummaryService.update_image_summary(image_id)
+    new_comment = CommentRepo.create(
+        body=body,
+        user_id=user_id,
+        image_id=image_id,
+        sentiment_score=ImageSummaryService.try_score_comment(body),
+    )
+    ImageSummaryService.record_comment_created(
+        new_comment.image_id, new_comment.user_id, new_comment.body
+    )
 
     return jsonify(comment_schema.dump(new_comment)), 201
 
@@ -258,8 +265,13 @@ def update_comment(comment_id, requesting_user: User):
     ):
         return jsonify({"error": "Unauthorized"}), 401
 
-    updated_comment = CommentRepo.update(comment_id, body)
-    ImageSummaryService.update_image_summary(comment.image_id)
+    previous_body = comment.body
+    updated_comment = CommentRepo.update(
+        comment_id, body, sentiment_score=ImageSummaryService.try_score_comment(body)
+    )
+    ImageSummaryService.record_comment_updated(
+        updated_comment.image_id, previous_body, updated_comment.body
+    )
     return jsonify(comment_schema.dump(updated_comment)), 200
 
 
@@ -297,10 +309,10 @@ def delete_comment(comment_id, requesting_user: User):
     ):
         return jsonify({"error": "Unauthorized"}), 401
 
-    image_id = comment.image_id
+    image_id, user_id, body = comment.image_id, comment.user_id, comment.body
     success = CommentRepo.delete(comment_id)
     if success:
-        ImageSummaryService.update_image_summary(image_id)
+        ImageSummaryService.record_comment_deleted(image_id, user_id, body)
         return "", 204
     else:
         return jsonify({"message": "Comment not found"}), 404
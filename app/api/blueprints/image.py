@@ -1,19 +1,31 @@
+import io
+import mimetypes
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from uuid import UUID
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, make_response, request, send_file
 from flask_jwt_extended import jwt_required
 from marshmallow.exceptions import ValidationError
+from PIL import Image as PilImage
+from PIL import UnidentifiedImageError
 
 from app.api.serializers.comment import CommentSchema
 from app.api.serializers.image import ImageSchema, ViewImageSchema
 from app.api.serializers.image_summary import ImageSummarySchema
+from app.api.serializers.signed_url import SignedUrlSchema, SignedUrlsRequestSchema
 from app.config import Config
-from app.handlers.image import trigger_simulate_image_annotation
 from app.models.user import User
 from app.repos.annotation import AnnotationRepo
 from app.repos.image import ImageRepo
 from app.repos.user import UserRepo
+from app.services.comment_summarizer import CommentSummarizer
+from app.services.derivative_service import DERIVATIVE_FORMATS, DerivativeService
 from app.services.image_service import ImageService
+from app.services.image_summary_cache_service import ImageSummaryCacheService
+from app.services.signed_url_service import SignedUrlService
+from app.services.summary_worker_service import SummaryWorkerService
+from app.services.tile_service import TileService
 from app.utils.auth import AuthUtils
 
 image_blueprint = Blueprint("image", __name__)
@@ -21,6 +33,21 @@ image_schema = ImageSchema()
 view_image_schema = ViewImageSchema()
 comment_schema = CommentSchema()
 image_summary_schema = ImageSummarySchema()
+signed_url_schema = SignedUrlSchema()
+signed_urls_request_schema = SignedUrlsRequestSchema()
+
+# Errors of rendering from an image file; anything else is left to the
+# error handlers
+RENDERING_ERRORS = (FutureTimeoutError, PilImage.DecompressionBombError, OSError)
+
+
+def rendering_failed(error: Exception, target: str):
+    """Get the response to a RENDERING_ERRORS error, without its details."""
+    if isinstance(error, FutureTimeoutError):
+        return jsonify({"message": f"Rendering the {target} timed out"}), 503
+    if isinstance(error, (UnidentifiedImageError, PilImage.DecompressionBombError)):
+        return jsonify({"message": "The image file cannot be decoded"}), 422
+    return jsonify({"message": f"Failed to render {target}"}), 503
 
 
 @image_blueprint.route("/image/upload", methods=["POST"])
@@ -74,6 +101,8 @@ def upload_image(requesting_user: User):
     try:
         ImageService.save_image(uploaded_file, requesting_user, new_image.filename)
     except Exception as e:
+        # Otherwise the image would stay Queued without an annotation job
+        ImageService.delete_image(new_image.id)
         return jsonify({"message": f"Failed to save image: {str(e)}"}), 500
 
     return jsonify(view_image_schema.dump(new_image)), 201
@@ -109,6 +138,12 @@ def get_all_allowed_images(requesting_user: User):
     Get all images allowed for the requesting user.
 
     ---
+    parameters:
+      - name: signed_urls
+        in: query
+        required: false
+        type: boolean
+        description: Add a signed, expiring content_url to every image
     responses:
       200:
         description: List of all images allowed for the requesting user
@@ -120,7 +155,11 @@ def get_all_allowed_images(requesting_user: User):
                 $ref: '#/components/schemas/ViewImageSchema'
     """
     images = ImageRepo.get_all_allowed(requesting_user_id=requesting_user.id)
-    return jsonify(view_image_schema.dump(images, many=True)), 200
+    images_data = view_image_schema.dump(images, many=True)
+    if request.args.get("signed_urls", "").lower() == "true":
+        for image_data, image in zip(images_data, images):
+            image_data["content_url"] = SignedUrlService.mint(image).url
+    return jsonify(images_data), 200
 
 
 @image_blueprint.route("/image/<uuid:image_id>", methods=["GET"])
@@ -153,14 +192,365 @@ def get_image(image_id, requesting_user: User):
         image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
     )
     if image:
-        trigger_simulate_image_annotation(
-            [UUID(str(image.id))], UUID(str(requesting_user.id))
-        )
         return jsonify(view_image_schema.dump(image)), 200
     else:
         return jsonify({"message": "Image not found"}), 404
 
 
+@image_blueprint.route("/image/<uuid:image_id>/content", methods=["GET"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_image_content(image_id, requesting_user: User):
+    """
+    Download the image file.
+
+    Supports Range requests and conditional requests with If-None-Match and
+    If-Modified-Since; the ETag is the SHA-256 of the image content.
+
+    ---
+    parameters:
+      - name: image_id
+        in: path
+        description: ID of the image to download
+        required: true
+        schema:
+          type: string
+          format: uuid
+    responses:
+      200:
+        description: The image file
+      206:
+        description: The requested byte range of the image file
+      304:
+        description: The image has not changed
+      404:
+        description: Image not found
+      416:
+        description: The requested range is not satisfiable
+    """
+    image = ImageRepo.get_by_id(
+        image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
+    )
+    if not image:
+        return jsonify({"message": "Image not found"}), 404
+
+    source = ImageService.get_image_source(image)
+    if source is None:
+        return jsonify({"message": "Image file not found"}), 404
+
+    # send_file streams files through wsgi.file_wrapper (sendfile) when the
+    # server provides it and answers Range and conditional requests itself.
+    response = send_file(
+        io.BytesIO(source) if isinstance(source, bytes) else source,
+        mimetype=mimetypes.guess_type(image.filename)[0] or "application/octet-stream",
+        conditional=True,
+        etag=image.blob_sha256 or True,
+    )
+    if not image.is_public:
+        response.cache_control.private = True
+    return response
+
+
+@image_blueprint.route("/image/<uuid:image_id>/thumbnail", methods=["GET"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_image_thumbnail(image_id, requesting_user: User):
+    """
+    Download a resized copy of the image.
+
+    Missing thumbnails are rendered on demand. Without a format, WebP is
+    returned to clients that accept it.
+
+    ---
+    parameters:
+      - name: image_id
+        in: path
+        description: ID of the image
+        required: true
+        schema:
+          type: string
+          format: uuid
+      - name: size
+        in: query
+        description: Size of the box the thumbnail fits in, one of DERIVATIVE_SIZES
+        required: false
+        type: integer
+      - name: format
+        in: query
+        description: One of DERIVATIVE_FORMATS
+        required: false
+        type: string
+    responses:
+      200:
+        description: The thumbnail
+      304:
+        description: The thumbnail has not changed
+      400:
+        description: Unsupported size or format
+      404:
+        description: Image not found
+      422:
+        description: The image file cannot be decoded
+      503:
+        description: The thumbnail could not be rendered in time
+    """
+    size = request.args.get("size", DerivativeService.sizes[0], type=int)
+    if size not in DerivativeService.sizes:
+        return (
+            jsonify({"message": f"Size must be one of {DerivativeService.sizes}"}),
+            400,
+        )
+    format_name = request.args.get("format")
+    if format_name is None:
+        accepts_webp = "image/webp" in request.accept_mimetypes.values()
+        format_name = next(
+            (
+                name
+                for name in DerivativeService.formats
+                if name != "webp" or accepts_webp
+            ),
+            DerivativeService.formats[0],
+        )
+    if format_name not in DerivativeService.formats:
+        return (
+            jsonify({"message": f"Format must be one of {DerivativeService.formats}"}),
+            400,
+        )
+
+    image = ImageRepo.get_by_id(
+        image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
+    )
+    if not image:
+        return jsonify({"message": "Image not found"}), 404
+
+    source = ImageService.get_image_source(image)
+    if source is None:
+        return jsonify({"message": "Image file not found"}), 404
+
+    try:
+        thumbnail_path = DerivativeService.get_derivative(
+            image, source, size, format_name
+        )
+    except RENDERING_ERRORS as e:
+        return rendering_failed(e, "thumbnail")
+    if not os.path.isfile(thumbnail_path):
+        return jsonify({"message": "Failed to render thumbnail"}), 503
+
+    response = send_file(
+        thumbnail_path,
+        mimetype=DERIVATIVE_FORMATS[format_name].mimetype,
+        conditional=True,
+        etag=f"{image.blob_sha256}-{size}.{format_name}" if image.blob_sha256 else True,
+    )
+    response.vary.add("Accept")
+    if not image.is_public:
+        response.cache_control.private = True
+    return response
+
+
+@image_blueprint.route("/image/<uuid:image_id>/tiles.dzi", methods=["GET"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_image_tiles_descriptor(image_id, requesting_user: User):
+    """
+    Get the Deep Zoom (DZI) descriptor of the image's tile pyramid.
+
+    Tiles are served from /image/<image_id>/tiles/<level>/<x>/<y>.
+
+    ---
+    parameters:
+      - name: image_id
+        in: path
+        description: ID of the image
+        required: true
+        schema:
+          type: string
+          format: uuid
+    responses:
+      200:
+        description: The DZI XML descriptor
+      404:
+        description: Image not found
+      422:
+        description: The image file cannot be decoded
+      503:
+        description: The tile pyramid could not be created
+    """
+    image = ImageRepo.get_by_id(
+        image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
+    )
+    if not image:
+        return jsonify({"message": "Image not found"}), 404
+
+    source = ImageService.get_image_source(image)
+    if source is None:
+        return jsonify({"message": "Image file not found"}), 404
+
+    try:
+        pyramid = TileService.get_pyramid(image, source)
+    except RENDERING_ERRORS as e:
+        return rendering_failed(e, "tile pyramid")
+    response = make_response(pyramid.get_descriptor())
+    response.mimetype = "application/xml"
+    if not image.is_public:
+        response.cache_control.private = True
+    return response
+
+
+@image_blueprint.route(
+    "/image/<uuid:image_id>/tiles/<int:level>/<int:x>/<int:y>", methods=["GET"]
+)
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_image_tile(image_id, level, x, y, requesting_user: User):
+    """
+    Download a tile of the image's Deep Zoom pyramid.
+
+    Missing tiles are rendered on demand. Tiles never change for the same
+    image content and are cached for a year.
+
+    ---
+    parameters:
+      - name: image_id
+        in: path
+        description: ID of the image
+        required: true
+        schema:
+          type: string
+          format: uuid
+      - name: level
+        in: path
+        description: Pyramid level, from 0 (1x1 pixel) to full size
+        required: true
+        type: integer
+      - name: x
+        in: path
+        description: Tile column
+        required: true
+        type: integer
+      - name: y
+        in: path
+        description: Tile row
+        required: true
+        type: integer
+    responses:
+      200:
+        description: The tile
+      304:
+        description: The tile has not changed
+      404:
+        description: Image or tile not found
+      422:
+        description: The image file cannot be decoded
+      503:
+        description: The tile could not be rendered in time
+    """
+    image = ImageRepo.get_by_id(
+        image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
+    )
+    if not image:
+        return jsonify({"message": "Image not found"}), 404
+
+    source = ImageService.get_image_source(image)
+    if source is None:
+        return jsonify({"message": "Image file not found"}), 404
+
+    try:
+        pyramid = TileService.get_pyramid(image, source)
+        tile = TileService.get_tile(pyramid, level, x, y)
+    except RENDERING_ERRORS as e:
+        return rendering_failed(e, "tile")
+    if tile is None:
+        return jsonify({"message": "Tile not found"}), 404
+
+    response = make_response(tile)
+    response.mimetype = DERIVATIVE_FORMATS[pyramid.settings.format_name].mimetype
+    if image.blob_sha256:
+        response.set_etag(f"{image.blob_sha256}-{level}-{x}-{y}")
+        response.cache_control.max_age = 365 * 24 * 60 * 60
+        response.cache_control.immutable = True
+    if not image.is_public:
+        response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+@image_blueprint.route("/image/<uuid:image_id>/signed-url", methods=["GET"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_image_signed_url(image_id, requesting_user: User):
+    """
+    Get a signed, expiring URL the image file can be downloaded from.
+
+    ---
+    parameters:
+      - name: image_id
+        in: path
+        description: ID of the image
+        required: true
+        schema:
+          type: string
+          format: uuid
+    responses:
+      200:
+        description: Signed URL and its expiry as a Unix timestamp
+        content:
+          application/json:
+            schema:
+              $ref: '#/components/schemas/SignedUrlSchema'
+      404:
+        description: Image not found
+    """
+    image = ImageRepo.get_by_id(
+        image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
+    )
+    if not image:
+        return jsonify({"message": "Image not found"}), 404
+    return jsonify(signed_url_schema.dump(SignedUrlService.mint(image))), 200
+
+
+@image_blueprint.route("/image/signed-urls", methods=["POST"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_image_signed_urls(requesting_user: User):
+    """
+    Get signed, expiring URLs for several images with a single lookup.
+
+    Images that do not exist or are not visible to the user are left out.
+
+    ---
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          $ref: '#/components/schemas/SignedUrlsRequestSchema'
+    responses:
+      200:
+        description: Signed URLs by image ID
+        content:
+          application/json:
+            schema:
+              type: object
+              additionalProperties:
+                $ref: '#/components/schemas/SignedUrlSchema'
+      400:
+        description: Bad request - Validation error
+    """
+    try:
+        request_data: dict = signed_urls_request_schema.load(request.json or {})
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    images = ImageRepo.get_allowed_by_ids(
+        request_data["image_ids"], requesting_user_id=UUID(str(requesting_user.id))
+    )
+    signed_urls = {
+        str(image.id): signed_url_schema.dump(SignedUrlService.mint(image))
+        for image in images
+    }
+    return jsonify(signed_urls), 200
+
+
 @image_blueprint.route("/image/user/<uuid:user_id>", methods=["GET"])
 @jwt_required()
 @AuthUtils.inject_requesting_user
@@ -264,21 +654,96 @@ def get_image_summary(image_id, requesting_user: User):
       404:
         description: Image summary not found
     """
-    image = ImageRepo.get_by_id(
-        image_id=image_id, requesting_user_id=UUID(str(requesting_user.id))
-    )
-    if not image:
+    # Served from the summary cache even when stale; a stale entry is
+    # refreshed in the background and flagged with is_stale.
+    cache_entry = ImageSummaryCacheService.get(image_id)
+    cached_summary = cache_entry.value if cache_entry else None
+    requesting_user_id = UUID(str(requesting_user.id))
+    if not cached_summary or not (
+        cached_summary.is_public or cached_summary.owner_id == requesting_user_id
+    ):
         return jsonify({"message": "Image not found"}), 404
 
-    image_summary = ImageRepo.get_image_summary(
-        image_id, requesting_user_id=UUID(str(requesting_user.id))
-    )
-    if image_summary and (UUID(str(image.user_id)) == UUID(str(requesting_user.id))):
-        return jsonify(image_summary_schema.dump(image_summary)), 200
+    if cached_summary.payload and cached_summary.owner_id == requesting_user_id:
+        response = {
+            **cached_summary.payload,
+            "cache_age_seconds": round(cache_entry.age_seconds, 3),
+            "is_stale": cache_entry.is_stale,
+        }
+        return jsonify(response), 200
     else:
         return jsonify({"message": "Image summary not found"}), 404
 
 
+@image_blueprint.route("/image/summaries/stats", methods=["GET"])
+@jwt_required()
+@AuthUtils.admin_required
+def get_summary_worker_stats():
+    """
+    Get statistics of the background image summary worker and summary cache.
+
+    ---
+    responses:
+      200:
+        description: Summary worker queue depth, counters and cache hit rate
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                enabled:
+                  type: boolean
+                queue_depth:
+                  type: integer
+                in_flight:
+                  type: integer
+                submitted:
+                  type: integer
+                coalesced:
+                  type: integer
+                completed:
+                  type: integer
+                failed:
+                  type: integer
+                summary_cache:
+                  type: object
+                  properties:
+                    size:
+                      type: integer
+                    max_size:
+                      type: integer
+                    hits:
+                      type: integer
+                    misses:
+                      type: integer
+                    hit_rate:
+                      type: number
+                summary_read_cache:
+                  type: object
+                  properties:
+                    size:
+                      type: integer
+                    max_size:
+                      type: integer
+                    hits:
+                      type: integer
+                    stale_hits:
+                      type: integer
+                    misses:
+                      type: integer
+                    refreshes:
+                      type: integer
+                    refreshing:
+                      type: integer
+    """
+    stats = {
+        **SummaryWorkerService.stats(),
+        "summary_cache": CommentSummarizer.cache_stats(),
+        "summary_read_cache": ImageSummaryCacheService.stats(),
+    }
+    return jsonify(stats), 200
+
+
 @image_blueprint.route("/image", methods=["POST"])
 @jwt_required()
 @AuthUtils.inject_requesting_user
@@ -397,13 +862,9 @@ def update_image(image_id, requesting_user: User):
     image_data["annotations"] = annotations
 
     updated_image = ImageRepo.update(image_id, **image_data)
+    ImageSummaryCacheService.invalidate(image_id)
 
     if updated_image:
-        # Trigger image annotation
-        trigger_simulate_image_annotation(
-            [UUID(str(updated_image.id))], UUID(str(requesting_user.id))
-        )
-
         return jsonify(view_image_schema.dump(updated_image)), 200
     else:
         return jsonify({"message": "Image not found"}), 404
@@ -447,8 +908,9 @@ def delete_image(image_id, requesting_user: User):
     ):
         return jsonify({"error": "Unauthorized"}), 401
 
-    success = ImageRepo.delete(image_id)
+    success = ImageService.delete_image(image_id)
     if success:
+        ImageSummaryCacheService.invalidate(image_id)
         return "", 204
     else:
         return jsonify({"message": "Image not found"}), 404
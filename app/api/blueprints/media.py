@@ -0,0 +1,71 @@
+import mimetypes
+import os
+import time
+
+from flask import Blueprint, current_app, jsonify, request, send_file
+
+from app.repos.image import ImageRepo
+from app.services.blob_store import BlobStore
+from app.services.image_service import ImageService
+from app.services.signed_url_service import SignedUrlService
+from app.services.storage_layout import StorageLayout
+
+media_blueprint = Blueprint("media", __name__)
+
+
+@media_blueprint.route("/media/<uuid:user_id>/<string:filename>", methods=["GET"])
+def get_media(user_id, filename):
+    """
+    Hand a signed image URL over to the front proxy.
+
+    The bytes are not sent by the application: a valid request is answered
+    with an X-Accel-Redirect (or X-Sendfile) header naming the file. Images
+    without a linked file, packed ones or ones of a remote storage backend,
+    are sent directly.
+
+    ---
+    parameters:
+      - name: expires
+        in: query
+        required: true
+        type: integer
+      - name: signature
+        in: query
+        required: true
+        type: string
+    responses:
+      200:
+        description: Empty response with the front proxy redirect header, or
+          the image content
+      403:
+        description: Invalid or expired signature, or the image was deleted,
+          renamed or replaced since the URL was minted
+    """
+    expires = request.args.get("expires")
+    image = ImageRepo.get_by_filename(user_id, filename)
+    if image is None or not SignedUrlService.verify(
+        image, expires, request.args.get("signature")
+    ):
+        return jsonify({"message": "Invalid or expired signature"}), 403
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    relative_path = StorageLayout.resolve_relative_path(user_id, filename)
+    source = None
+    # Files of a remote storage backend may be stale links, see ImageService
+    if not BlobStore.is_local() or not os.path.isfile(
+        os.path.join(current_app.config["UPLOAD_FOLDER"], relative_path)
+    ):
+        source = ImageService.get_image_source(image)
+
+    if isinstance(source, bytes):
+        response = current_app.response_class(source, mimetype=mimetype)
+    elif source is not None:
+        response = send_file(source, mimetype=mimetype)
+    else:
+        response = current_app.response_class(
+            headers=SignedUrlService.get_redirect_header(relative_path),
+            mimetype=mimetype,
+        )
+    response.cache_control.private = True
+    response.cache_control.max_age = max(int(expires) - int(time.time()), 0)
+    return response
@@ -0,0 +1,351 @@
+from uuid import UUID
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+from marshmallow.exceptions import ValidationError
+from werkzeug.http import parse_content_range_header
+
+from app.api.serializers.bulk_upload import BulkUploadResultSchema, BulkUploadSchema
+from app.api.serializers.image import ViewImageSchema
+from app.api.serializers.upload_session import UploadSessionSchema
+from app.errors import (
+    InvalidUploadChunk,
+    TooManyUploadSessions,
+    UploadIncomplete,
+    UploadQuotaExceeded,
+    UploadSessionNotFound,
+)
+from app.models.upload_session import UploadSession
+from app.models.user import User
+from app.repos.upload_session import UploadSessionRepo
+from app.services.archive_stream import ArchiveEntry, iter_tar_entries, iter_zip_entries
+from app.services.bulk_upload_service import BulkUploadService
+from app.services.upload_service import UploadService
+from app.utils.auth import AuthUtils
+
+upload_blueprint = Blueprint("upload", __name__)
+upload_session_schema = UploadSessionSchema()
+view_image_schema = ViewImageSchema()
+bulk_upload_schema = BulkUploadSchema()
+bulk_upload_result_schema = BulkUploadResultSchema()
+
+
+def dump_upload_session(upload_session: UploadSession) -> dict:
+    progress = UploadService.get_progress(upload_session)
+    return {**upload_session_schema.dump(upload_session), **progress._asdict()}
+
+
+@upload_blueprint.route("/image/uploads", methods=["POST"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def create_upload_session(requesting_user: User):
+    """
+    Start a resumable image upload.
+
+    ---
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          $ref: '#/components/schemas/UploadSessionSchema'
+    responses:
+      201:
+        description: Upload session created, send the image with PUT requests
+        content:
+          application/json:
+            schema:
+              $ref: '#/components/schemas/UploadSessionSchema'
+      400:
+        description: Bad request - Validation error
+      413:
+        description: The image is larger than the upload size limit, or than
+          the bytes left for the user's open uploads
+      429:
+        description: The user has too many open uploads
+    """
+    try:
+        upload_data: dict = upload_session_schema.load(request.json or {})
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    if upload_data["total_size"] > current_app.config["UPLOAD_MAX_BYTES"]:
+        return jsonify({"message": "Image is too large"}), 413
+
+    try:
+        upload_session = UploadService.create_session(
+            user_id=UUID(str(requesting_user.id)), **upload_data
+        )
+    except TooManyUploadSessions as e:
+        return jsonify({"message": str(e)}), 429
+    except UploadQuotaExceeded as e:
+        return jsonify({"message": str(e)}), 413
+    return jsonify(dump_upload_session(upload_session)), 201
+
+
+@upload_blueprint.route("/image/uploads/<uuid:session_id>", methods=["GET"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def get_upload_session(session_id, requesting_user: User):
+    """
+    Get the progress of an upload, including the offset to resume from.
+
+    ---
+    parameters:
+      - name: session_id
+        in: path
+        required: true
+        schema:
+          type: string
+          format: uuid
+    responses:
+      200:
+        description: Upload session and received byte ranges
+        content:
+          application/json:
+            schema:
+              $ref: '#/components/schemas/UploadSessionSchema'
+      404:
+        description: Upload session not found or expired
+    """
+    upload_session = UploadSessionRepo.get_by_id(session_id, requesting_user.id)
+    if not upload_session:
+        return jsonify({"message": "Upload session not found"}), 404
+    return jsonify(dump_upload_session(upload_session)), 200
+
+
+@upload_blueprint.route("/image/uploads/<uuid:session_id>", methods=["PUT"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def upload_chunk(session_id, requesting_user: User):
+    """
+    Upload a chunk of the image.
+
+    The raw chunk bytes are the request body and the ``Content-Range`` header
+    (``bytes <start>-<end>/<total>``) gives their position. Chunks may be sent
+    in any order and in parallel; a chunk cut short by a dropped connection is
+    resumed from the offset returned by the GET endpoint.
+
+    ---
+    parameters:
+      - name: session_id
+        in: path
+        required: true
+        schema:
+          type: string
+          format: uuid
+      - name: Content-Range
+        in: header
+        required: true
+        type: string
+    responses:
+      200:
+        description: Chunk stored
+        content:
+          application/json:
+            schema:
+              $ref: '#/components/schemas/UploadSessionSchema'
+      400:
+        description: Missing or invalid Content-Range, or an incomplete chunk
+      404:
+        description: Upload session not found or expired
+    """
+    upload_session = UploadSessionRepo.get_by_id(session_id, requesting_user.id)
+    if not upload_session:
+        return jsonify({"message": "Upload session not found"}), 404
+
+    content_range = parse_content_range_header(request.headers.get("Content-Range"))
+    if content_range is None or content_range.start is None:
+        return jsonify({"message": "A valid Content-Range header is required"}), 400
+    if content_range.length not in (None, upload_session.total_size):
+        return jsonify({"message": "Content-Range total does not match upload"}), 400
+
+    length = content_range.stop - content_range.start
+    try:
+        written = UploadService.write_chunk(
+            upload_session, content_range.start, length, request.stream
+        )
+    except InvalidUploadChunk as e:
+        return jsonify({"message": str(e)}), 400
+
+    if written < length:
+        return (
+            jsonify(
+                {
+                    "message": f"Incomplete chunk, received {written} of {length} bytes",
+                    **dump_upload_session(upload_session),
+                }
+            ),
+            400,
+        )
+    return jsonify(dump_upload_session(upload_session)), 200
+
+
+@upload_blueprint.route("/image/uploads/<uuid:session_id>/complete", methods=["POST"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def complete_upload(session_id, requesting_user: User):
+    """
+    Finish an upload and create its image.
+
+    ---
+    parameters:
+      - name: session_id
+        in: path
+        required: true
+        schema:
+          type: string
+          format: uuid
+    responses:
+      201:
+        description: Image created from the uploaded file
+        content:
+          application/json:
+            schema:
+              $ref: '#/components/schemas/ViewImageSchema'
+      404:
+        description: Upload session not found, expired or already being completed
+      409:
+        description: Parts of the image have not been uploaded yet
+      500:
+        description: Internal Server Error - Failed to save the image
+    """
+    upload_session = UploadSessionRepo.get_by_id(session_id, requesting_user.id)
+    if not upload_session:
+        return jsonify({"message": "Upload session not found"}), 404
+
+    try:
+        image = UploadService.complete(upload_session)
+    except UploadSessionNotFound:
+        return jsonify({"message": "Upload session not found"}), 404
+    except UploadIncomplete as e:
+        return jsonify({"message": str(e), **dump_upload_session(upload_session)}), 409
+    except OSError as e:
+        return jsonify({"message": f"Failed to save image: {str(e)}"}), 500
+
+    return jsonify(view_image_schema.dump(image)), 201
+
+
+@upload_blueprint.route("/image/uploads/<uuid:session_id>", methods=["DELETE"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def abort_upload(session_id, requesting_user: User):
+    """
+    Abort an upload and discard what was received.
+
+    ---
+    parameters:
+      - name: session_id
+        in: path
+        required: true
+        schema:
+          type: string
+          format: uuid
+    responses:
+      204:
+        description: Upload aborted
+      404:
+        description: Upload session not found or expired
+    """
+    upload_session = UploadSessionRepo.get_by_id(session_id, requesting_user.id)
+    if not upload_session:
+        return jsonify({"message": "Upload session not found"}), 404
+
+    UploadService.abort(upload_session)
+    return "", 204
+
+
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+TAR_CONTENT_TYPES = {
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-gtar",
+    "application/x-bzip2",
+    "application/x-xz",
+}
+
+
+@upload_blueprint.route("/image/upload/bulk", methods=["POST"])
+@jwt_required()
+@AuthUtils.inject_requesting_user
+def bulk_upload_images(requesting_user: User):
+    """
+    Upload many images at once.
+
+    The images are sent either as ``multipart/form-data`` with one ``files``
+    field per image, or as a zip or tar archive (plain, gzip, bzip2 or xz)
+    streamed as the request body with its archive content type. The archive
+    is read in a single pass as it arrives; directories in it are ignored
+    and images are named after their file names.
+
+    ---
+    parameters:
+      - name: files
+        in: formData
+        type: file
+        required: false
+        description: The image files, for multipart requests
+      - name: is_public
+        in: query
+        type: boolean
+        required: false
+        description: Visibility of the images, a form field in multipart requests
+    responses:
+      201:
+        description: Images uploaded, with a result for every file
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                created:
+                  type: integer
+                failed:
+                  type: integer
+                error:
+                  type: string
+                results:
+                  type: array
+                  items:
+                    $ref: '#/components/schemas/BulkUploadResultSchema'
+      400:
+        description: No image could be uploaded, or the archive is invalid
+      415:
+        description: Unsupported content type
+    """
+    block_size = current_app.config["UPLOAD_BLOCK_SIZE"]
+    if request.mimetype == "multipart/form-data":
+        options = request.form
+        entries = [
+            ArchiveEntry(
+                uploaded_file.filename or "",
+                iter(lambda stream=uploaded_file.stream: stream.read(block_size), b""),
+            )
+            for uploaded_file in request.files.getlist("files")
+        ]
+    elif request.mimetype in ZIP_CONTENT_TYPES:
+        options = request.args
+        entries = iter_zip_entries(request.stream, block_size)
+    elif request.mimetype in TAR_CONTENT_TYPES:
+        options = request.args
+        entries = iter_tar_entries(request.stream, block_size)
+    else:
+        return jsonify({"message": "Send multipart/form-data, zip or tar"}), 415
+
+    try:
+        bulk_upload_data: dict = bulk_upload_schema.load(options.to_dict(flat=True))
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    report = BulkUploadService.upload(
+        UUID(str(requesting_user.id)), entries, **bulk_upload_data
+    )
+    created = sum(1 for result in report.results if result.error is None)
+    response = {
+        "created": created,
+        "failed": len(report.results) - created,
+        "error": report.error,
+        "results": bulk_upload_result_schema.dump(report.results, many=True),
+    }
+    return jsonify(response), 201 if created else 400
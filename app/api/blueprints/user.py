@@ -5,6 +5,7 @@ from marshmallow import ValidationError
 from app.api.serializers.user import UserLoginSchema, UserSchema
 from app.config import Config
 from app.repos.user import UserRepo
+from app.services.image_service import ImageService
 from app.utils.auth import AuthUtils
 
 user_blueprint = Blueprint("user", __name__)
@@ -304,6 +305,8 @@ def delete_user(user_id):
     user = UserRepo.get_by_id(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
+    # Releases the blobs of the images, which the user's cascade would not
+    ImageService.delete_user_images(user.id)
     if UserRepo.delete(user_id=user_id):
         return "", 204
     else:
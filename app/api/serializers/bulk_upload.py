@@ -0,0 +1,12 @@
+from marshmallow import Schema, fields
+
+
+class BulkUploadSchema(Schema):
+    is_public = fields.Boolean(load_default=False)
+
+
+class BulkUploadResultSchema(Schema):
+    name = fields.Str()
+    image_id = fields.UUID(allow_none=True)
+    filename = fields.Str(allow_none=True)
+    error = fields.Str(allow_none=True)
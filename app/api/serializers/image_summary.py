@@ -6,6 +6,10 @@ class ImageSummarySchema(Schema):
     image_id = fields.Integer(dump_only=True)
     comment_count = fields.Integer(dump_only=True)
     comment_summary = fields.Str(dump_only=True)
+    summary_strategy = fields.Str(dump_only=True)
     average_comment_length = fields.Integer(dump_only=True)
     users_commented_count = fields.Integer(dump_only=True)
     sentiment_score = fields.Integer(dump_only=True)
+    # Set when served from ImageSummaryCacheService
+    cache_age_seconds = fields.Float(dump_only=True)
+    is_stale = fields.Boolean(dump_only=True)
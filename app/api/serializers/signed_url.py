@@ -0,0 +1,12 @@
+from marshmallow import Schema, fields, validate
+
+
+class SignedUrlSchema(Schema):
+    url = fields.Str(dump_only=True)
+    expires = fields.Integer(dump_only=True)
+
+
+class SignedUrlsRequestSchema(Schema):
+    image_ids = fields.List(
+        fields.UUID(), required=True, validate=validate.Length(min=1, max=500)
+    )
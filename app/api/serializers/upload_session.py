@@ -0,0 +1,13 @@
+from marshmallow import Schema, fields, validate
+
+
+class UploadSessionSchema(Schema):
+    id = fields.UUID(dump_only=True)
+    filename = fields.Str(required=True)
+    total_size = fields.Integer(required=True, validate=validate.Range(min=1))
+    is_public = fields.Boolean(load_default=False)
+    expires_at = fields.DateTime(dump_only=True)
+    # Filled in from UploadService.get_progress
+    offset = fields.Integer(dump_only=True)
+    received_bytes = fields.Integer(dump_only=True)
+    missing_ranges = fields.List(fields.List(fields.Integer()), dump_only=True)
@@ -0,0 +1,74 @@
+import click
+from flask.cli import AppGroup
+
+from app.enums import AnnotationStatus
+from app.repos.image import ImageRepo
+from app.services.annotation_worker_service import AnnotationWorkerService
+
+annotation_cli = AppGroup("annotation", help="Maintenance commands for annotation.")
+
+
+@annotation_cli.command("requeue")
+@click.option(
+    "--status",
+    "from_status",
+    type=click.Choice([AnnotationStatus.Fail.value, AnnotationStatus.Success.value]),
+    default=AnnotationStatus.Fail.value,
+    show_default=True,
+    help="Annotation status of the images to annotate again.",
+)
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    help="Number of images moved back to Queued per statement.",
+)
+def requeue(from_status: str, batch_size: int) -> None:
+    """Queue images with an annotation status for annotation again.
+
+    Every batch of images is moved to Queued with one UPDATE ... RETURNING
+    statement and gets its annotation jobs with one INSERT.
+    """
+    requeued_count = 0
+    while True:
+        image_ids = ImageRepo.transition_annotation_status(
+            None,
+            AnnotationStatus.Queued,
+            from_status=AnnotationStatus(from_status),
+            limit=batch_size,
+        )
+        if not image_ids:
+            break
+        AnnotationWorkerService.enqueue(image_ids)
+        requeued_count += len(image_ids)
+        click.echo(f"Requeued {requeued_count} images")
+
+    click.echo(f"Requeue complete, {requeued_count} images requeued")
+
+
+@annotation_cli.command("enqueue-queued")
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    help="Number of images given annotation jobs per statement.",
+)
+def enqueue_queued(batch_size: int) -> None:
+    """Give annotation jobs to Queued images that have none.
+
+    Images get their job when their content is saved; this is only needed
+    for images queued before annotation jobs existed. Images that have a
+    job already keep it.
+    """
+    enqueued_count = 0
+    after_id = None
+    while True:
+        image_ids = ImageRepo.get_queued_ids_page(batch_size, after_id)
+        if not image_ids:
+            break
+        AnnotationWorkerService.enqueue(image_ids)
+        enqueued_count += len(image_ids)
+        after_id = image_ids[-1]
+        click.echo(f"Checked {enqueued_count} images")
+
+    click.echo(f"Enqueue complete, {enqueued_count} Queued images have jobs")
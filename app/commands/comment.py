@@ -0,0 +1,35 @@
+import click
+from flask.cli import AppGroup
+
+from app.repos.comment import CommentRepo
+from app.services.image_summary_service import ImageSummaryService
+
+comment_cli = AppGroup("comment", help="Maintenance commands for comments.")
+
+
+@comment_cli.command("backfill-sentiment")
+@click.option(
+    "--batch-size",
+    default=500,
+    show_default=True,
+    help="Number of comments scored and written per batch.",
+)
+def backfill_sentiment(batch_size: int) -> None:
+    """Score every comment that has no sentiment score yet."""
+    scored_count = 0
+    last_comment_id = None
+    while True:
+        rows = CommentRepo.get_unscored(batch_size, after_id=last_comment_id)
+        if not rows:
+            break
+        CommentRepo.update_sentiment_scores(
+            [
+                (comment_id, ImageSummaryService.score_comment(body))
+                for comment_id, body in rows
+            ]
+        )
+        scored_count += len(rows)
+        last_comment_id = rows[-1][0]
+        click.echo(f"Scored {scored_count} comments")
+
+    click.echo(f"Backfill complete, {scored_count} comments scored")
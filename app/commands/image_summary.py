@@ -0,0 +1,186 @@
+import json
+import multiprocessing
+import os
+import time
+from itertools import groupby
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.models.image_summary import ImageSummary
+from app.repos.comment import CommentRepo
+from app.repos.image import ImageRepo
+from app.repos.image_commenter import ImageCommenterRepo
+from app.repos.image_summary import ImageSummaryRepo
+from app.services.image_summary_service import ImageSummaryService
+from app.services.nlp_process_pool import WORKER_CONFIG_KEYS, init_nlp_worker
+
+image_summary_cli = AppGroup(
+    "image-summary", help="Maintenance commands for image summaries."
+)
+
+SummaryRows = List[Tuple[UUID, str, Optional[float]]]
+# Times the images of a chunk whose comments changed are rebuilt again
+MAX_CHANGED_RETRIES = 3
+
+
+def _rebuild_image_summary(task: Tuple[UUID, SummaryRows]) -> Tuple[UUID, dict, list]:
+    """Compute the summary columns of one image from its comment rows."""
+    image_id, rows = task
+    comments_summary = ImageSummaryService.summarize_comment_rows(rows)
+    comment_count = len(rows)
+    total_comment_length = sum(len(body or "") for _, body, _ in rows)
+    summary = {
+        "image_id": image_id,
+        "comment_count": comment_count,
+        "total_comment_length": total_comment_length,
+        "average_comment_length": ImageSummary.get_average_comment_length(
+            total_comment_length, comment_count
+        ),
+        "comment_summary": comments_summary.summary_result.summary,
+        "summary_strategy": comments_summary.summary_result.strategy,
+        "summary_fingerprint": comments_summary.summary_fingerprint,
+        "sentiment_score": comments_summary.sentiment_score,
+    }
+    return image_id, summary, comments_summary.new_sentiment_scores
+
+
+def _rebuild_chunk(pool, workers: int, image_ids: List[UUID]) -> List[UUID]:
+    """Rebuild the summaries and commenter counts of a chunk of images.
+
+    Returns:
+        List[UUID]: The images whose summary was not written, because their
+        comments changed while they were summarized.
+    """
+    # Read before the comments: a comment written meanwhile bumps it, so the
+    # summary of the older comments does not overwrite the newer counts
+    comment_revisions = ImageSummaryRepo.get_comment_revisions(image_ids)
+    rows_by_image = {
+        image_id: [
+            (comment_id, body, sentiment_score)
+            for comment_id, _, _, body, sentiment_score in rows
+        ]
+        for image_id, rows in groupby(
+            CommentRepo.get_summary_rows_for_images(image_ids),
+            key=lambda row: row[1],
+        )
+    }
+    tasks = [(image_id, rows_by_image.get(image_id, [])) for image_id in image_ids]
+    results = pool.map(
+        _rebuild_image_summary,
+        tasks,
+        chunksize=max(1, len(tasks) // (workers * 4)),
+    )
+
+    users_commented_counts = ImageCommenterRepo.rebuild_for_images(image_ids)
+    summaries = []
+    new_sentiment_scores = []
+    for image_id, summary, image_sentiment_scores in results:
+        summary["users_commented_count"] = users_commented_counts.get(image_id, 0)
+        summary["comment_revision"] = comment_revisions.get(image_id, 0)
+        summaries.append(summary)
+        new_sentiment_scores.extend(image_sentiment_scores)
+    CommentRepo.update_sentiment_scores(new_sentiment_scores)
+    written = set(ImageSummaryRepo.bulk_upsert(summaries))
+    return [image_id for image_id in image_ids if image_id not in written]
+
+
+def _read_checkpoint(checkpoint_file: str) -> Tuple[Optional[UUID], int]:
+    if not os.path.exists(checkpoint_file):
+        return None, 0
+    with open(checkpoint_file) as f:
+        checkpoint = json.load(f)
+    return UUID(checkpoint["last_image_id"]), checkpoint["processed"]
+
+
+def _write_checkpoint(checkpoint_file: str, last_image_id: UUID, processed: int):
+    temp_file = f"{checkpoint_file}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump({"last_image_id": str(last_image_id), "processed": processed}, f)
+    os.replace(temp_file, checkpoint_file)
+
+
+@image_summary_cli.command("rebuild")
+@click.option(
+    "--chunk-size",
+    default=500,
+    show_default=True,
+    help="Number of images read, summarized and written per batch.",
+)
+@click.option(
+    "--workers",
+    default=os.cpu_count(),
+    show_default=True,
+    help="Number of summarization worker processes.",
+)
+@click.option(
+    "--checkpoint-file",
+    default="image_summary_rebuild.checkpoint.json",
+    show_default=True,
+    help="File recording the progress of the rebuild.",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    help="Ignore an existing checkpoint and rebuild from the first image.",
+)
+def rebuild(chunk_size: int, workers: int, checkpoint_file: str, restart: bool):
+    """Recompute the summary of every image in parallel.
+
+    Image ids are streamed in id order, one chunk at a time. Each chunk is
+    summarized by a process pool and written back with one batched UPSERT,
+    after which the checkpoint file is updated so an interrupted run resumes
+    after the last written chunk. Images commented on while their chunk is
+    summarized are rebuilt again, so the counters the comments changed are
+    not overwritten.
+    """
+    last_image_id, processed = (None, 0)
+    if not restart:
+        last_image_id, processed = _read_checkpoint(checkpoint_file)
+        if last_image_id:
+            click.echo(f"Resuming after image {last_image_id} ({processed} done)")
+
+    worker_config = {key: current_app.config[key] for key in WORKER_CONFIG_KEYS}
+    # Spawn instead of fork: the app already runs background threads
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    rebuilt = 0
+    with context.Pool(
+        workers, initializer=init_nlp_worker, initargs=(worker_config,)
+    ) as pool:
+        while True:
+            image_ids = ImageRepo.get_ids_page(chunk_size, after_id=last_image_id)
+            if not image_ids:
+                break
+
+            changed = _rebuild_chunk(pool, workers, image_ids)
+            for _ in range(MAX_CHANGED_RETRIES):
+                if not changed:
+                    break
+                changed = _rebuild_chunk(pool, workers, changed)
+            if changed:
+                click.echo(
+                    f"Skipped {len(changed)} images whose comments kept changing"
+                )
+
+            last_image_id = image_ids[-1]
+            processed += len(image_ids)
+            rebuilt += len(image_ids)
+            _write_checkpoint(checkpoint_file, last_image_id, processed)
+
+            elapsed = time.perf_counter() - start
+            click.echo(
+                f"Rebuilt {processed} image summaries "
+                f"({rebuilt / elapsed:.1f} images/s)"
+            )
+
+    elapsed = time.perf_counter() - start
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    click.echo(
+        f"Rebuild complete, {rebuilt} image summaries in {elapsed:.1f}s "
+        f"({rebuilt / elapsed if elapsed else 0:.1f} images/s)"
+    )
@@ -0,0 +1,69 @@
+import time
+
+import click
+from flask.cli import AppGroup
+
+from app.repos.image import ImageRepo
+from app.services.blob_store import BlobStore
+from app.services.storage_layout import StorageLayout
+
+storage_cli = AppGroup("storage", help="Maintenance commands for image storage.")
+
+
+@storage_cli.command("migrate-layout")
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    help="Number of images whose files are moved per batch.",
+)
+@click.option(
+    "--pause",
+    default=0.0,
+    show_default=True,
+    help="Seconds to wait between batches, to limit the load on a live service.",
+)
+def migrate_layout(batch_size: int, pause: float) -> None:
+    """Move image files from the flat layout to the sharded one.
+
+    Images are walked in id order, one batch at a time. The service keeps
+    serving files from both layouts meanwhile, and the command can be
+    interrupted and run again at any time.
+    """
+    if StorageLayout.shard_levels == 0:
+        click.echo("UPLOAD_SHARD_LEVELS is 0, nothing to migrate")
+        return
+
+    checked_count = 0
+    moved_count = 0
+    last_image_id = None
+    while True:
+        rows = ImageRepo.get_files_page(batch_size, after_id=last_image_id)
+        if not rows:
+            break
+        for _, user_id, filename in rows:
+            if StorageLayout.migrate_file(user_id, filename):
+                moved_count += 1
+        checked_count += len(rows)
+        last_image_id = rows[-1][0]
+        click.echo(f"Checked {checked_count} images, moved {moved_count} files")
+        if pause:
+            time.sleep(pause)
+
+    click.echo(f"Migration complete, {moved_count} files moved")
+
+
+@storage_cli.command("compact-packs")
+@click.option(
+    "--min-dead-ratio",
+    default=0.5,
+    show_default=True,
+    help="Share of released bytes a pack segment needs to be compacted.",
+)
+def compact_packs(min_dead_ratio: float) -> None:
+    """Reclaim the space of deleted images stored in pack segments."""
+    compacted_count, reclaimed_bytes = BlobStore.compact_packs(min_dead_ratio)
+    click.echo(
+        f"Compaction complete, {compacted_count} segments compacted, "
+        f"{reclaimed_bytes} bytes reclaimed"
+    )
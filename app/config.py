@@ -17,3 +17,149 @@ class Config:
     ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD") or "password"
 
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "../uploads")
+    # Directory levels image files of a user are fanned out over, 0 for none
+    UPLOAD_SHARD_LEVELS = int(os.environ.get("UPLOAD_SHARD_LEVELS") or 2)
+    UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES") or 100 * 1024 * 1024)
+    UPLOAD_BLOCK_SIZE = int(os.environ.get("UPLOAD_BLOCK_SIZE") or 1024 * 1024)
+    UPLOAD_SESSION_TTL_SECONDS = int(
+        os.environ.get("UPLOAD_SESSION_TTL_SECONDS") or 24 * 60 * 60
+    )
+    # Limits of the unexpired upload sessions of a user, whose partial files
+    # are preallocated
+    UPLOAD_MAX_OPEN_SESSIONS = int(os.environ.get("UPLOAD_MAX_OPEN_SESSIONS") or 10)
+    UPLOAD_MAX_RESERVED_BYTES = int(
+        os.environ.get("UPLOAD_MAX_RESERVED_BYTES") or 1024 * 1024 * 1024
+    )
+    # Files of a bulk upload are stored by this many threads, and their
+    # images inserted this many at a time
+    BULK_UPLOAD_WORKERS = int(os.environ.get("BULK_UPLOAD_WORKERS") or 4)
+    BULK_UPLOAD_BATCH_SIZE = int(os.environ.get("BULK_UPLOAD_BATCH_SIZE") or 500)
+    BULK_UPLOAD_MAX_FILES = int(os.environ.get("BULK_UPLOAD_MAX_FILES") or 10_000)
+    # Larger files of a bulk upload are buffered on disk instead of in memory
+    BULK_UPLOAD_SPOOL_BYTES = int(
+        os.environ.get("BULK_UPLOAD_SPOOL_BYTES") or 8 * 1024 * 1024
+    )
+    # "local" keeps blobs in BLOB_FOLDER, "s3" in S3_BUCKET with BLOB_FOLDER
+    # holding this host's copies
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND") or "local"
+    STORAGE_PART_SIZE = int(os.environ.get("STORAGE_PART_SIZE") or 8 * 1024 * 1024)
+    STORAGE_MAX_CONCURRENCY = int(os.environ.get("STORAGE_MAX_CONCURRENCY") or 4)
+    S3_BUCKET = os.environ.get("S3_BUCKET")
+    S3_PREFIX = os.environ.get("S3_PREFIX") or ""
+    # For S3-compatible services such as MinIO
+    S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+    S3_REGION = os.environ.get("S3_REGION")
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS") or 10)
+    # Images up to this size are appended to pack segments, 0 to disable
+    BLOB_PACK_MAX_BYTES = int(os.environ.get("BLOB_PACK_MAX_BYTES") or 0)
+    BLOB_PACK_SEGMENT_BYTES = int(
+        os.environ.get("BLOB_PACK_SEGMENT_BYTES") or 256 * 1024 * 1024
+    )
+
+    DERIVATIVE_SIZES = [
+        int(size)
+        for size in (os.environ.get("DERIVATIVE_SIZES") or "128,512").split(",")
+    ]
+    DERIVATIVE_FORMATS = (os.environ.get("DERIVATIVE_FORMATS") or "webp,jpeg").split(
+        ","
+    )
+    DERIVATIVE_QUALITY = int(os.environ.get("DERIVATIVE_QUALITY") or 80)
+    DERIVATIVE_POOL_SIZE = int(os.environ.get("DERIVATIVE_POOL_SIZE") or 2)
+    DERIVATIVE_TIMEOUT_SECONDS = float(
+        os.environ.get("DERIVATIVE_TIMEOUT_SECONDS") or 30.0
+    )
+
+    TILE_SIZE = int(os.environ.get("TILE_SIZE") or 256)
+    TILE_OVERLAP = int(os.environ.get("TILE_OVERLAP") or 1)
+    TILE_FORMAT = os.environ.get("TILE_FORMAT") or "jpeg"
+    TILE_QUALITY = int(os.environ.get("TILE_QUALITY") or 80)
+    # Pyramids of images this large are built in the background after upload
+    TILE_MIN_PIXELS = int(os.environ.get("TILE_MIN_PIXELS") or 16_000_000)
+    TILE_MAX_PIXELS = int(os.environ.get("TILE_MAX_PIXELS") or 1_000_000_000)
+    TILE_POOL_SIZE = int(os.environ.get("TILE_POOL_SIZE") or 1)
+    TILE_DECODE_POOL_SIZE = int(os.environ.get("TILE_DECODE_POOL_SIZE") or 1)
+    # How long a tile request waits for the source image to be decoded
+    TILE_TIMEOUT_SECONDS = float(os.environ.get("TILE_TIMEOUT_SECONDS") or 60.0)
+
+    SIGNED_URL_SECRET = os.environ.get("SIGNED_URL_SECRET") or SECRET_KEY
+    SIGNED_URL_TTL_SECONDS = int(os.environ.get("SIGNED_URL_TTL_SECONDS") or 300)
+    # "X-Accel-Redirect" for nginx, "X-Sendfile" for Apache/lighttpd
+    MEDIA_REDIRECT_HEADER = (
+        os.environ.get("MEDIA_REDIRECT_HEADER") or "X-Accel-Redirect"
+    )
+    MEDIA_REDIRECT_PREFIX = (
+        os.environ.get("MEDIA_REDIRECT_PREFIX") or "/protected-media/"
+    )
+
+    # Images are annotated in the background by this many worker threads
+    # per instance, which lease their jobs from the database
+    ANNOTATION_WORKER_ENABLED = (
+        os.environ.get("ANNOTATION_WORKER_ENABLED") or "true"
+    ).lower() == "true"
+    ANNOTATION_WORKER_POOL_SIZE = int(
+        os.environ.get("ANNOTATION_WORKER_POOL_SIZE") or 2
+    )
+    ANNOTATION_WORKER_POLL_SECONDS = float(
+        os.environ.get("ANNOTATION_WORKER_POLL_SECONDS") or 1.0
+    )
+    # Images are annotated in batches of up to this size, waiting at most
+    # this long for a batch to fill up
+    ANNOTATION_JOB_BATCH_SIZE = int(os.environ.get("ANNOTATION_JOB_BATCH_SIZE") or 10)
+    ANNOTATION_BATCH_MAX_WAIT_SECONDS = float(
+        os.environ.get("ANNOTATION_BATCH_MAX_WAIT_SECONDS") or 0.2
+    )
+    # Processes decoding images for the annotator
+    ANNOTATION_PREPARE_POOL_SIZE = int(
+        os.environ.get("ANNOTATION_PREPARE_POOL_SIZE") or 2
+    )
+    ANNOTATION_JOB_LEASE_SECONDS = float(
+        os.environ.get("ANNOTATION_JOB_LEASE_SECONDS") or 60
+    )
+    ANNOTATION_JOB_MAX_ATTEMPTS = int(
+        os.environ.get("ANNOTATION_JOB_MAX_ATTEMPTS") or 3
+    )
+    # "module:Class" of the annotator, see BatchAnnotator
+    ANNOTATOR = os.environ.get("ANNOTATOR") or "app.services.annotator:RandomAnnotator"
+    SUMMARY_WORKER_ENABLED = (
+        os.environ.get("SUMMARY_WORKER_ENABLED") or "true"
+    ).lower() == "true"
+    SUMMARY_DEBOUNCE_SECONDS = float(os.environ.get("SUMMARY_DEBOUNCE_SECONDS") or 2.0)
+    SUMMARY_WORKER_POOL_SIZE = int(os.environ.get("SUMMARY_WORKER_POOL_SIZE") or 2)
+
+    NLP_PRELOAD_MODELS = (
+        os.environ.get("NLP_PRELOAD_MODELS") or "true"
+    ).lower() == "true"
+
+    NLTK_DATA_DIR = os.environ.get("NLTK_DATA_DIR") or os.path.join(
+        os.path.dirname(__file__), "../nltk_data"
+    )
+    NLTK_DOWNLOAD_MISSING = (
+        os.environ.get("NLTK_DOWNLOAD_MISSING") or "false"
+    ).lower() == "true"
+
+    SENTIMENT_AGGREGATION = os.environ.get("SENTIMENT_AGGREGATION") or "mean"
+
+    SUMMARY_SENTENCES_COUNT = int(os.environ.get("SUMMARY_SENTENCES_COUNT") or 2)
+    SUMMARY_MAX_SENTENCES = int(os.environ.get("SUMMARY_MAX_SENTENCES") or 200)
+    SUMMARY_SAMPLING = os.environ.get("SUMMARY_SAMPLING") or "recent"
+    SUMMARY_TIME_BUDGET_SECONDS = float(
+        os.environ.get("SUMMARY_TIME_BUDGET_SECONDS") or 2.0
+    )
+    SUMMARY_LSA_WORKERS = int(os.environ.get("SUMMARY_LSA_WORKERS") or 1)
+    SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE") or 1024)
+
+    NLP_EXECUTION_MODE = os.environ.get("NLP_EXECUTION_MODE") or "inline"
+    NLP_PROCESS_POOL_SIZE = int(os.environ.get("NLP_PROCESS_POOL_SIZE") or 0) or None
+    NLP_TASK_TIMEOUT_SECONDS = float(os.environ.get("NLP_TASK_TIMEOUT_SECONDS") or 10.0)
+    NLP_MAX_PENDING_TASKS = int(os.environ.get("NLP_MAX_PENDING_TASKS") or 64)
+    NLP_QUEUE_TIMEOUT_SECONDS = float(
+        os.environ.get("NLP_QUEUE_TIMEOUT_SECONDS") or 5.0
+    )
+
+    SUMMARY_READ_CACHE_TTL_SECONDS = float(
+        os.environ.get("SUMMARY_READ_CACHE_TTL_SECONDS") or 30.0
+    )
+    SUMMARY_READ_CACHE_SIZE = int(os.environ.get("SUMMARY_READ_CACHE_SIZE") or 4096)
+    SUMMARY_READ_CACHE_REFRESH_WORKERS = int(
+        os.environ.get("SUMMARY_READ_CACHE_REFRESH_WORKERS") or 2
+    )
@@ -8,3 +8,39 @@ class SecretKeyNotFoundError(Exception):
 
 class UserNotFound(Exception):
     """Exception raised when a user is not found."""
+
+
+class NlpExecutionError(Exception):
+    """Base exception for NLP work that could not be run in the process pool."""
+
+
+class NlpPoolSaturated(NlpExecutionError):
+    """Raised when the NLP process pool queue stays full for too long."""
+
+
+class NlpTaskTimeout(NlpExecutionError):
+    """Raised when an NLP task does not finish within its timeout."""
+
+
+class InvalidUploadChunk(Exception):
+    """Raised when an upload chunk does not fit inside its upload session."""
+
+
+class UploadIncomplete(Exception):
+    """Raised when finalizing an upload session that is missing bytes."""
+
+
+class UploadSessionNotFound(Exception):
+    """Raised when an upload session was completed or aborted meanwhile."""
+
+
+class TooManyUploadSessions(Exception):
+    """Raised when a user already has the maximum number of open uploads."""
+
+
+class UploadQuotaExceeded(Exception):
+    """Raised when the open uploads of a user would reserve too many bytes."""
+
+
+class InvalidArchive(Exception):
+    """Raised when an uploaded archive cannot be read."""
@@ -1,5 +1,10 @@
 from app.models.annotation import Annotation
+from app.models.annotation_job import AnnotationJob
 from app.models.comment import Comment
 from app.models.image import Image
+from app.models.image_blob import ImageBlob
+from app.models.image_commenter import ImageCommenter
+from app.models.image_filename_counter import ImageFilenameCounter
 from app.models.image_summary import ImageSummary
+from app.models.upload_session import UploadChunk, UploadSession
 from app.models.user import User
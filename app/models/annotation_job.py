@@ -0,0 +1,28 @@
+from sqlalchemy import UUID, Column, DateTime, ForeignKey, Integer, String, Text, func
+
+from app.models.common import TimestampMixin
+from app.services.core_services import db
+
+
+class AnnotationJob(TimestampMixin, db.Model):
+    """An image waiting to be annotated, see AnnotationJobRepo.
+
+    A job is leased by one worker until ``lease_expires_at``; a job whose
+    lease expired, e.g. because its worker crashed, is claimed again.
+    """
+
+    image_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("image.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # Number of times the job was claimed
+    attempts = Column(Integer, default=0, nullable=False)
+    worker_id = Column(String(128))
+    # A job can be claimed once its lease expired, so a new job is created
+    # with an expired lease; the oldest claimable jobs are claimed first
+    lease_expires_at = Column(DateTime, default=func.now(), nullable=False, index=True)
+    last_error = Column(Text)
+
+    def __repr__(self) -> str:
+        return f"<Annotation Job {self.image_id}>"
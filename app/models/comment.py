@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import UUID, Column, ForeignKey, Text
+from sqlalchemy import UUID, Column, Float, ForeignKey, Text
 
 from app.models.common import TimestampMixin
 from app.services.core_services import db
@@ -11,6 +11,8 @@ class Comment(TimestampMixin, db.Model):
     body = Column(Text)
     user_id = Column(UUID(as_uuid=True), ForeignKey("user.id"), nullable=False)
     image_id = Column(UUID(as_uuid=True), ForeignKey("image.id"), nullable=False)
+    # VADER compound score in [-1, 1], None until the comment has been scored
+    sentiment_score = Column(Float, nullable=True)
 
     def __repr__(self):
         return f"<Comment {self.id}>"
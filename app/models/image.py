@@ -1,4 +1,3 @@
-import os
 import uuid
 
 from sqlalchemy import UUID, Boolean, Column, Enum, ForeignKey, String, UniqueConstraint
@@ -6,10 +5,17 @@ from sqlalchemy import UUID, Boolean, Column, Enum, ForeignKey, String, UniqueCo
 from app.enums import AnnotationStatus
 from app.models.common import TimestampMixin
 from app.services.core_services import db
+from app.services.storage_layout import StorageLayout
 
 image_annotation_association = db.Table(
     "image_annotation_association",
-    Column("image_id", UUID(as_uuid=True), ForeignKey("image.id"), primary_key=True),
+    # Cascaded, so images can be deleted while a worker annotates them
+    Column(
+        "image_id",
+        UUID(as_uuid=True),
+        ForeignKey("image.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
     Column(
         "annotation_id",
         UUID(as_uuid=True),
@@ -23,8 +29,12 @@ class Image(TimestampMixin, db.Model):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     _filename = Column("filename", String(128), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("user.id"), nullable=False)
-    _annotation_status = Column(Enum(AnnotationStatus), default=AnnotationStatus.Queued)
+    _annotation_status = Column(
+        Enum(AnnotationStatus), default=AnnotationStatus.Queued, index=True
+    )
     _is_public = Column("is_public", Boolean, default=False)
+    # Content of the image in the blob store, see BlobStore
+    blob_sha256 = Column(String(64), ForeignKey("imageblob.sha256"), nullable=True)
     comments = db.relationship(
         "Comment", backref="image", lazy="dynamic", cascade="all, delete-orphan"
     )
@@ -56,21 +66,12 @@ class Image(TimestampMixin, db.Model):
 
     @filename.setter
     def filename(self, value):
-        existing_filenames = [
-            image._filename
-            for image in Image.query.filter_by(user_id=self.user_id).all()
-        ]
-        if value not in existing_filenames:
-            self._filename = value
-        else:
-            # Extract file name and extension
-            filename, extension = os.path.splitext(value)
-            counter = 1
-            new_filename = f"{filename}_{counter}{extension}"
-            while new_filename in existing_filenames:
-                counter += 1
-                new_filename = f"{filename}_{counter}{extension}"
-            self._filename = new_filename
+        # Importing here to avoid circular imports
+        from app.repos.image_filename import ImageFilenameRepo
+
+        self._filename = ImageFilenameRepo.allocate(
+            self.user_id, [value], image_id=self.id
+        )[0]
 
     @property
     def annotation_status(self):
@@ -84,4 +85,7 @@ class Image(TimestampMixin, db.Model):
 
     @property
     def image_path(self):
-        return f"uploads/{self.user_id}/{self._filename}"
+        relative_path = StorageLayout.resolve_relative_path(
+            self.user_id, self._filename
+        )
+        return f"uploads/{relative_path}"
@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+
+from app.models.common import TimestampMixin
+from app.services.core_services import db
+
+
+class ImageBlob(TimestampMixin, db.Model):
+    """Stored image content, shared by every image with the same bytes."""
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    # Number of Image rows pointing at this blob; collected when it drops to 0
+    ref_count = Column(Integer, default=0, nullable=False)
+    # Location of small blobs stored in a pack segment instead of a file, see
+    # PackStore; the length is the blob size
+    pack_segment = Column(Integer, nullable=True, index=True)
+    pack_offset = Column(BigInteger, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<Image Blob {self.sha256}>"
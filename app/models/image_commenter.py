@@ -0,0 +1,24 @@
+import uuid
+
+from sqlalchemy import UUID, Column, ForeignKey, Integer, UniqueConstraint
+
+from app.models.common import TimestampMixin
+from app.services.core_services import db
+
+
+class ImageCommenter(TimestampMixin, db.Model):
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    image_id = Column(
+        UUID(as_uuid=True), ForeignKey("image.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+    )
+    comment_count = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("image_id", "user_id", name="unique_image_commenter"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Image Commenter {self.image_id}/{self.user_id}>"
@@ -0,0 +1,23 @@
+from sqlalchemy import UUID, Column, ForeignKey, Integer, String
+
+from app.models.common import TimestampMixin
+from app.services.core_services import db
+
+
+class ImageFilenameCounter(TimestampMixin, db.Model):
+    """The last suffix handed out for a filename of a user.
+
+    ``photo.jpg`` taken by one of the user's images is de-duplicated as
+    ``photo_<n>.jpg`` with the next ``n``, see ImageFilenameRepo.
+    """
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    filename = Column(String(128), primary_key=True)
+    last_suffix = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<Image Filename Counter {self.user_id}/{self.filename}>"
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import UUID, Column, ForeignKey, Integer, Text
+from sqlalchemy import UUID, Column, ForeignKey, Integer, String, Text
 
 from app.models.common import TimestampMixin
 from app.services.core_services import db
@@ -8,12 +8,36 @@ from app.services.core_services import db
 
 class ImageSummary(TimestampMixin, db.Model):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    image_id = Column(UUID(as_uuid=True), ForeignKey("image.id"), nullable=False)
+    image_id = Column(
+        UUID(as_uuid=True), ForeignKey("image.id"), nullable=False, unique=True
+    )
     comment_count = Column(Integer, default=0)
     comment_summary = Column(Text, default="")
+    # Which CommentSummarizer strategy produced comment_summary
+    summary_strategy = Column(String(32), default="")
+    # SHA-256 of the summarized comment bodies, see CommentSummarizer.fingerprint
+    summary_fingerprint = Column(String(64), nullable=True)
+    total_comment_length = Column(Integer, default=0)
     average_comment_length = Column(Integer, default=0)
     users_commented_count = Column(Integer, default=0)
     sentiment_score = Column(Integer, default=50)
+    # Bumped on every comment write; the text summary is stale until
+    # summary_revision catches up with it.
+    comment_revision = Column(Integer, default=0, nullable=False)
+    summary_revision = Column(Integer, default=0, nullable=False)
 
     def __repr__(self) -> str:
         return f"<Image Summary {self.id}>"
+
+    @staticmethod
+    def get_average_comment_length(
+        total_comment_length: int, comment_count: int
+    ) -> int:
+        """Average the comment length, rounding halves up as Postgres round() does."""
+        if not comment_count:
+            return 0
+        return (2 * total_comment_length + comment_count) // (2 * comment_count)
+
+    @property
+    def is_summary_stale(self) -> bool:
+        return (self.comment_revision or 0) > (self.summary_revision or 0)
@@ -0,0 +1,51 @@
+import uuid
+
+from sqlalchemy import (
+    UUID,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    String,
+)
+
+from app.models.common import TimestampMixin
+from app.services.core_services import db
+
+
+class UploadSession(TimestampMixin, db.Model):
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+    )
+    filename = Column(String(128), nullable=False)
+    is_public = Column(Boolean, default=False, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    # Set while the upload is turned into an image, see UploadSessionRepo.claim
+    completing = Column(Boolean, default=False, nullable=False)
+    chunks = db.relationship(
+        "UploadChunk",
+        backref="upload_session",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"<Upload Session {self.id}>"
+
+
+class UploadChunk(TimestampMixin, db.Model):
+    """A byte range ``[offset, offset + length)`` written to an upload session."""
+
+    session_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("uploadsession.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    offset = Column(BigInteger, primary_key=True)
+    length = Column(BigInteger, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<Upload Chunk {self.session_id}@{self.offset}+{self.length}>"
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from typing import Iterable, List, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.annotation_job import AnnotationJob
+from app.services.core_services import db
+
+
+class ClaimedJob(NamedTuple):
+    image_id: UUID
+    # Including this claim
+    attempts: int
+
+
+class AnnotationJobRepo:
+    """Annotation jobs shared by the workers of every instance of the service.
+
+    Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so workers
+    never wait for each other or claim the same job. Lease times come from
+    the database clock, so the clocks of the instances do not matter.
+    """
+
+    model = AnnotationJob
+
+    @classmethod
+    def enqueue(cls, image_ids: Iterable[UUID]) -> None:
+        """Add a job for every image that has none yet."""
+        rows = [{"image_id": image_id} for image_id in image_ids]
+        if not rows:
+            return
+        db.session.execute(
+            insert(cls.model)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[cls.model.image_id])
+        )
+        db.session.commit()
+
+    @classmethod
+    def claim(
+        cls, worker_id: str, limit: int, lease_seconds: float
+    ) -> List[ClaimedJob]:
+        """Lease up to ``limit`` jobs whose lease expired to a worker.
+
+        Returns:
+            List[ClaimedJob]: The claimed jobs.
+        """
+        now = func.now()
+        # Materialized so that the jobs are picked once: the planner may
+        # otherwise run a LIMIT subquery again for every row it updates
+        claimable = (
+            select(cls.model.image_id)
+            .where(cls.model.lease_expires_at <= now)
+            .order_by(cls.model.lease_expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("claimable")
+            .prefix_with("MATERIALIZED")
+        )
+        stmt = (
+            update(cls.model)
+            .where(cls.model.image_id.in_(select(claimable.c.image_id)))
+            .values(
+                worker_id=worker_id,
+                attempts=cls.model.attempts + 1,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+            )
+            .returning(cls.model.image_id, cls.model.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        rows = db.session.execute(stmt).all()
+        db.session.commit()
+        return [ClaimedJob(row.image_id, row.attempts) for row in rows]
+
+    @classmethod
+    def heartbeat(cls, worker_ids: Iterable[str], lease_seconds: float) -> int:
+        """Extend the leases of all jobs held by the workers.
+
+        Returns:
+            int: The number of leases extended.
+        """
+        worker_ids = list(worker_ids)
+        if not worker_ids:
+            return 0
+        result = db.session.execute(
+            update(cls.model)
+            .where(cls.model.worker_id.in_(worker_ids))
+            .values(lease_expires_at=func.now() + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def complete(cls, image_ids: Iterable[UUID], worker_id: str) -> List[UUID]:
+        """Delete jobs held by the worker.
+
+        Returns:
+            List[UUID]: The images of the jobs deleted; the worker lost the
+            others, e.g. their lease expired and another worker claimed them.
+        """
+        image_ids = list(image_ids)
+        if not image_ids:
+            return []
+        result = db.session.execute(
+            delete(cls.model)
+            .where(cls.model.image_id.in_(image_ids), cls.model.worker_id == worker_id)
+            .returning(cls.model.image_id)
+            .execution_options(synchronize_session=False)
+        )
+        completed = [image_id for (image_id,) in result]
+        db.session.commit()
+        return completed
+
+    @classmethod
+    def release(
+        cls,
+        image_ids: Iterable[UUID],
+        worker_id: str,
+        error: Optional[str] = None,
+        count_attempt: bool = True,
+    ) -> None:
+        """Give jobs held by the worker back, to be claimed again right away.
+
+        Args:
+            image_ids (Iterable[UUID]): The images of the jobs.
+            worker_id (str): The worker holding the jobs.
+            error (Optional[str]): Why the attempt failed.
+            count_attempt (bool): False for jobs the worker did not start.
+        """
+        image_ids = list(image_ids)
+        if not image_ids:
+            return
+        values = {"worker_id": None, "lease_expires_at": func.now()}
+        if count_attempt:
+            values["last_error"] = error
+        else:
+            values["attempts"] = cls.model.attempts - 1
+        db.session.execute(
+            update(cls.model)
+            .where(cls.model.image_id.in_(image_ids), cls.model.worker_id == worker_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @classmethod
+    def get(cls, image_id: UUID) -> Optional[AnnotationJob]:
+        return db.session.get(cls.model, image_id)
+
+    @classmethod
+    def count(cls) -> int:
+        return db.session.query(func.count(cls.model.image_id)).scalar()
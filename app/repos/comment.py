@@ -1,6 +1,8 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 from uuid import UUID
 
+from sqlalchemy import update
+
 from app.models.comment import Comment
 from app.services.core_services import db
 
@@ -25,17 +27,93 @@ class CommentRepo:
         return cls.model.query.filter_by(image_id=image_id).all()
 
     @classmethod
-    def create(cls, body: str, user_id: UUID, image_id: UUID) -> Optional[Comment]:
-        new_comment = cls.model(body=body, user_id=user_id, image_id=image_id)
+    def get_summary_rows(
+        cls, image_id: UUID
+    ) -> List[Tuple[UUID, str, Optional[float]]]:
+        """Get id, body and sentiment score of an image's comments, oldest first."""
+        return (
+            db.session.query(cls.model.id, cls.model.body, cls.model.sentiment_score)
+            .filter(cls.model.image_id == image_id)
+            .order_by(cls.model.created_at)
+            .all()
+        )
+
+    @classmethod
+    def get_summary_rows_for_images(
+        cls, image_ids: Sequence[UUID]
+    ) -> List[Tuple[UUID, UUID, UUID, str, Optional[float]]]:
+        """Get the comments of several images, grouped by image and oldest first.
+
+        Returns:
+            List[Tuple[UUID, UUID, UUID, str, Optional[float]]]: The id, image
+            id, user id, body and sentiment score of each comment.
+        """
+        return (
+            db.session.query(
+                cls.model.id,
+                cls.model.image_id,
+                cls.model.user_id,
+                cls.model.body,
+                cls.model.sentiment_score,
+            )
+            .filter(cls.model.image_id.in_(image_ids))
+            .order_by(cls.model.image_id, cls.model.created_at)
+            .all()
+        )
+
+    @classmethod
+    def get_unscored(
+        cls, limit: int, after_id: Optional[UUID] = None
+    ) -> List[Tuple[UUID, str]]:
+        """Get a batch of comments without a sentiment score, ordered by id."""
+        query = db.session.query(cls.model.id, cls.model.body).filter(
+            cls.model.sentiment_score.is_(None)
+        )
+        if after_id is not None:
+            query = query.filter(cls.model.id > after_id)
+        return query.order_by(cls.model.id).limit(limit).all()
+
+    @classmethod
+    def update_sentiment_scores(
+        cls, sentiment_scores: Sequence[Tuple[UUID, float]]
+    ) -> None:
+        if not sentiment_scores:
+            return
+        db.session.execute(
+            update(cls.model),
+            [
+                {"id": comment_id, "sentiment_score": sentiment_score}
+                for comment_id, sentiment_score in sentiment_scores
+            ],
+        )
+        db.session.commit()
+
+    @classmethod
+    def create(
+        cls,
+        body: str,
+        user_id: UUID,
+        image_id: UUID,
+        sentiment_score: Optional[float] = None,
+    ) -> Optional[Comment]:
+        new_comment = cls.model(
+            body=body,
+            user_id=user_id,
+            image_id=image_id,
+            sentiment_score=sentiment_score,
+        )
         db.session.add(new_comment)
         db.session.commit()
         return new_comment
 
     @classmethod
-    def update(cls, comment_id: UUID, body: str) -> Optional[Comment]:
+    def update(
+        cls, comment_id: UUID, body: str, sentiment_score: Optional[float] = None
+    ) -> Optional[Comment]:
         comment = cls.get_by_id(comment_id)
         if comment:
             comment.body = body
+            comment.sentiment_score = sentiment_score
             db.session.commit()
         return comment
 
@@ -1,27 +1,82 @@
-from typing import List, Optional
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from uuid import UUID
 
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
-from app.models.image import Image
+from app.enums import AnnotationStatus
+from app.models.image import Image, image_annotation_association
 from app.models.image_summary import ImageSummary
+from app.repos.image_filename import ImageFilenameRepo
 from app.services.core_services import db
 
 
 class ImageRepo:
     model = Image
+    # Attempts at a filename taken by concurrent transactions in the meantime
+    FILENAME_ATTEMPTS = 3
 
     @classmethod
     def get_all(cls) -> List[Image]:
         return cls.model.query.all()
 
+    @classmethod
+    def get_ids_page(cls, limit: int, after_id: Optional[UUID] = None) -> List[UUID]:
+        """Get up to ``limit`` image ids greater than ``after_id``, in id order."""
+        query = db.session.query(cls.model.id)
+        if after_id is not None:
+            query = query.filter(cls.model.id > after_id)
+        return [image_id for (image_id,) in query.order_by(cls.model.id).limit(limit)]
+
+    @classmethod
+    def get_queued_ids_page(
+        cls, limit: int, after_id: Optional[UUID] = None
+    ) -> List[UUID]:
+        """Get up to ``limit`` images with content that wait for annotation, in id order."""
+        query = db.session.query(cls.model.id).filter(
+            cls.model._annotation_status == AnnotationStatus.Queued,
+            cls.model.blob_sha256.isnot(None),
+        )
+        if after_id is not None:
+            query = query.filter(cls.model.id > after_id)
+        return [image_id for (image_id,) in query.order_by(cls.model.id).limit(limit)]
+
+    @classmethod
+    def get_files_page(
+        cls, limit: int, after_id: Optional[UUID] = None
+    ) -> List[Tuple[UUID, UUID, str]]:
+        """Get the ``(id, user_id, filename)`` of up to ``limit`` images, in id order."""
+        query = db.session.query(cls.model.id, cls.model.user_id, cls.model._filename)
+        if after_id is not None:
+            query = query.filter(cls.model.id > after_id)
+        return [tuple(row) for row in query.order_by(cls.model.id).limit(limit)]
+
     @classmethod
     def get_all_allowed(cls, requesting_user_id: UUID) -> List[Image]:
         return cls.model.query.filter(
             or_(cls.model._is_public.is_(True), cls.model.user_id == requesting_user_id)
         ).all()
 
+    @classmethod
+    def get_allowed_by_ids(
+        cls, image_ids: List[UUID], requesting_user_id: UUID
+    ) -> List[Image]:
+        """Get the images among ``image_ids`` that the user may see, in one query."""
+        return cls.model.query.filter(
+            or_(
+                cls.model._is_public.is_(True), cls.model.user_id == requesting_user_id
+            ),
+            cls.model.id.in_(image_ids),
+        ).all()
+
+    @classmethod
+    def get_many(cls, image_ids: List[UUID]) -> List[Image]:
+        """Get the images among ``image_ids`` regardless of their visibility."""
+        return cls.model.query.filter(cls.model.id.in_(image_ids)).all()
+
     @classmethod
     def get_by_id(cls, image_id: UUID, requesting_user_id: UUID) -> Optional[Image]:
         return cls.model.query.filter(
@@ -34,6 +89,17 @@ class ImageRepo:
             )
         ).first()
 
+    @classmethod
+    def get(cls, image_id: UUID) -> Optional[Image]:
+        """Get an image by id regardless of its visibility."""
+        return db.session.get(cls.model, image_id)
+
+    @classmethod
+    def get_by_filename(cls, user_id: UUID, filename: str) -> Optional[Image]:
+        return cls.model.query.filter_by(
+            user_id=user_id, _filename=secure_filename(filename)
+        ).first()
+
     @classmethod
     def get_by_user_id(cls, owner_id: UUID, requesting_user_id: UUID) -> List[Image]:
         if owner_id == requesting_user_id:
@@ -45,24 +111,166 @@ class ImageRepo:
 
     @classmethod
     def create(cls, user_id: UUID, filename: str, **kwargs) -> Image:
-        filename = secure_filename(filename)
-        new_image = Image(user_id=user_id, filename=filename, **kwargs)
-        db.session.add(new_image)
+        new_image = Image(user_id=user_id, **kwargs)
+        cls._set_filename(new_image, secure_filename(filename))
         db.session.commit()
         return new_image
 
+    @classmethod
+    def create_many(
+        cls,
+        user_id: UUID,
+        files: Sequence[Tuple[str, Optional[str]]],
+        is_public: bool = False,
+    ) -> List[Tuple[UUID, str]]:
+        """Create images of a user with a single INSERT statement.
+
+        The filenames are made unique among the user's images and each other
+        by ImageFilenameRepo, like the ``Image.filename`` setter does.
+
+        Args:
+            user_id (UUID): The owner of the images.
+            files (Sequence[Tuple[str, Optional[str]]]): The filename and
+                blob SHA-256 of every image.
+            is_public (bool): The visibility of the images.
+
+        Returns:
+            List[Tuple[UUID, str]]: The id and filename of every image, in order.
+        """
+        requested = [secure_filename(filename) for filename, _ in files]
+        for attempt in range(cls.FILENAME_ATTEMPTS):
+            filenames = ImageFilenameRepo.allocate(user_id, requested)
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": user_id,
+                    "_filename": filename,
+                    "_is_public": is_public,
+                    "blob_sha256": blob_sha256,
+                }
+                for filename, (_, blob_sha256) in zip(filenames, files)
+            ]
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(cls.model), rows)
+            except IntegrityError as e:
+                last_attempt = attempt == cls.FILENAME_ATTEMPTS - 1
+                if last_attempt or not ImageFilenameRepo.is_conflict(e):
+                    raise
+                continue
+            db.session.commit()
+            return [(row["id"], row["_filename"]) for row in rows]
+
     @classmethod
     def update(cls, image_id: UUID, **kwargs) -> Optional[Image]:
         image = cls.model.query.get(image_id)
         if image:
             for key, value in kwargs.items():
                 if key == "filename":
-                    value = secure_filename(value)
-                setattr(image, key, value)
+                    cls._set_filename(image, secure_filename(value))
+                else:
+                    setattr(image, key, value)
             db.session.commit()
 
         return image
 
+    @classmethod
+    def transition_annotation_status(
+        cls,
+        image_ids: Optional[Sequence[UUID]],
+        status: AnnotationStatus,
+        from_status: Union[AnnotationStatus, Sequence[AnnotationStatus]],
+        limit: Optional[int] = None,
+    ) -> List[UUID]:
+        """Move images that are ``from_status`` to ``status``, in one statement.
+
+        Args:
+            image_ids (Optional[Sequence[UUID]]): The images to move, or None
+                for any image.
+            status (AnnotationStatus): The new status.
+            from_status: The status, or any of several, the images must have.
+            limit (Optional[int]): The most images to move if ``image_ids`` is
+                None.
+
+        Returns:
+            List[UUID]: The ids of the images moved.
+        """
+        if image_ids is not None and not image_ids:
+            return []
+        moved = cls._transition(image_ids, status, from_status, limit)
+        db.session.commit()
+        return moved
+
+    @classmethod
+    def complete_annotation(
+        cls, annotation_ids: Dict[UUID, Sequence[UUID]]
+    ) -> List[UUID]:
+        """Give Processing images their annotations and move them to Success.
+
+        The statuses and the annotations of all images are written with one
+        statement each, in one transaction.
+
+        Args:
+            annotation_ids (Dict[UUID, Sequence[UUID]]): The ids of the
+                annotations of every image.
+
+        Returns:
+            List[UUID]: The ids of the images completed; the others were no
+            longer Processing.
+        """
+        if not annotation_ids:
+            return []
+        completed = cls._transition(
+            list(annotation_ids), AnnotationStatus.Success, AnnotationStatus.Processing
+        )
+        if completed:
+            db.session.execute(
+                delete(image_annotation_association).where(
+                    image_annotation_association.c.image_id.in_(completed)
+                )
+            )
+            rows = [
+                {"image_id": image_id, "annotation_id": annotation_id}
+                for image_id in completed
+                for annotation_id in set(annotation_ids[image_id])
+            ]
+            if rows:
+                db.session.execute(insert(image_annotation_association).values(rows))
+        db.session.commit()
+        return completed
+
+    @classmethod
+    def _transition(
+        cls,
+        image_ids: Optional[Sequence[UUID]],
+        status: AnnotationStatus,
+        from_status: Union[AnnotationStatus, Sequence[AnnotationStatus]],
+        limit: Optional[int] = None,
+    ) -> List[UUID]:
+        if isinstance(from_status, AnnotationStatus):
+            from_status = [from_status]
+        stmt = update(cls.model).where(cls.model._annotation_status.in_(from_status))
+        if image_ids is not None:
+            stmt = stmt.where(cls.model.id.in_(image_ids))
+        elif limit is not None:
+            # Rows locked by concurrent transitions are left for the next
+            # call; materialized so that the images are picked once
+            movable = (
+                select(cls.model.id)
+                .where(cls.model._annotation_status.in_(from_status))
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .cte("movable")
+                .prefix_with("MATERIALIZED")
+            )
+            stmt = stmt.where(cls.model.id.in_(select(movable.c.id)))
+        result = db.session.execute(
+            stmt.values(_annotation_status=status, updated_at=datetime.now())
+            .returning(cls.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        return [image_id for (image_id,) in result]
+
     @classmethod
     def delete(cls, image_id: UUID) -> bool:
         image = cls.model.query.get(image_id)
@@ -92,7 +300,45 @@ class ImageRepo:
     def get_image_summary(
         cls, image_id: UUID, requesting_user_id: UUID
     ) -> Optional[ImageSummary]:
-        image = cls.get_by_id(image_id, requesting_user_id)
-        if image:
-            return image.summary.first()
-        return None
+        return (
+            ImageSummary.query.join(cls.model, ImageSummary.image_id == cls.model.id)
+            .filter(
+                or_(
+                    cls.model._is_public.is_(True),
+                    cls.model.user_id == requesting_user_id,
+                ),
+                cls.model.id == image_id,
+            )
+            .first()
+        )
+
+    @classmethod
+    def get_with_summary(
+        cls, image_id: UUID
+    ) -> Optional[Tuple[Image, Optional[ImageSummary]]]:
+        """Get an image and its summary, if it has one, in a single query."""
+        return (
+            db.session.query(cls.model, ImageSummary)
+            .outerjoin(ImageSummary, ImageSummary.image_id == cls.model.id)
+            .filter(cls.model.id == image_id)
+            .first()
+        )
+
+    @classmethod
+    def _set_filename(cls, image: Image, filename: str) -> None:
+        """Give an image a free filename and flush it.
+
+        The image is flushed in a savepoint, so when a concurrent transaction
+        takes the filename first only this attempt is undone and another
+        filename is allocated.
+        """
+        for attempt in range(cls.FILENAME_ATTEMPTS):
+            try:
+                with db.session.begin_nested():
+                    image.filename = filename
+                    db.session.add(image)
+                return
+            except IntegrityError as e:
+                last_attempt = attempt == cls.FILENAME_ATTEMPTS - 1
+                if last_attempt or not ImageFilenameRepo.is_conflict(e):
+                    raise
@@ -0,0 +1,128 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.image_blob import ImageBlob
+from app.services.core_services import db
+
+
+class ImageBlobRepo:
+    model = ImageBlob
+
+    @classmethod
+    def get(cls, sha256: str) -> Optional[ImageBlob]:
+        return db.session.get(cls.model, sha256)
+
+    @classmethod
+    def acquire(cls, sha256: str, size: int) -> int:
+        """Take a reference to a blob, registering the blob if it is new.
+
+        Returns:
+            int: The blob's reference count after the increment.
+        """
+        stmt = (
+            insert(cls.model)
+            .values(sha256=sha256, size=size, ref_count=1)
+            .on_conflict_do_update(
+                index_elements=[cls.model.sha256],
+                set_={"ref_count": cls.model.ref_count + 1},
+            )
+            .returning(cls.model.ref_count)
+        )
+        ref_count = db.session.execute(stmt).scalar_one()
+        db.session.commit()
+        return ref_count
+
+    @classmethod
+    def release(cls, sha256: str, collect: Callable[[str], None]) -> int:
+        """Drop a reference to a blob.
+
+        When the last reference is dropped the row is deleted and ``collect``
+        is called with the blob's hash before the transaction commits. The
+        row lock makes a concurrent ``acquire`` of the same blob wait until the
+        blob is fully gone, after which it registers it again.
+
+        Returns:
+            int: The blob's reference count after the decrement.
+        """
+        ref_count = db.session.execute(
+            update(cls.model)
+            .where(cls.model.sha256 == sha256)
+            .values(ref_count=cls.model.ref_count - 1)
+            .returning(cls.model.ref_count)
+        ).scalar_one_or_none()
+        try:
+            if ref_count is not None and ref_count <= 0:
+                db.session.execute(
+                    delete(cls.model).where(
+                        cls.model.sha256 == sha256, cls.model.ref_count <= 0
+                    )
+                )
+                collect(sha256)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return max(ref_count or 0, 0)
+
+    @classmethod
+    def get_pack_location(cls, sha256: str) -> Optional[Tuple[int, int, int]]:
+        """Get the ``(segment, offset, length)`` of a packed blob.
+
+        Returns:
+            Optional[Tuple[int, int, int]]: The location, or None if the blob
+            is not stored in a pack segment.
+        """
+        row = db.session.execute(
+            select(cls.model.pack_segment, cls.model.pack_offset, cls.model.size).where(
+                cls.model.sha256 == sha256, cls.model.pack_segment.is_not(None)
+            )
+        ).first()
+        return tuple(row) if row else None
+
+    @classmethod
+    def set_pack_location(
+        cls,
+        sha256: str,
+        segment: int,
+        offset: int,
+        from_segment: Optional[int] = None,
+    ) -> bool:
+        """Record where a blob is packed.
+
+        Args:
+            from_segment (Optional[int]): Only move the blob if it is still in
+                this segment, for compaction.
+
+        Returns:
+            bool: False if the blob is gone, or was not in ``from_segment``.
+        """
+        stmt = update(cls.model).where(cls.model.sha256 == sha256)
+        if from_segment is not None:
+            stmt = stmt.where(cls.model.pack_segment == from_segment)
+        result = db.session.execute(
+            stmt.values(pack_segment=segment, pack_offset=offset)
+        )
+        db.session.commit()
+        return result.rowcount > 0
+
+    @classmethod
+    def get_pack_usage(cls) -> Dict[int, int]:
+        """Get the bytes of live blobs in every pack segment."""
+        rows = db.session.execute(
+            select(cls.model.pack_segment, func.sum(cls.model.size))
+            .where(cls.model.pack_segment.is_not(None))
+            .group_by(cls.model.pack_segment)
+        )
+        return {segment: int(live_bytes) for segment, live_bytes in rows}
+
+    @classmethod
+    def get_packed(cls, segment: int) -> List[Tuple[str, int, int]]:
+        """Get the ``(sha256, offset, length)`` of the blobs in a pack segment."""
+        rows = db.session.execute(
+            select(cls.model.sha256, cls.model.pack_offset, cls.model.size)
+            .where(cls.model.pack_segment == segment)
+            .order_by(cls.model.pack_offset)
+        )
+        return [tuple(row) for row in rows]
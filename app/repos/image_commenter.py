@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import delete, exists, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.comment import Comment
+from app.models.image_commenter import ImageCommenter
+from app.services.core_services import db
+
+
+class ImageCommenterRepo:
+    model = ImageCommenter
+
+    @classmethod
+    def get_by_image_id(cls, image_id: UUID) -> List[ImageCommenter]:
+        return cls.model.query.filter_by(image_id=image_id).all()
+
+    @classmethod
+    def get(cls, image_id: UUID, user_id: UUID) -> Optional[ImageCommenter]:
+        return cls.model.query.filter_by(image_id=image_id, user_id=user_id).first()
+
+    @classmethod
+    def increment(cls, image_id: UUID, user_id: UUID) -> int:
+        """Count one more comment by the user on the image.
+
+        Returns:
+            int: The user's comment count on the image after the increment.
+        """
+        stmt = (
+            insert(cls.model)
+            .values(image_id=image_id, user_id=user_id, comment_count=1)
+            .on_conflict_do_update(
+                constraint="unique_image_commenter",
+                set_={"comment_count": cls.model.comment_count + 1},
+            )
+            .returning(cls.model.comment_count)
+        )
+        comment_count = db.session.execute(stmt).scalar_one()
+        db.session.commit()
+        return comment_count
+
+    @classmethod
+    def decrement(cls, image_id: UUID, user_id: UUID) -> int:
+        """Count one comment less by the user on the image.
+
+        The row is removed once the count reaches zero.
+
+        Returns:
+            int: The user's comment count on the image after the decrement.
+        """
+        stmt = (
+            update(cls.model)
+            .where(cls.model.image_id == image_id, cls.model.user_id == user_id)
+            .values(comment_count=cls.model.comment_count - 1)
+            .returning(cls.model.comment_count)
+        )
+        comment_count = db.session.execute(stmt).scalar_one_or_none()
+        if comment_count is not None and comment_count <= 0:
+            db.session.execute(
+                delete(cls.model).where(
+                    cls.model.image_id == image_id,
+                    cls.model.user_id == user_id,
+                    cls.model.comment_count <= 0,
+                )
+            )
+        db.session.commit()
+        return max(comment_count or 0, 0)
+
+    @classmethod
+    def rebuild_for_image(cls, image_id: UUID) -> int:
+        """Recount the commenters of an image from its comments.
+
+        Returns:
+            int: The number of distinct users who commented on the image.
+        """
+        return cls.rebuild_for_images([image_id]).get(image_id, 0)
+
+    @classmethod
+    def rebuild_for_images(cls, image_ids: Sequence[UUID]) -> Dict[UUID, int]:
+        """Recount the commenters of several images in one batch.
+
+        The counts are computed from the comments by the statements that
+        write them, and written with an UPSERT, so commenters added
+        concurrently by ``increment`` are neither lost nor conflicting.
+
+        Returns:
+            Dict[UUID, int]: The number of distinct commenters per image, for
+            the images that have comments.
+        """
+        now = datetime.now()
+        counts = (
+            select(
+                func.gen_random_uuid(),
+                Comment.image_id,
+                Comment.user_id,
+                func.count(Comment.id),
+                literal(now),
+                literal(now),
+            )
+            .where(Comment.image_id.in_(image_ids))
+            .group_by(Comment.image_id, Comment.user_id)
+        )
+        stmt = insert(cls.model).from_select(
+            ["id", "image_id", "user_id", "comment_count", "created_at", "updated_at"],
+            counts,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="unique_image_commenter",
+            set_={
+                "comment_count": stmt.excluded.comment_count,
+                "updated_at": now,
+            },
+        ).returning(cls.model.image_id)
+        commented_image_ids = db.session.execute(stmt).scalars().all()
+        db.session.execute(
+            delete(cls.model).where(
+                cls.model.image_id.in_(image_ids),
+                ~exists().where(
+                    Comment.image_id == cls.model.image_id,
+                    Comment.user_id == cls.model.user_id,
+                ),
+            )
+        )
+        db.session.commit()
+
+        users_commented_counts: Dict[UUID, int] = {}
+        for image_id in commented_image_ids:
+            users_commented_counts[image_id] = (
+                users_commented_counts.get(image_id, 0) + 1
+            )
+        return users_commented_counts
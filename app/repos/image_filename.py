@@ -0,0 +1,147 @@
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from app.models.image import Image
+from app.models.image_filename_counter import ImageFilenameCounter
+from app.services.core_services import db
+
+UNIQUE_USER_FILENAME = "unique_user_filename"
+
+
+class ImageFilenameRepo:
+    """Unique filenames for the images of a user.
+
+    A free filename is used as is. A taken one, ``photo.jpg``, gets the next
+    suffix of its ImageFilenameCounter: ``photo_1.jpg``, ``photo_2.jpg``...
+    Only the requested filenames are looked up, through the index of the
+    ``unique_user_filename`` constraint, so allocating a filename does not
+    slow down as the library of the user grows.
+
+    Suffixes are not handed out twice, even once their image is deleted.
+    Filenames are checked, not locked: a concurrent transaction may take one
+    before it is inserted, which ``is_conflict`` detects for a retry.
+    """
+
+    model = ImageFilenameCounter
+
+    @classmethod
+    def allocate(
+        cls,
+        user_id: UUID,
+        filenames: Sequence[str],
+        image_id: Optional[UUID] = None,
+    ) -> List[str]:
+        """Get a free filename of the user for every filename, all different.
+
+        The counters of taken filenames are updated in the current
+        transaction, and locked until it ends.
+
+        Args:
+            user_id (UUID): The owner of the images.
+            filenames (Sequence[str]): The requested filenames.
+            image_id (Optional[UUID]): The image being renamed, whose current
+                filename counts as free.
+        """
+        allocated: List[Optional[str]] = [None] * len(filenames)
+        used: Set[str] = set()
+        pending: Dict[str, List[int]] = defaultdict(list)
+        taken = cls.get_taken(user_id, filenames, image_id)
+        for index, filename in enumerate(filenames):
+            if filename in taken or filename in used:
+                pending[filename].append(index)
+            else:
+                allocated[index] = filename
+                used.add(filename)
+
+        reserve_factor = 1
+        while pending:
+            counts = {
+                filename: len(indexes) * reserve_factor
+                for filename, indexes in pending.items()
+            }
+            last_suffixes = cls._reserve_suffixes(user_id, counts)
+            candidates = {}
+            for filename, count in counts.items():
+                stem, extension = os.path.splitext(filename)
+                last_suffix = last_suffixes[filename]
+                candidates[filename] = [
+                    f"{stem}_{suffix}{extension}"
+                    for suffix in range(last_suffix - count + 1, last_suffix + 1)
+                ]
+            taken = cls.get_taken(
+                user_id,
+                [candidate for names in candidates.values() for candidate in names],
+                image_id,
+            )
+
+            next_pending: Dict[str, List[int]] = defaultdict(list)
+            for filename, indexes in pending.items():
+                free = (
+                    candidate
+                    for candidate in candidates[filename]
+                    if candidate not in taken and candidate not in used
+                )
+                for index in indexes:
+                    candidate = next(free, None)
+                    if candidate is None:
+                        next_pending[filename].append(index)
+                    else:
+                        allocated[index] = candidate
+                        used.add(candidate)
+            pending = next_pending
+            # Suffixes already taken, e.g. by images uploaded as photo_1.jpg,
+            # are skipped faster the more of them there are
+            reserve_factor *= 2
+        return allocated
+
+    @classmethod
+    def get_taken(
+        cls,
+        user_id: UUID,
+        filenames: Iterable[str],
+        image_id: Optional[UUID] = None,
+    ) -> Set[str]:
+        """Get the filenames among ``filenames`` that images of the user have."""
+        filenames = set(filenames)
+        if not filenames:
+            return set()
+        query = db.session.query(Image._filename).filter(
+            Image.user_id == user_id, Image._filename.in_(filenames)
+        )
+        if image_id is not None:
+            query = query.filter(Image.id != image_id)
+        return {filename for (filename,) in query}
+
+    @staticmethod
+    def is_conflict(error: IntegrityError) -> bool:
+        """Tell if an error is a filename taken by a concurrent transaction."""
+        diag = getattr(error.orig, "diag", None)
+        return getattr(diag, "constraint_name", None) == UNIQUE_USER_FILENAME
+
+    @classmethod
+    def _reserve_suffixes(cls, user_id: UUID, counts: Dict[str, int]) -> Dict[str, int]:
+        """Advance the counters of filenames by their counts, in one statement.
+
+        Returns:
+            Dict[str, int]: The last reserved suffix of every filename.
+        """
+        stmt = insert(cls.model).values(
+            [
+                {"user_id": user_id, "filename": filename, "last_suffix": count}
+                for filename, count in counts.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.model.user_id, cls.model.filename],
+            set_={
+                "last_suffix": cls.model.last_suffix + stmt.excluded.last_suffix,
+                "updated_at": datetime.now(),
+            },
+        ).returning(cls.model.filename, cls.model.last_suffix)
+        return {filename: suffix for filename, suffix in db.session.execute(stmt)}
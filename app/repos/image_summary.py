@@ -1,6 +1,11 @@
-from typing import List, Optional
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
 from uuid import UUID
 
+from sqlalchemy import Numeric, case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
 from app.models.image_summary import ImageSummary
 from app.services.core_services import db
 
@@ -36,6 +41,143 @@ class ImageSummaryRepo:
             db.session.commit()
         return summary
 
+    @classmethod
+    def apply_comment_delta(
+        cls,
+        image_id: UUID,
+        comment_count_delta: int = 0,
+        comment_length_delta: int = 0,
+        users_commented_delta: int = 0,
+    ) -> None:
+        """Atomically shift the comment aggregates of an image's summary.
+
+        The summary row is created on first use and its comment revision is
+        bumped so the text summary is known to be stale.
+        """
+        comment_count = cls.model.comment_count + comment_count_delta
+        total_comment_length = cls.model.total_comment_length + comment_length_delta
+        stmt = insert(cls.model).values(
+            image_id=image_id,
+            comment_count=max(comment_count_delta, 0),
+            total_comment_length=max(comment_length_delta, 0),
+            average_comment_length=max(comment_length_delta, 0),
+            users_commented_count=max(users_commented_delta, 0),
+            comment_revision=1,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.model.image_id],
+            set_={
+                "comment_count": comment_count,
+                "total_comment_length": total_comment_length,
+                # Rounded like ImageSummary.get_average_comment_length
+                "average_comment_length": case(
+                    (
+                        comment_count > 0,
+                        func.round(cast(total_comment_length, Numeric) / comment_count),
+                    ),
+                    else_=0,
+                ),
+                "users_commented_count": cls.model.users_commented_count
+                + users_commented_delta,
+                "comment_revision": cls.model.comment_revision + 1,
+                "updated_at": datetime.now(),
+            },
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+
+    @classmethod
+    def update_text_summary(
+        cls,
+        image_id: UUID,
+        summary_revision: int,
+        comment_summary: str,
+        summary_strategy: str,
+        summary_fingerprint: Optional[str],
+        sentiment_score: int,
+    ) -> bool:
+        """Store a text summary computed at the given comment revision.
+
+        Results computed from an older revision than the one already stored
+        are discarded.
+
+        Returns:
+            bool: True if the summary was stored.
+        """
+        stmt = (
+            update(cls.model)
+            .where(
+                cls.model.image_id == image_id,
+                cls.model.summary_revision < summary_revision,
+            )
+            .values(
+                comment_summary=comment_summary,
+                summary_strategy=summary_strategy,
+                summary_fingerprint=summary_fingerprint,
+                sentiment_score=sentiment_score,
+                summary_revision=summary_revision,
+            )
+        )
+        result = db.session.execute(stmt)
+        db.session.commit()
+        return result.rowcount > 0
+
+    @classmethod
+    def get_comment_revisions(cls, image_ids: Sequence[UUID]) -> Dict[UUID, int]:
+        """Get the comment revision of the summaries of several images.
+
+        Returns:
+            Dict[UUID, int]: The comment revision per image, for the images
+            that have a summary.
+        """
+        rows = db.session.execute(
+            select(cls.model.image_id, cls.model.comment_revision).where(
+                cls.model.image_id.in_(image_ids)
+            )
+        ).all()
+        return {image_id: comment_revision for image_id, comment_revision in rows}
+
+    @classmethod
+    def bulk_upsert(cls, summaries: Sequence[dict]) -> List[UUID]:
+        """Insert or overwrite the summaries of many images in one statement.
+
+        Each summary dict holds ImageSummary column values keyed by column
+        name and must include ``image_id`` and the ``comment_revision`` the
+        summary was computed at, read before its comments. An existing row is
+        only overwritten if no comment was written since, and is then marked
+        as up to date.
+
+        Returns:
+            List[UUID]: The images whose summary was written.
+        """
+        if not summaries:
+            return []
+        now = datetime.now()
+        stmt = insert(cls.model).values(
+            [
+                {"id": uuid.uuid4(), "created_at": now, "updated_at": now, **summary}
+                for summary in summaries
+            ]
+        )
+        updated_columns = {
+            key
+            for summary in summaries
+            for key in summary
+            if key not in ("image_id", "comment_revision")
+        }
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.model.image_id],
+            set_={
+                **{key: stmt.excluded[key] for key in updated_columns},
+                "summary_revision": cls.model.comment_revision,
+                "updated_at": now,
+            },
+            where=cls.model.comment_revision == stmt.excluded.comment_revision,
+        ).returning(cls.model.image_id)
+        written = db.session.execute(stmt).scalars().all()
+        db.session.commit()
+        return written
+
     @classmethod
     def delete(cls, summary_id: UUID) -> bool:
         summary = cls.model.query.get(summary_id)
@@ -0,0 +1,144 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.upload_session import UploadChunk, UploadSession
+from app.models.user import User
+from app.services.core_services import db
+
+
+class UploadSessionRepo:
+    model = UploadSession
+
+    @classmethod
+    def create(
+        cls,
+        user_id: UUID,
+        filename: str,
+        total_size: int,
+        expires_at: datetime,
+        is_public: bool = False,
+    ) -> UploadSession:
+        upload_session = cls.model(
+            user_id=user_id,
+            filename=filename,
+            total_size=total_size,
+            expires_at=expires_at,
+            is_public=is_public,
+        )
+        db.session.add(upload_session)
+        db.session.commit()
+        return upload_session
+
+    @classmethod
+    def get_by_id(cls, session_id: UUID, user_id: UUID) -> Optional[UploadSession]:
+        """Get an unexpired upload session owned by the user."""
+        return cls.model.query.filter(
+            cls.model.id == session_id,
+            cls.model.user_id == user_id,
+            cls.model.expires_at > datetime.now(),
+            cls.model.completing.is_(False),
+        ).first()
+
+    @classmethod
+    def lock_usage(cls, user_id: UUID) -> Tuple[int, int]:
+        """Lock the user for creating an upload session and get its open ones.
+
+        The user row stays locked until the transaction ends, so concurrent
+        checks of the same user wait for the session created after this one.
+
+        Returns:
+            Tuple[int, int]: The number of unexpired sessions of the user and
+            the bytes they reserve.
+        """
+        db.session.execute(select(User.id).where(User.id == user_id).with_for_update())
+        open_sessions, reserved_bytes = (
+            db.session.query(
+                func.count(cls.model.id),
+                func.coalesce(func.sum(cls.model.total_size), 0),
+            )
+            .filter(cls.model.user_id == user_id, cls.model.expires_at > datetime.now())
+            .one()
+        )
+        return open_sessions, reserved_bytes
+
+    @classmethod
+    def get_expired(cls, user_id: UUID) -> List[UploadSession]:
+        return cls.model.query.filter(
+            cls.model.user_id == user_id, cls.model.expires_at <= datetime.now()
+        ).all()
+
+    @classmethod
+    def claim(cls, session_id: UUID) -> bool:
+        """Mark an unexpired upload session as being completed.
+
+        The row is locked while it is checked, so only one of concurrent calls
+        claims the session. Claimed sessions are not found by ``get_by_id``.
+
+        Returns:
+            bool: Whether the session was claimed.
+        """
+        upload_session = (
+            cls.model.query.filter(
+                cls.model.id == session_id,
+                cls.model.expires_at > datetime.now(),
+                cls.model.completing.is_(False),
+            )
+            .with_for_update()
+            .first()
+        )
+        if upload_session:
+            upload_session.completing = True
+        db.session.commit()
+        return upload_session is not None
+
+    @classmethod
+    def unclaim(cls, session_id: UUID) -> None:
+        """Make a claimed upload session available again, see ``claim``."""
+        db.session.execute(
+            update(cls.model)
+            .where(cls.model.id == session_id)
+            .values(completing=False, updated_at=datetime.now())
+        )
+        db.session.commit()
+
+    @classmethod
+    def record_chunk(cls, session_id: UUID, offset: int, length: int) -> None:
+        """Record that ``length`` bytes were written at ``offset``.
+
+        Re-sending a chunk at the same offset keeps the longest write.
+        """
+        stmt = (
+            insert(UploadChunk)
+            .values(session_id=session_id, offset=offset, length=length)
+            .on_conflict_do_update(
+                index_elements=[UploadChunk.session_id, UploadChunk.offset],
+                set_={
+                    "length": func.greatest(UploadChunk.length, length),
+                    "updated_at": datetime.now(),
+                },
+            )
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+
+    @classmethod
+    def get_chunk_ranges(cls, session_id: UUID) -> List[Tuple[int, int]]:
+        """Get the ``(offset, length)`` of every written chunk, by offset."""
+        return [
+            (offset, length)
+            for offset, length in db.session.query(
+                UploadChunk.offset, UploadChunk.length
+            )
+            .filter(UploadChunk.session_id == session_id)
+            .order_by(UploadChunk.offset)
+        ]
+
+    @classmethod
+    def delete(cls, session_id: UUID) -> bool:
+        result = db.session.execute(delete(cls.model).where(cls.model.id == session_id))
+        db.session.commit()
+        return result.rowcount > 0
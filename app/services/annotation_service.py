@@ -1,17 +1,52 @@
+import atexit
+import logging
+import multiprocessing
 import random
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence
 from uuid import UUID
 
 from flask import Flask
 
 from app.enums import AnnotationStatus
-from app.errors import ImageNotFound
 from app.repos.annotation import AnnotationRepo
 from app.repos.image import ImageRepo
+from app.services.annotator import (
+    BatchAnnotator,
+    RandomAnnotator,
+    load_annotator,
+    prepare_image,
+)
+from app.services.blob_store import ImageSource
+from app.services.image_service import ImageService
+
+logger = logging.getLogger(__name__)
+
+
+class BatchResult(NamedTuple):
+    # Images moved to Success
+    annotated: List[UUID]
+    # Why an image failed; it is left Processing
+    failed: Dict[UUID, str]
+    # Images that are gone or were not waiting for annotation
+    skipped: List[UUID]
 
 
 class AnnotationService:
+    """Annotate images in batches with the configured BatchAnnotator.
+
+    The images of a batch are decoded and prepared on a process pool of
+    ``ANNOTATION_PREPARE_POOL_SIZE`` processes, annotated together, and
+    their statuses and annotations written with one statement each.
+    """
+
     MIN_MOCK_ANNOTATION_NUMBER: int = 2
 
+    annotator: BatchAnnotator = RandomAnnotator()
+    _pool_size: Optional[int] = None
+    _executor: Optional[ProcessPoolExecutor] = None
+
     @classmethod
     def _create_random_annotation(cls) -> None:
         name = "Annotation" + str(random.randint(1, 100))
@@ -20,6 +55,13 @@ class AnnotationService:
 
     @classmethod
     def initialize(cls, app: Flask) -> None:
+        cls.shutdown()
+        cls.annotator = load_annotator(
+            app.config.get("ANNOTATOR", "app.services.annotator:RandomAnnotator")
+        )
+        cls._pool_size = app.config.get("ANNOTATION_PREPARE_POOL_SIZE")
+        cls._executor = cls._create_executor()
+        atexit.register(cls.shutdown)
         with app.app_context():
             try:
                 all_annotations = AnnotationRepo.get_all()
@@ -33,27 +75,86 @@ class AnnotationService:
                 raise e
 
     @classmethod
-    def simulate_annotation(cls, image_id: UUID, requesting_user_id: UUID) -> None:
-        try:
-            image = ImageRepo.get_by_id(image_id, requesting_user_id)
-            if not image:
-                raise ImageNotFound("Image not found")
-            if image.annotation_status == AnnotationStatus.Queued.value:
-                ImageRepo.update(
-                    image_id=image_id, annotation_status=AnnotationStatus.Processing
-                )
-            elif image.annotation_status == AnnotationStatus.Processing.value:
-                ImageRepo.update(
-                    image_id=image_id, annotation_status=AnnotationStatus.Success
+    def shutdown(cls) -> None:
+        if cls._executor:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    @classmethod
+    def annotate_batch(cls, image_ids: Sequence[UUID]) -> BatchResult:
+        """Annotate images together.
+
+        The images move from Queued, or from Processing if an earlier attempt
+        did not finish, to Processing, and then to Success with their
+        annotations. An image that cannot be prepared or annotated is left
+        Processing, for AnnotationWorkerService to retry.
+        """
+        started = ImageRepo.transition_annotation_status(
+            image_ids,
+            AnnotationStatus.Processing,
+            from_status=(AnnotationStatus.Queued, AnnotationStatus.Processing),
+        )
+        failed: Dict[UUID, str] = {}
+        futures: Dict[UUID, Future] = {}
+        for image in ImageRepo.get_many(started):
+            source = ImageService.get_image_source(image)
+            if source is None:
+                failed[image.id] = "Image has no content"
+            else:
+                futures[image.id] = cls._submit(source)
+        prepared = {}
+        for image_id, future in futures.items():
+            try:
+                prepared[image_id] = future.result()
+            except Exception as e:
+                failed[image_id] = f"Preparing the image failed: {e!r}"
+
+        annotation_ids = {}
+        if prepared:
+            # Loaded once for the whole batch
+            vocabulary = AnnotationRepo.get_ids_by_name()
+            try:
+                names = cls.annotator.annotate(
+                    list(prepared.values()), list(vocabulary)
                 )
-                all_annotations = AnnotationRepo.get_all()
-                if (
-                    all_annotations
-                    and len(all_annotations) >= cls.MIN_MOCK_ANNOTATION_NUMBER
-                ):
-                    random_annotations = random.sample(
-                        all_annotations, cls.MIN_MOCK_ANNOTATION_NUMBER
+                if len(names) != len(prepared):
+                    raise ValueError(
+                        f"Got {len(names)} results for {len(prepared)} images"
                     )
-                    ImageRepo.update(image_id, annotations=random_annotations)
-        except Exception as e:
-            raise e
+            except Exception as e:
+                logger.exception("Annotating %s images failed", len(prepared))
+                failed.update({image_id: repr(e) for image_id in prepared})
+                names = []
+            for image_id, image_names in zip(prepared, names):
+                unknown = [name for name in image_names if name not in vocabulary]
+                if unknown:
+                    failed[image_id] = f"Unknown annotations {unknown}"
+                else:
+                    annotation_ids[image_id] = [
+                        vocabulary[name] for name in image_names
+                    ]
+
+        annotated = ImageRepo.complete_annotation(annotation_ids)
+        done = set(annotated) | set(failed)
+        skipped = [image_id for image_id in image_ids if image_id not in done]
+        return BatchResult(annotated, failed, skipped)
+
+    @classmethod
+    def _create_executor(cls) -> ProcessPoolExecutor:
+        # Workers are started lazily, when tasks are submitted
+        return ProcessPoolExecutor(
+            max_workers=cls._pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    @classmethod
+    def _submit(cls, source: ImageSource) -> Future:
+        if cls._executor is None:
+            cls._executor = cls._create_executor()
+        try:
+            return cls._executor.submit(prepare_image, cls.annotator, source)
+        except BrokenProcessPool:
+            # A worker died and took the pool down; start a new one
+            logger.warning("Annotation pool is broken, restarting it")
+            cls._executor = cls._create_executor()
+            return cls._executor.submit(prepare_image, cls.annotator, source)
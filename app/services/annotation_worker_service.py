@@ -0,0 +1,241 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from flask import Flask
+
+from app.enums import AnnotationStatus
+from app.repos.annotation_job import AnnotationJobRepo, ClaimedJob
+from app.repos.image import ImageRepo
+from app.services.core_services import db
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotationWorkerService:
+    """Annotate images in the background, see AnnotationService.annotate_batch.
+
+    An image gets an AnnotationJob once it has content. Every instance of
+    the service runs ``ANNOTATION_WORKER_POOL_SIZE`` worker threads that
+    claim jobs from the database, so the work is spread over all instances
+    without a message broker. A worker annotates its jobs in micro-batches
+    of ``ANNOTATION_JOB_BATCH_SIZE`` images, or fewer once the first one
+    waited ``ANNOTATION_BATCH_MAX_WAIT_SECONDS``.
+
+    A claimed job is leased for ``ANNOTATION_JOB_LEASE_SECONDS`` and its
+    lease extended by a heartbeat while the instance runs; the jobs of a
+    crashed instance are claimed again once their lease expires. A job that
+    fails ``ANNOTATION_JOB_MAX_ATTEMPTS`` times moves its image to Fail.
+
+    The workers of an app start with the first request it serves, if
+    ``ANNOTATION_WORKER_ENABLED`` is set, so CLI commands and tests never
+    claim jobs. They start in the process serving the requests, after any
+    fork of the server.
+    """
+
+    batch_size: int = 10
+    batch_max_wait_seconds: float = 0.2
+    lease_seconds: float = 60
+    max_attempts: int = 3
+    poll_seconds: float = 1.0
+
+    _stop: Optional[threading.Event] = None
+    # Notified when jobs are added or the workers stop
+    _wakeup = threading.Condition()
+    _threads: List[threading.Thread] = []
+    _worker_ids: List[str] = []
+    _start_lock = threading.Lock()
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        """Configure the annotation workers and start them with the first request."""
+        cls.shutdown()
+        cls.batch_size = app.config.get("ANNOTATION_JOB_BATCH_SIZE", cls.batch_size)
+        cls.batch_max_wait_seconds = app.config.get(
+            "ANNOTATION_BATCH_MAX_WAIT_SECONDS", cls.batch_max_wait_seconds
+        )
+        cls.lease_seconds = app.config.get(
+            "ANNOTATION_JOB_LEASE_SECONDS", cls.lease_seconds
+        )
+        cls.max_attempts = app.config.get(
+            "ANNOTATION_JOB_MAX_ATTEMPTS", cls.max_attempts
+        )
+        cls.poll_seconds = app.config.get(
+            "ANNOTATION_WORKER_POLL_SECONDS", cls.poll_seconds
+        )
+
+        @app.before_request
+        def start_annotation_workers() -> None:
+            if cls._stop is None and app.config.get("ANNOTATION_WORKER_ENABLED"):
+                cls.start(app)
+
+    @classmethod
+    def start(cls, app: Flask) -> None:
+        """Start the ``ANNOTATION_WORKER_POOL_SIZE`` workers, unless they run already."""
+        with cls._start_lock:
+            if cls._stop is not None:
+                return
+            # Unique per start, as restarted containers may get the same pid
+            prefix = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            cls._stop = threading.Event()
+            cls._worker_ids = [
+                f"{prefix}-{index}"
+                for index in range(app.config.get("ANNOTATION_WORKER_POOL_SIZE", 2))
+            ]
+            cls._threads = [
+                threading.Thread(
+                    target=cls._work,
+                    args=(app, worker_id, cls._stop),
+                    name=f"annotation-worker-{index}",
+                    daemon=True,
+                )
+                for index, worker_id in enumerate(cls._worker_ids)
+            ]
+            cls._threads.append(
+                threading.Thread(
+                    target=cls._heartbeat,
+                    args=(app, list(cls._worker_ids), cls._stop),
+                    name="annotation-heartbeat",
+                    daemon=True,
+                )
+            )
+            for thread in cls._threads:
+                thread.start()
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def enqueue(cls, image_ids: Iterable[UUID]) -> None:
+        """Add annotation jobs for images, picked up by the workers of any instance."""
+        AnnotationJobRepo.enqueue(image_ids)
+        with cls._wakeup:
+            cls._wakeup.notify_all()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop the workers once they finish the images they are annotating.
+
+        Jobs claimed but not started are given back.
+        """
+        with cls._start_lock:
+            if cls._stop is None:
+                return
+            with cls._wakeup:
+                cls._stop.set()
+                cls._wakeup.notify_all()
+            for thread in cls._threads:
+                thread.join()
+            cls._stop = None
+            cls._threads = []
+            cls._worker_ids = []
+
+    @classmethod
+    def _work(cls, app: Flask, worker_id: str, stop: threading.Event) -> None:
+        while not stop.is_set():
+            jobs: List[ClaimedJob] = []
+            try:
+                with app.app_context():
+                    jobs = cls._claim_batch(worker_id, stop)
+                    if stop.is_set():
+                        AnnotationJobRepo.release(
+                            [job.image_id for job in jobs],
+                            worker_id,
+                            count_attempt=False,
+                        )
+                    elif jobs:
+                        cls._run_batch(jobs, worker_id)
+            except Exception:
+                logger.exception("Annotation worker %s failed", worker_id)
+            if not jobs:
+                cls._wait(stop, cls.poll_seconds)
+
+    @classmethod
+    def _claim_batch(cls, worker_id: str, stop: threading.Event) -> List[ClaimedJob]:
+        """Claim a micro-batch of jobs.
+
+        Jobs are claimed until there are ``batch_size`` of them, or the first
+        one waited ``batch_max_wait_seconds``.
+        """
+        jobs = AnnotationJobRepo.claim(worker_id, cls.batch_size, cls.lease_seconds)
+        deadline = time.monotonic() + cls.batch_max_wait_seconds
+        while jobs and len(jobs) < cls.batch_size and not stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            cls._wait(stop, min(remaining, cls.poll_seconds))
+            jobs += AnnotationJobRepo.claim(
+                worker_id, cls.batch_size - len(jobs), cls.lease_seconds
+            )
+        return jobs
+
+    @classmethod
+    def _wait(cls, stop: threading.Event, timeout: float) -> None:
+        """Wait until jobs are added, the workers stop or ``timeout`` passes."""
+        with cls._wakeup:
+            if not stop.is_set():
+                cls._wakeup.wait(timeout)
+
+    @classmethod
+    def _run_batch(cls, jobs: List[ClaimedJob], worker_id: str) -> None:
+        # Imported here to avoid circular imports
+        from app.services.annotation_service import AnnotationService
+
+        attempts = {job.image_id: job.attempts for job in jobs}
+        # The last attempt of these never finished, e.g. their instance crashed
+        exhausted = [job.image_id for job in jobs if job.attempts > cls.max_attempts]
+        runnable = [job.image_id for job in jobs if job.attempts <= cls.max_attempts]
+        try:
+            result = AnnotationService.annotate_batch(runnable)
+            failed = result.failed
+            done = result.annotated + result.skipped
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Annotating a batch of %s images failed", len(runnable))
+            failed = {image_id: repr(e) for image_id in runnable}
+            done = []
+
+        retries: Dict[str, List[UUID]] = defaultdict(list)
+        for image_id, error in failed.items():
+            logger.warning(
+                "Annotating image %s failed, attempt %s of %s: %s",
+                image_id,
+                attempts[image_id],
+                cls.max_attempts,
+                error,
+            )
+            if attempts[image_id] >= cls.max_attempts:
+                exhausted.append(image_id)
+            else:
+                retries[error].append(image_id)
+
+        retry_ids = [
+            image_id for image_ids in retries.values() for image_id in image_ids
+        ]
+        ImageRepo.transition_annotation_status(
+            retry_ids, AnnotationStatus.Queued, from_status=AnnotationStatus.Processing
+        )
+        for error, image_ids in retries.items():
+            AnnotationJobRepo.release(image_ids, worker_id, error=error)
+        ImageRepo.transition_annotation_status(
+            exhausted,
+            AnnotationStatus.Fail,
+            from_status=(AnnotationStatus.Queued, AnnotationStatus.Processing),
+        )
+        AnnotationJobRepo.complete(done + exhausted, worker_id)
+
+    @classmethod
+    def _heartbeat(
+        cls, app: Flask, worker_ids: List[str], stop: threading.Event
+    ) -> None:
+        while not stop.wait(cls.lease_seconds / 3):
+            try:
+                with app.app_context():
+                    AnnotationJobRepo.heartbeat(worker_ids, cls.lease_seconds)
+            except Exception:
+                logger.exception("Extending annotation job leases failed")
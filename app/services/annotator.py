@@ -0,0 +1,75 @@
+import importlib
+import io
+import random
+from abc import ABC, abstractmethod
+from typing import Any, List, Sequence, Tuple, Union
+
+from PIL import Image as PilImage
+from PIL import ImageOps
+
+# Same as blob_store.ImageSource; this module is kept light to import, as
+# every process of the annotation pool imports it
+ImageSource = Union[str, bytes]
+
+
+class BatchAnnotator(ABC):
+    """Annotates images in batches, like an image classification model.
+
+    Set ``ANNOTATOR`` to the ``module:Class`` of a subclass to use it. Every
+    image is first passed to ``prepare`` in a process of the annotation
+    pool, so the annotator must be picklable; the prepared images of a batch
+    are then passed to ``annotate`` together.
+    """
+
+    # Width and height of the prepared images
+    input_size: Tuple[int, int] = (224, 224)
+
+    def prepare(self, source: ImageSource) -> Any:
+        """Decode an image into the input of ``annotate``.
+
+        Returns:
+            Any: The RGB pixels of the image, cropped and scaled to
+            ``input_size``.
+        """
+        with PilImage.open(
+            io.BytesIO(source) if isinstance(source, bytes) else source
+        ) as image:
+            # Let the JPEG decoder downscale while decoding
+            image.draft("RGB", self.input_size)
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            return ImageOps.fit(image, self.input_size).tobytes()
+
+    @abstractmethod
+    def annotate(self, images: Sequence[Any], vocabulary: List[str]) -> List[List[str]]:
+        """Get the names of the annotations of every prepared image.
+
+        Args:
+            images (Sequence[Any]): The results of ``prepare``.
+            vocabulary (List[str]): The names of all annotations.
+
+        Returns:
+            List[List[str]]: Names from ``vocabulary``, in the order of
+            ``images``.
+        """
+
+
+class RandomAnnotator(BatchAnnotator):
+    """Picks random annotations, standing in for a real model."""
+
+    annotation_count: int = 2
+
+    def annotate(self, images: Sequence[Any], vocabulary: List[str]) -> List[List[str]]:
+        if len(vocabulary) < self.annotation_count:
+            return [[] for _ in images]
+        return [random.sample(vocabulary, self.annotation_count) for _ in images]
+
+
+def load_annotator(path: str) -> BatchAnnotator:
+    """Create the annotator of a ``module:Class`` path."""
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def prepare_image(annotator: BatchAnnotator, source: ImageSource) -> Any:
+    """Run in an AnnotationService worker process."""
+    return annotator.prepare(source)
@@ -0,0 +1,244 @@
+import struct
+import tarfile
+import zlib
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple
+
+from app.errors import InvalidArchive
+
+LOCAL_FILE_HEADER = struct.Struct("<4s5H3L2H")
+LOCAL_FILE_SIGNATURE = b"PK\x03\x04"
+CENTRAL_DIRECTORY_SIGNATURE = b"PK\x01\x02"
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    # The content, which must be read before the next entry is
+    chunks: Iterator[bytes]
+
+
+def iter_tar_entries(
+    stream: BinaryIO, block_size: int = 1024 * 1024
+) -> Iterator[ArchiveEntry]:
+    """Read the files of a tar archive, compressed or not, in one pass.
+
+    Raises:
+        InvalidArchive: If the stream is not a readable tar archive.
+    """
+    try:
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for member in archive:
+                if member.isfile():
+                    file = archive.extractfile(member)
+                    yield ArchiveEntry(member.name, _read_tar_file(file, block_size))
+    except (tarfile.TarError, EOFError, zlib.error) as e:
+        raise InvalidArchive(str(e)) from e
+
+
+def iter_zip_entries(
+    stream: BinaryIO, block_size: int = 1024 * 1024
+) -> Iterator[ArchiveEntry]:
+    """Read the files of a zip archive in one pass.
+
+    Entries are found by their local headers, so the central directory at
+    the end of the archive is never needed. Entries written by streaming
+    zippers, with sizes in a data descriptor after the content, must be
+    deflated: the end of their content is found by decompressing it.
+
+    Raises:
+        InvalidArchive: If the stream is not a readable zip archive, or an
+            entry is encrypted or compressed with another method.
+    """
+    reader = _StreamReader(stream)
+    is_first = True
+    while True:
+        signature = reader.read_exact(4)
+        if signature in (
+            CENTRAL_DIRECTORY_SIGNATURE,
+            END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+        ):
+            return
+        if signature != LOCAL_FILE_SIGNATURE:
+            raise InvalidArchive(
+                "Not a zip archive" if is_first else "Unexpected data in zip archive"
+            )
+        is_first = False
+
+        (
+            _,
+            _,
+            flags,
+            method,
+            _,
+            _,
+            crc,
+            compressed_size,
+            size,
+            name_length,
+            extra_length,
+        ) = LOCAL_FILE_HEADER.unpack(signature + reader.read_exact(26))
+        encoded_name = reader.read_exact(name_length)
+        name = encoded_name.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+        extra = reader.read_exact(extra_length)
+
+        if flags & FLAG_ENCRYPTED:
+            raise InvalidArchive(f"{name}: encrypted entries are not supported")
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            raise InvalidArchive(
+                f"{name}: compression method {method} is not supported"
+            )
+
+        is_zip64 = ZIP64_LIMIT in (compressed_size, size)
+        if is_zip64:
+            size, compressed_size = _read_zip64_sizes(extra, size, compressed_size)
+        has_descriptor = bool(flags & FLAG_DATA_DESCRIPTOR)
+        if has_descriptor and method == METHOD_STORED and not compressed_size:
+            raise InvalidArchive(
+                f"{name}: stored entries of unknown size are not supported"
+            )
+
+        chunks = _read_zip_entry(
+            reader,
+            name,
+            method,
+            compressed_size if not has_descriptor or compressed_size else None,
+            None if has_descriptor else crc,
+            has_descriptor,
+            is_zip64,
+            block_size,
+        )
+        if not name.endswith("/"):
+            yield ArchiveEntry(name, chunks)
+        # Skip whatever the caller did not read
+        for _ in chunks:
+            pass
+
+
+class _StreamReader:
+    """Reads a stream front to back, taking back data read too far."""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._pushed_back = b""
+
+    def read(self, size: int) -> bytes:
+        """Read up to ``size`` bytes, fewer only at the end of the stream."""
+        if not size:
+            # Request streams take an empty read for a dropped connection
+            return b""
+        if self._pushed_back:
+            data = self._pushed_back[:size]
+            self._pushed_back = self._pushed_back[size:]
+            return data
+        return self._stream.read(size)
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        while len(data) < size:
+            more = self.read(size - len(data))
+            if not more:
+                raise InvalidArchive("Unexpected end of archive")
+            data += more
+        return data
+
+    def push_back(self, data: bytes) -> None:
+        self._pushed_back = data + self._pushed_back
+
+
+def _read_tar_file(file: BinaryIO, block_size: int) -> Iterator[bytes]:
+    try:
+        while chunk := file.read(block_size):
+            yield chunk
+    except (tarfile.TarError, EOFError, zlib.error) as e:
+        raise InvalidArchive(str(e)) from e
+
+
+def _read_zip64_sizes(extra: bytes, size: int, compressed_size: int) -> Tuple[int, int]:
+    offset = 0
+    while offset + 4 <= len(extra):
+        field_id, field_length = struct.unpack_from("<2H", extra, offset)
+        offset += 4
+        if field_id == ZIP64_EXTRA_ID:
+            # Only the sizes that did not fit the header are in the field
+            field = extra[offset : offset + field_length]
+            values = list(struct.unpack_from(f"<{len(field) // 8}Q", field))
+            if size == ZIP64_LIMIT and values:
+                size = values.pop(0)
+            if compressed_size == ZIP64_LIMIT and values:
+                compressed_size = values.pop(0)
+            return size, compressed_size
+        offset += field_length
+    raise InvalidArchive("Missing zip64 sizes")
+
+
+def _read_zip_entry(
+    reader: _StreamReader,
+    name: str,
+    method: int,
+    compressed_size: Optional[int],
+    crc: Optional[int],
+    has_descriptor: bool,
+    is_zip64: bool,
+    block_size: int,
+) -> Iterator[bytes]:
+    """Read the content of a zip entry, checking its CRC.
+
+    Args:
+        compressed_size: The size of the stored content, None if unknown.
+        crc: The CRC of the content, None if it is in the data descriptor.
+    """
+    decompressor = None
+    if method == METHOD_DEFLATED:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    remaining = compressed_size
+    checksum = 0
+
+    while remaining is None or remaining > 0:
+        data = reader.read(
+            block_size if remaining is None else min(block_size, remaining)
+        )
+        if not data:
+            raise InvalidArchive(f"{name}: unexpected end of archive")
+        if remaining is not None:
+            remaining -= len(data)
+        if decompressor is None:
+            checksum = zlib.crc32(data, checksum)
+            yield data
+            continue
+
+        while True:
+            try:
+                # Bounded output, so a zip bomb is read a block at a time
+                chunk = decompressor.decompress(data, block_size)
+            except zlib.error as e:
+                raise InvalidArchive(f"{name}: {e}") from e
+            data = decompressor.unconsumed_tail
+            if chunk:
+                checksum = zlib.crc32(chunk, checksum)
+                yield chunk
+            if decompressor.eof or not (data or chunk):
+                break
+        if decompressor.eof:
+            reader.push_back(decompressor.unused_data)
+            break
+
+    if decompressor is not None and not decompressor.eof:
+        raise InvalidArchive(f"{name}: truncated compressed data")
+    if has_descriptor:
+        descriptor = reader.read_exact(4)
+        if descriptor == DATA_DESCRIPTOR_SIGNATURE:
+            descriptor = reader.read_exact(4)
+        (crc,) = struct.unpack("<L", descriptor)
+        reader.read_exact(16 if is_zip64 else 8)
+    if checksum != crc:
+        raise InvalidArchive(f"{name}: CRC check failed")
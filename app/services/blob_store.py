@@ -0,0 +1,346 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import BinaryIO, NamedTuple, Optional, Tuple, Union
+
+from flask import Flask, current_app
+
+from app.repos.image_blob import ImageBlobRepo
+from app.services.pack_store import PackRef, PackStore
+from app.services.storage_backend import StorageBackend, create_storage_backend
+
+# Content of a stored image: the path of its file, or the bytes of a packed blob
+ImageSource = Union[str, bytes]
+
+
+class BlobRef(NamedTuple):
+    sha256: str
+    size: int
+
+
+class BlobStore:
+    """Content-addressed storage for image files.
+
+    Every distinct content is stored once under its SHA-256 and reference
+    counted by the images using it (``Image.blob_sha256``); the per-user
+    image paths are hard links to the blobs. ``put_*`` take a reference that
+    the caller hands to an image or gives back with ``release``.
+
+    Blob contents are kept by the ``STORAGE_BACKEND``. With the local
+    backend the blob folder is the store itself; with a remote one it holds
+    this host's copies of the blobs it wrote or read, see ``get_blob_file``.
+
+    Blobs of up to ``BLOB_PACK_MAX_BYTES`` are appended to pack segments
+    instead, see PackStore, as long as the backend is local. They have no
+    file to link to, so their images are read with ``read_packed``.
+    """
+
+    # Segments written to in the last minute may have blobs being recorded
+    COMPACT_MIN_AGE_SECONDS = 60
+
+    block_size: int = 1024 * 1024
+    pack_max_bytes: int = 0
+    backend: Optional[StorageBackend] = None
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.block_size = app.config.get("UPLOAD_BLOCK_SIZE", cls.block_size)
+        cls.pack_max_bytes = app.config.get("BLOB_PACK_MAX_BYTES", cls.pack_max_bytes)
+        cls.backend = create_storage_backend(app, local_folder=cls.get_blob_folder)
+        PackStore.initialize(app)
+
+    @classmethod
+    def get_blob_folder(cls) -> str:
+        return current_app.config.get("BLOB_FOLDER") or os.path.join(
+            current_app.config["UPLOAD_FOLDER"], ".blobs"
+        )
+
+    @classmethod
+    def is_local(cls) -> bool:
+        """True if the blob contents are files shared by every host.
+
+        Only then are image paths linked to the blobs: with a remote backend
+        a link exists on the host that made it alone, and would outlive the
+        image on the others.
+        """
+        return cls.backend is None or cls.backend.is_local
+
+    @classmethod
+    def get_blob_key(cls, sha256: str) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    @classmethod
+    def get_blob_path(cls, sha256: str) -> str:
+        return os.path.join(cls.get_blob_folder(), *cls.get_blob_key(sha256).split("/"))
+
+    @classmethod
+    def get_blob_file(cls, sha256: str) -> Optional[str]:
+        """Get the path of a local file with a blob's content.
+
+        Blobs of a remote backend are downloaded first if this host has no
+        copy yet.
+
+        Returns:
+            Optional[str]: The path, or None if the blob is not stored.
+        """
+        blob_path = cls.get_blob_path(sha256)
+        if os.path.exists(blob_path):
+            return blob_path
+        if cls.backend.is_local:
+            return None
+        try:
+            cls.backend.download(cls.get_blob_key(sha256), blob_path)
+        except FileNotFoundError:
+            return None
+        return blob_path
+
+    @classmethod
+    def get_source(cls, sha256: str) -> Optional[ImageSource]:
+        """Get the content of a blob for reading: its file, or its packed bytes."""
+        if os.path.exists(cls.get_blob_path(sha256)):
+            return cls.get_blob_path(sha256)
+        packed_content = cls.read_packed(sha256)
+        if packed_content is not None:
+            return packed_content
+        return cls.get_blob_file(sha256)
+
+    @classmethod
+    def get_pack_folder(cls) -> str:
+        return os.path.join(cls.get_blob_folder(), "packs")
+
+    @classmethod
+    def get_derivative_folder(cls, sha256: str) -> str:
+        """Get the folder for files derived from a blob, see DerivativeService."""
+        return f"{cls.get_blob_path(sha256)}.derivatives"
+
+    @classmethod
+    def put_stream(cls, stream: BinaryIO) -> BlobRef:
+        """Store the content of a stream and take a reference to its blob.
+
+        Seekable streams are hashed before anything is written, so content
+        that is already stored is not written again. Other streams are hashed
+        while they are written to a temporary file.
+        """
+        if stream.seekable():
+            start = stream.tell()
+            sha256, size = cls._hash_stream(stream)
+            if cls._acquire(sha256, size):
+                try:
+                    stream.seek(start)
+                    if cls._is_packable(size):
+                        cls._pack(sha256, stream.read())
+                    else:
+                        temp_path, _, _ = cls._write_temp_file(stream)
+                        cls._move_into_place(temp_path, sha256)
+                except Exception:
+                    cls.release(sha256)
+                    raise
+            return BlobRef(sha256, size)
+
+        temp_path, sha256, size = cls._write_temp_file(stream)
+        cls._store_file(temp_path, sha256, size)
+        return BlobRef(sha256, size)
+
+    @classmethod
+    def put_file(cls, path: str) -> BlobRef:
+        """Move a file into the store and take a reference to its blob.
+
+        The file must be on the same filesystem as the store. It is removed
+        instead if its content is already stored, or once it is packed.
+        """
+        with open(path, "rb") as file:
+            sha256, size = cls._hash_stream(file)
+        cls._store_file(path, sha256, size)
+        return BlobRef(sha256, size)
+
+    @classmethod
+    def link(cls, sha256: str, path: str) -> None:
+        """Make ``path`` a hard link to a blob, replacing any existing file.
+
+        Packed blobs have no file to link to; an existing file at ``path`` is
+        removed instead, so the image is read from the pack.
+        """
+        blob_path = cls.get_blob_path(sha256)
+        if not os.path.exists(blob_path):
+            if cls.is_packed(sha256):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                return
+            blob_path = cls.get_blob_file(sha256)
+            if blob_path is None:
+                raise FileNotFoundError(f"Blob {sha256} is not stored")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.link"
+        os.link(blob_path, temp_path)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def is_packed(cls, sha256: str) -> bool:
+        return ImageBlobRepo.get_pack_location(sha256) is not None
+
+    @classmethod
+    def read_packed(cls, sha256: str) -> Optional[bytes]:
+        """Read the content of a packed blob, or None if it is not packed."""
+        # A compaction may remove the segment between the lookup and the read,
+        # after which the blob is found in its new segment
+        for _ in range(2):
+            location = ImageBlobRepo.get_pack_location(sha256)
+            if location is None:
+                return None
+            try:
+                return PackStore.read(cls.get_pack_folder(), PackRef(*location))
+            except FileNotFoundError:
+                continue
+        return None
+
+    @classmethod
+    def compact_packs(cls, min_dead_ratio: float = 0.5) -> Tuple[int, int]:
+        """Reclaim the space of released packed blobs.
+
+        The live blobs of every sealed segment with at least
+        ``min_dead_ratio`` of released bytes are copied to the newest
+        segment, and the sealed segment is removed.
+
+        Returns:
+            Tuple[int, int]: The number of segments compacted and of bytes
+            reclaimed.
+        """
+        folder = cls.get_pack_folder()
+        live_bytes_by_segment = ImageBlobRepo.get_pack_usage()
+        compacted_count = 0
+        reclaimed_bytes = 0
+        # The newest segment is still being appended to
+        for segment in PackStore.get_segments(folder)[:-1]:
+            segment_path = PackStore.get_segment_path(folder, segment)
+            if time.time() - os.path.getmtime(segment_path) < (
+                cls.COMPACT_MIN_AGE_SECONDS
+            ):
+                continue
+            segment_bytes = os.path.getsize(segment_path)
+            live_bytes = live_bytes_by_segment.get(segment, 0)
+            if segment_bytes and 1 - live_bytes / segment_bytes < min_dead_ratio:
+                continue
+
+            for sha256, offset, length in ImageBlobRepo.get_packed(segment):
+                data = PackStore.read(folder, PackRef(segment, offset, length))
+                ref = PackStore.append(folder, data)
+                ImageBlobRepo.set_pack_location(
+                    sha256, ref.segment, ref.offset, from_segment=segment
+                )
+            reclaimed_bytes += PackStore.remove_segment(folder, segment) - live_bytes
+            compacted_count += 1
+        return compacted_count, reclaimed_bytes
+
+    @classmethod
+    def release(cls, sha256: Optional[str]) -> bool:
+        """Drop a reference to a blob and delete it if it is no longer used.
+
+        Returns:
+            bool: True if the blob was garbage collected.
+        """
+        if not sha256:
+            return False
+        return ImageBlobRepo.release(sha256, collect=cls._remove_blob) == 0
+
+    @classmethod
+    def _acquire(cls, sha256: str, size: int) -> bool:
+        """Take a reference to a blob.
+
+        Returns:
+            bool: True if the blob content still has to be written.
+        """
+        ref_count = ImageBlobRepo.acquire(sha256, size)
+        if ref_count == 1:
+            return True
+        if os.path.exists(cls.get_blob_path(sha256)) or cls.is_packed(sha256):
+            return False
+        return cls.backend.is_local or not cls.backend.head(cls.get_blob_key(sha256))
+
+    @classmethod
+    def _is_packable(cls, size: int) -> bool:
+        # Packs are local, so blobs of a remote backend are never packed
+        return (
+            cls.backend.is_local
+            and 0 < cls.pack_max_bytes
+            and size <= (cls.pack_max_bytes)
+        )
+
+    @classmethod
+    def _pack(cls, sha256: str, data: bytes) -> None:
+        ref = PackStore.append(cls.get_pack_folder(), data)
+        ImageBlobRepo.set_pack_location(sha256, ref.segment, ref.offset)
+
+    @classmethod
+    def _store_file(cls, path: str, sha256: str, size: int) -> None:
+        """Take a reference to a blob, storing the file at ``path`` as its content.
+
+        The file is moved into the store, or packed and removed; it is only
+        removed if the content is already stored.
+        """
+        if cls._acquire(sha256, size):
+            if cls._is_packable(size):
+                try:
+                    with open(path, "rb") as file:
+                        cls._pack(sha256, file.read())
+                except Exception:
+                    cls.release(sha256)
+                    raise
+                os.remove(path)
+            else:
+                cls._move_into_place(path, sha256)
+        else:
+            os.remove(path)
+
+    @classmethod
+    def _hash_stream(cls, stream: BinaryIO) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        while block := stream.read(cls.block_size):
+            digest.update(block)
+            size += len(block)
+        return digest.hexdigest(), size
+
+    @classmethod
+    def _write_temp_file(cls, stream: BinaryIO) -> Tuple[str, str, int]:
+        temp_folder = os.path.join(cls.get_blob_folder(), "tmp")
+        os.makedirs(temp_folder, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=temp_folder)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                while block := stream.read(cls.block_size):
+                    digest.update(block)
+                    size += len(block)
+                    temp_file.write(block)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    @classmethod
+    def _move_into_place(cls, path: str, sha256: str) -> None:
+        cls.backend.put_file(cls.get_blob_key(sha256), path)
+        if cls.backend.is_local:
+            # The file is now linked at the blob path
+            os.remove(path)
+        else:
+            # Keep this host's copy, so the image can be linked to it
+            blob_path = cls.get_blob_path(sha256)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(path, blob_path)
+
+    @classmethod
+    def _remove_blob(cls, sha256: str) -> None:
+        cls.backend.delete(cls.get_blob_key(sha256))
+        try:
+            os.remove(cls.get_blob_path(sha256))
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(cls.get_derivative_folder(sha256), ignore_errors=True)
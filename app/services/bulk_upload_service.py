@@ -0,0 +1,223 @@
+import io
+import os
+import posixpath
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    BinaryIO,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+from uuid import UUID
+
+from flask import Flask, current_app
+from werkzeug.utils import secure_filename
+
+from app.errors import InvalidArchive
+from app.services.archive_stream import ArchiveEntry
+from app.services.blob_store import BlobRef, BlobStore
+from app.services.image_service import ImageService
+
+# Content of an entry waiting to be stored: in memory, or the path of a file
+SpooledContent = Union[io.BytesIO, str]
+
+
+class BulkUploadResult(NamedTuple):
+    # Name of the file in the request or archive
+    name: str
+    image_id: Optional[UUID] = None
+    filename: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkUploadReport(NamedTuple):
+    results: List[BulkUploadResult]
+    # Set if reading the request stopped early, e.g. on a corrupt archive
+    error: Optional[str] = None
+
+
+class BulkUploadService:
+    """Ingest many images of a user at once.
+
+    The files of a request or archive are read one after the other, each in
+    a single pass, and stored in the BlobStore by ``BULK_UPLOAD_WORKERS``
+    threads while the next files are read. Their images are created
+    ``BULK_UPLOAD_BATCH_SIZE`` at a time with one INSERT statement each.
+    """
+
+    max_workers: int = 4
+    batch_size: int = 500
+    max_files: int = 10_000
+    max_bytes: int = 100 * 1024 * 1024
+    spool_bytes: int = 8 * 1024 * 1024
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.max_workers = app.config.get("BULK_UPLOAD_WORKERS", cls.max_workers)
+        cls.batch_size = app.config.get("BULK_UPLOAD_BATCH_SIZE", cls.batch_size)
+        cls.max_files = app.config.get("BULK_UPLOAD_MAX_FILES", cls.max_files)
+        cls.max_bytes = app.config.get("UPLOAD_MAX_BYTES", cls.max_bytes)
+        cls.spool_bytes = app.config.get("BULK_UPLOAD_SPOOL_BYTES", cls.spool_bytes)
+
+    @classmethod
+    def upload(
+        cls, user_id: UUID, entries: Iterable[ArchiveEntry], is_public: bool = False
+    ) -> BulkUploadReport:
+        """Create an image of the user for every entry.
+
+        A file that cannot be stored fails on its own; the other files are
+        still uploaded.
+
+        Args:
+            user_id (UUID): The owner of the images.
+            entries (Iterable[ArchiveEntry]): The files, see archive_stream.
+            is_public (bool): The visibility of the images.
+
+        Returns:
+            BulkUploadReport: A result for every entry read, in order.
+        """
+        app = current_app._get_current_object()
+        results: List[Optional[BulkUploadResult]] = []
+        batch: List[Tuple[int, str, str, Future]] = []
+        error = None
+        # Bounds the entries held in memory while waiting for a worker
+        slots = threading.BoundedSemaphore(cls.max_workers * 2)
+
+        with ThreadPoolExecutor(max_workers=cls.max_workers) as executor:
+            try:
+                for entry in entries:
+                    if len(results) == cls.max_files:
+                        error = f"Only {cls.max_files} files can be uploaded at once"
+                        break
+                    index = len(results)
+                    results.append(None)
+                    filename = secure_filename(posixpath.basename(entry.name))
+                    if not filename:
+                        results[index] = BulkUploadResult(
+                            entry.name, error="Invalid filename"
+                        )
+                        continue
+                    slots.acquire()
+                    content = cls._spool(entry.chunks)
+                    if content is None:
+                        slots.release()
+                        results[index] = BulkUploadResult(
+                            entry.name, error="Image is too large"
+                        )
+                        continue
+                    future = executor.submit(cls._store, app, content, slots)
+                    batch.append((index, entry.name, filename, future))
+                    if len(batch) == cls.batch_size:
+                        cls._create_images(user_id, batch, results, is_public)
+                        batch = []
+            except InvalidArchive as e:
+                error = f"Invalid archive: {e}"
+            finally:
+                # Files already stored get their images even if reading failed
+                cls._create_images(user_id, batch, results, is_public)
+
+        return BulkUploadReport([result for result in results if result], error)
+
+    @classmethod
+    def _spool(cls, chunks: Iterator[bytes]) -> Optional[SpooledContent]:
+        """Read an entry, into memory or, if large, into a file in the store.
+
+        Returns:
+            Optional[SpooledContent]: The content, or None if it is larger
+            than ``UPLOAD_MAX_BYTES``.
+        """
+        buffer = io.BytesIO()
+        file: Optional[BinaryIO] = None
+        path = None
+        content = None
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > cls.max_bytes:
+                    return None
+                if file is None and size > cls.spool_bytes:
+                    path, file = cls._spill(buffer)
+                (buffer if file is None else file).write(chunk)
+            if file is None:
+                buffer.seek(0)
+                content = buffer
+            else:
+                content = path
+            return content
+        finally:
+            if file is not None:
+                file.close()
+            if content is None and path is not None:
+                os.remove(path)
+
+    @classmethod
+    def _spill(cls, buffer: io.BytesIO) -> Tuple[str, BinaryIO]:
+        # Written inside the store, so BlobStore.put_file moves it in
+        temp_folder = os.path.join(BlobStore.get_blob_folder(), "tmp")
+        os.makedirs(temp_folder, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=temp_folder, suffix=".bulk")
+        file = os.fdopen(fd, "wb")
+        file.write(buffer.getbuffer())
+        return path, file
+
+    @classmethod
+    def _discard(cls, content: SpooledContent) -> None:
+        if isinstance(content, str):
+            try:
+                os.remove(content)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def _store(
+        cls, app: Flask, content: SpooledContent, slots: threading.BoundedSemaphore
+    ) -> BlobRef:
+        try:
+            with app.app_context():
+                if isinstance(content, str):
+                    return BlobStore.put_file(content)
+                return BlobStore.put_stream(content)
+        finally:
+            cls._discard(content)
+            slots.release()
+
+    @classmethod
+    def _create_images(
+        cls,
+        user_id: UUID,
+        batch: List[Tuple[int, str, str, Future]],
+        results: List[Optional[BulkUploadResult]],
+        is_public: bool,
+    ) -> None:
+        stored = []
+        for index, name, filename, future in batch:
+            try:
+                stored.append((index, name, filename, future.result()))
+            except Exception as e:
+                results[index] = BulkUploadResult(
+                    name, error=f"Failed to save image: {e}"
+                )
+        if not stored:
+            return
+
+        try:
+            created = ImageService.create_images(
+                user_id,
+                [(filename, blob) for _, _, filename, blob in stored],
+                is_public=is_public,
+            )
+        except Exception as e:
+            for index, name, _, _ in stored:
+                results[index] = BulkUploadResult(
+                    name, error=f"Failed to create image: {e}"
+                )
+            return
+        for (index, name, _, _), (image_id, filename) in zip(stored, created):
+            results[index] = BulkUploadResult(name, image_id, filename)
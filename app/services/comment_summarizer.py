@@ -0,0 +1,259 @@
+import hashlib
+import heapq
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import Flask
+from sumy.models.dom import ObjectDocumentModel, Paragraph, Sentence
+from sumy.utils import get_stop_words
+
+from app.services.nlp_model_registry import NlpModelRegistry
+from app.services.nlp_process_pool import NlpProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryResult(NamedTuple):
+    summary: str
+    strategy: str
+
+
+class CommentSummarizer:
+    """Extractive comment summarization with a bounded cost.
+
+    The input is split into sentences and deduplicated. Above
+    ``max_sentences`` it is sampled down to the most recent or the longest
+    sentences before LSA runs. LSA gets ``time_budget_seconds``; past that the
+    summary falls back to a linear word-frequency ranking of the sentences.
+
+    The budget only bounds the latency of ``summarize``, not its CPU: a thread
+    cannot be stopped, so an LSA run over budget still finishes in the
+    background. At most ``lsa_workers`` such runs execute at once, and runs
+    still waiting for a worker when their budget expires are cancelled. With
+    NLP_EXECUTION_MODE "process" the whole summary runs in an NlpProcessPool
+    worker, which is killed after NLP_TASK_TIMEOUT_SECONDS.
+
+    Results are memoized in a bounded LRU keyed by a fingerprint of the
+    comment bodies, so unchanged input never goes through NLP twice.
+    """
+
+    STRATEGY_EMPTY: str = "empty"
+    STRATEGY_LSA: str = "lsa"
+    STRATEGY_LSA_SAMPLED: str = "lsa_sampled"
+    STRATEGY_FREQUENCY: str = "frequency"
+
+    SAMPLING_RECENT: str = "recent"
+    SAMPLING_LONGEST: str = "longest"
+
+    sentences_count: int = 2
+    max_sentences: int = 200
+    sampling: str = SAMPLING_RECENT
+    time_budget_seconds: float = 2.0
+    lsa_workers: int = 1
+    cache_size: int = 1024
+
+    _cache: "OrderedDict[str, SummaryResult]" = OrderedDict()
+    _cache_lock = threading.Lock()
+    _cache_hits: int = 0
+    _cache_misses: int = 0
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    _stop_words: Optional[FrozenSet[str]] = None
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.sentences_count = app.config.get("SUMMARY_SENTENCES_COUNT", 2)
+        cls.max_sentences = app.config.get("SUMMARY_MAX_SENTENCES", 200)
+        cls.sampling = app.config.get("SUMMARY_SAMPLING", cls.SAMPLING_RECENT)
+        cls.time_budget_seconds = app.config.get("SUMMARY_TIME_BUDGET_SECONDS", 2.0)
+        cls.lsa_workers = app.config.get("SUMMARY_LSA_WORKERS", 1)
+        cls.cache_size = app.config.get("SUMMARY_CACHE_SIZE", 1024)
+        with cls._executor_lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+                cls._executor = None
+        cls.clear_cache()
+
+    @classmethod
+    def fingerprint(cls, bodies: Sequence[str]) -> str:
+        """Hash the ordered comment bodies together with the summarizer settings.
+
+        The hash is fed body by body, each prefixed with its length so that
+        different splits of the same text never collide.
+        """
+        digest = hashlib.sha256(
+            f"{cls.sentences_count}:{cls.max_sentences}:{cls.sampling}".encode()
+        )
+        for body in bodies:
+            encoded_body = body.encode("utf-8")
+            digest.update(len(encoded_body).to_bytes(8, "big"))
+            digest.update(encoded_body)
+        return digest.hexdigest()
+
+    @classmethod
+    def summarize_comments(
+        cls,
+        bodies: Sequence[str],
+        stored_result: Optional[Tuple[str, SummaryResult]] = None,
+    ) -> Tuple[SummaryResult, Optional[str]]:
+        """Summarize comment bodies, reusing a stored or memoized result.
+
+        Args:
+            bodies (Sequence[str]): The comment bodies, oldest first.
+            stored_result (Optional[Tuple[str, SummaryResult]]): The fingerprint
+                and result already persisted for these comments, if any.
+
+        Returns:
+            Tuple[SummaryResult, Optional[str]]: The summary and the fingerprint
+            to persist with it. Fallback summaries get no fingerprint so that
+            they are recomputed on the next refresh.
+        """
+        fingerprint = cls.fingerprint(bodies)
+        with cls._cache_lock:
+            if stored_result and stored_result[0] == fingerprint:
+                cls._cache_hits += 1
+                return stored_result[1], fingerprint
+            cached_result = cls._cache.get(fingerprint)
+            if cached_result:
+                cls._cache.move_to_end(fingerprint)
+                cls._cache_hits += 1
+                return cached_result, fingerprint
+            cls._cache_misses += 1
+
+        result = NlpProcessPool.run(cls.summarize, " ".join(bodies))
+        if result.strategy == cls.STRATEGY_FREQUENCY:
+            return result, None
+
+        with cls._cache_lock:
+            cls._cache[fingerprint] = result
+            cls._cache.move_to_end(fingerprint)
+            while len(cls._cache) > cls.cache_size:
+                cls._cache.popitem(last=False)
+        return result, fingerprint
+
+    @classmethod
+    def cache_stats(cls) -> dict:
+        with cls._cache_lock:
+            lookups = cls._cache_hits + cls._cache_misses
+            return {
+                "size": len(cls._cache),
+                "max_size": cls.cache_size,
+                "hits": cls._cache_hits,
+                "misses": cls._cache_misses,
+                "hit_rate": cls._cache_hits / lookups if lookups else 0.0,
+            }
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._cache = OrderedDict()
+            cls._cache_hits = 0
+            cls._cache_misses = 0
+
+    @classmethod
+    def summarize(cls, text: str) -> SummaryResult:
+        tokenizer = NlpModelRegistry.get_tokenizer()
+        sentences = cls._deduplicate(tokenizer.to_sentences(text))
+        if not sentences:
+            return SummaryResult("", cls.STRATEGY_EMPTY)
+
+        strategy = cls.STRATEGY_LSA
+        if len(sentences) > cls.max_sentences:
+            sentences = cls._sample(sentences)
+            strategy = cls.STRATEGY_LSA_SAMPLED
+
+        if not cls.time_budget_seconds:
+            return SummaryResult(cls._lsa_summary(sentences), strategy)
+
+        future = cls._get_executor().submit(cls._lsa_summary, sentences)
+        try:
+            return SummaryResult(future.result(cls.time_budget_seconds), strategy)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(
+                "LSA summary of %d sentences exceeded %.2fs, using %s fallback",
+                len(sentences),
+                cls.time_budget_seconds,
+                cls.STRATEGY_FREQUENCY,
+            )
+            return SummaryResult(
+                cls._frequency_summary(sentences), cls.STRATEGY_FREQUENCY
+            )
+
+    @staticmethod
+    def _deduplicate(sentences: Sequence[str]) -> List[str]:
+        seen = set()
+        unique_sentences = []
+        for sentence in sentences:
+            key = " ".join(sentence.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                unique_sentences.append(sentence)
+        return unique_sentences
+
+    @classmethod
+    def _sample(cls, sentences: List[str]) -> List[str]:
+        if cls.sampling == cls.SAMPLING_LONGEST:
+            longest = heapq.nlargest(
+                cls.max_sentences,
+                range(len(sentences)),
+                key=lambda index: len(sentences[index]),
+            )
+            return [sentences[index] for index in sorted(longest)]
+        # Comments are ordered oldest first, so the tail is the most recent
+        return sentences[-cls.max_sentences :]
+
+    @classmethod
+    def _lsa_summary(cls, sentences: List[str]) -> str:
+        tokenizer = NlpModelRegistry.get_tokenizer()
+        document = ObjectDocumentModel(
+            [Paragraph([Sentence(sentence, tokenizer) for sentence in sentences])]
+        )
+        summarizer = NlpModelRegistry.get_summarizer()
+        summary = summarizer(document, sentences_count=cls.sentences_count)
+        return " ".join(str(sentence) for sentence in summary)
+
+    @classmethod
+    def _frequency_summary(cls, sentences: List[str]) -> str:
+        """Rank sentences by the mean corpus frequency of their content words."""
+        tokenizer = NlpModelRegistry.get_tokenizer()
+        stop_words = cls._get_stop_words()
+        sentence_words = [
+            [
+                word
+                for word in (w.lower() for w in tokenizer.to_words(sentence))
+                if word not in stop_words
+            ]
+            for sentence in sentences
+        ]
+        frequencies = Counter(word for words in sentence_words for word in words)
+
+        def score(index: int) -> float:
+            words = sentence_words[index]
+            if not words:
+                return 0.0
+            return sum(frequencies[word] for word in words) / len(words)
+
+        best = heapq.nlargest(cls.sentences_count, range(len(sentences)), key=score)
+        return " ".join(sentences[index] for index in sorted(best))
+
+    @classmethod
+    def _get_stop_words(cls) -> FrozenSet[str]:
+        if cls._stop_words is None:
+            cls._stop_words = frozenset(get_stop_words(NlpModelRegistry.LANGUAGE))
+        return cls._stop_words
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.lsa_workers,
+                    thread_name_prefix="comment-summarizer",
+                )
+            return cls._executor
@@ -0,0 +1,223 @@
+import atexit
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import Flask
+from PIL import Image as PilImage
+from PIL import ImageOps
+
+from app.models.image import Image
+from app.services.blob_store import BlobStore, ImageSource
+
+logger = logging.getLogger(__name__)
+
+
+class DerivativeFormat(NamedTuple):
+    pil_format: str
+    extension: str
+    mimetype: str
+
+
+DERIVATIVE_FORMATS: Dict[str, DerivativeFormat] = {
+    "webp": DerivativeFormat("WEBP", "webp", "image/webp"),
+    "jpeg": DerivativeFormat("JPEG", "jpg", "image/jpeg"),
+    "png": DerivativeFormat("PNG", "png", "image/png"),
+}
+
+
+def open_image(source: ImageSource) -> PilImage.Image:
+    """Open an image from its file path or the bytes of its packed blob."""
+    return PilImage.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def render_derivatives(
+    source: ImageSource, targets: Sequence[Tuple[int, str, str]], quality: int
+) -> None:
+    """Render resized copies of an image, decoding the source only once.
+
+    Runs in a DerivativeService worker process.
+
+    Args:
+        source (ImageSource): The original image.
+        targets: ``(size, format name, output path)`` of every derivative; the
+            image is fit into a ``size`` x ``size`` box keeping its ratio.
+        quality (int): Encoder quality for lossy formats.
+    """
+    largest_size = max(size for size, _, _ in targets)
+    with open_image(source) as original:
+        # Let the JPEG decoder downscale while decoding
+        original.draft("RGB", (largest_size, largest_size))
+        original = ImageOps.exif_transpose(original)
+        for size, format_name, output_path in sorted(targets, reverse=True):
+            derivative_format = DERIVATIVE_FORMATS[format_name]
+            derivative = original.copy()
+            derivative.thumbnail((size, size), PilImage.Resampling.LANCZOS)
+            if derivative_format.pil_format == "JPEG" and derivative.mode != "RGB":
+                derivative = derivative.convert("RGB")
+
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+            derivative.save(temp_path, derivative_format.pil_format, quality=quality)
+            os.replace(temp_path, output_path)
+
+
+class DerivativeService:
+    """Thumbnails and other resized copies of images, cached on disk.
+
+    Derivatives are rendered on a process pool: all configured ones right
+    after an image is saved, and missing ones on demand. Every derivative is
+    rendered by at most one task at a time; callers asking for a derivative
+    that is being rendered wait for that task.
+    """
+
+    sizes: List[int] = [128, 512]
+    formats: List[str] = ["webp", "jpeg"]
+    quality: int = 80
+    timeout_seconds: float = 30.0
+    _pool_size: Optional[int] = None
+    _executor: Optional[ProcessPoolExecutor] = None
+    _inflight: Dict[str, Future] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.shutdown()
+        cls.sizes = sorted(app.config.get("DERIVATIVE_SIZES", cls.sizes))
+        cls.formats = [
+            format_name
+            for format_name in app.config.get("DERIVATIVE_FORMATS", cls.formats)
+            if format_name in DERIVATIVE_FORMATS
+        ]
+        cls.quality = app.config.get("DERIVATIVE_QUALITY", cls.quality)
+        cls.timeout_seconds = app.config.get(
+            "DERIVATIVE_TIMEOUT_SECONDS", cls.timeout_seconds
+        )
+        cls._pool_size = app.config.get("DERIVATIVE_POOL_SIZE")
+        cls._executor = cls._create_executor()
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def get_derivative_folder(cls, image: Image, source: ImageSource) -> str:
+        """Get the folder files derived from an image are cached in.
+
+        Derivatives of stored blobs live next to the blob, so they are shared
+        by identical images and collected with the blob. Images without a blob
+        are never packed, so their source is a path.
+        """
+        if image.blob_sha256:
+            return BlobStore.get_derivative_folder(image.blob_sha256)
+        return os.path.join(
+            os.path.dirname(source),
+            ".derivatives",
+            os.path.basename(source),
+        )
+
+    @classmethod
+    def get_derivative_path(
+        cls, image: Image, source: ImageSource, size: int, format_name: str
+    ) -> str:
+        extension = DERIVATIVE_FORMATS[format_name].extension
+        return os.path.join(
+            cls.get_derivative_folder(image, source), f"{size}.{extension}"
+        )
+
+    @classmethod
+    def schedule(cls, image: Image, source: ImageSource) -> Optional[Future]:
+        """Start rendering every configured derivative that is not cached yet."""
+        targets = [
+            (size, format_name) for size in cls.sizes for format_name in cls.formats
+        ]
+        return cls._submit(image, source, targets)
+
+    @classmethod
+    def get_derivative(
+        cls, image: Image, source: ImageSource, size: int, format_name: str
+    ) -> str:
+        """Get the path of a derivative, rendering it first if it is missing.
+
+        Raises:
+            concurrent.futures.TimeoutError: If rendering takes longer than
+                ``DERIVATIVE_TIMEOUT_SECONDS``.
+        """
+        path = cls.get_derivative_path(image, source, size, format_name)
+        if not os.path.exists(path):
+            future = cls._submit(image, source, [(size, format_name)])
+            if future is None:
+                with cls._lock:
+                    future = cls._inflight.get(path)
+            if future is not None:
+                future.result(timeout=cls.timeout_seconds)
+        return path
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    @classmethod
+    def _create_executor(cls) -> ProcessPoolExecutor:
+        # Workers are started lazily, when tasks are submitted
+        return ProcessPoolExecutor(
+            max_workers=cls._pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    @classmethod
+    def _submit(
+        cls, image: Image, source: ImageSource, targets: Sequence[Tuple[int, str]]
+    ) -> Optional[Future]:
+        """Render the targets that are neither cached nor being rendered.
+
+        Returns:
+            Optional[Future]: The render task, or None if there was nothing
+            left to render.
+        """
+        if cls._executor is None:
+            return None
+
+        with cls._lock:
+            missing_targets = []
+            for size, format_name in targets:
+                path = cls.get_derivative_path(image, source, size, format_name)
+                if path not in cls._inflight and not os.path.exists(path):
+                    missing_targets.append((size, format_name, path))
+            if not missing_targets:
+                return None
+
+            try:
+                future = cls._executor.submit(
+                    render_derivatives, source, missing_targets, cls.quality
+                )
+            except BrokenProcessPool:
+                # A worker died and took the pool down; start a new one
+                logger.warning("Derivative pool is broken, restarting it")
+                cls._executor = cls._create_executor()
+                future = cls._executor.submit(
+                    render_derivatives, source, missing_targets, cls.quality
+                )
+            paths = [path for _, _, path in missing_targets]
+            for path in paths:
+                cls._inflight[path] = future
+
+        def forget(done: Future) -> None:
+            with cls._lock:
+                for path in paths:
+                    if cls._inflight.get(path) is done:
+                        del cls._inflight[path]
+            if not done.cancelled() and done.exception():
+                logger.warning(
+                    "Rendering derivatives of image %s failed: %s",
+                    image.id,
+                    done.exception(),
+                )
+
+        future.add_done_callback(forget)
+        return future
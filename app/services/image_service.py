@@ -1,17 +1,31 @@
+import logging
 import os
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
 
-from flask import Flask, current_app
+from flask import Flask
 from werkzeug.datastructures import FileStorage
-from werkzeug.utils import secure_filename
 
+from app.models.image import Image
 from app.models.user import User
+from app.repos.image import ImageRepo
+from app.services.annotation_worker_service import AnnotationWorkerService
+from app.services.blob_store import BlobRef, BlobStore, ImageSource
+from app.services.derivative_service import DerivativeService
+from app.services.storage_layout import StorageLayout
+from app.services.tile_service import TileService
+
+logger = logging.getLogger(__name__)
 
 
 class ImageService:
     @classmethod
     def initialize(cls, app: Flask):
         """Initialize the ImageService class with the Flask app instance."""
-        pass
+        BlobStore.initialize(app)
+        StorageLayout.initialize(app)
+        DerivativeService.initialize(app)
+        TileService.initialize(app)
 
     @classmethod
     def save_image(
@@ -19,6 +33,10 @@ class ImageService:
     ) -> str:
         """Save the uploaded image file.
 
+        The content is stored once in the BlobStore and, with a local
+        backend, the image path is linked to it; uploading content that is
+        already stored writes nothing.
+
         Args:
             uploaded_file (FileStorage): The file object to be saved.
             requesting_user (User): The user who is requesting to upload the image.
@@ -26,12 +44,155 @@ class ImageService:
         Returns:
             str: The file path where the image is saved.
         """
-        # Save the uploaded file
-        filename = secure_filename(filename)
-        file_path = os.path.join(
-            current_app.config["UPLOAD_FOLDER"], str(requesting_user.id), filename
-        )
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        uploaded_file.save(file_path)
+        blob = BlobStore.put_stream(uploaded_file.stream)
+        return cls.attach_blob(requesting_user.id, filename, blob)
 
+    @classmethod
+    def attach_blob(cls, user_id: UUID, filename: str, blob: BlobRef) -> str:
+        """Link the user's image file to a blob and hand it the blob reference.
+
+        Returns:
+            str: The file path of the image. Packed images and images of a
+            remote backend have no file there, see ``get_image_source``.
+        """
+        # New files always go to the configured layout
+        file_path = StorageLayout.get_path(user_id, filename)
+        if BlobStore.is_local():
+            try:
+                BlobStore.link(blob.sha256, file_path)
+            except Exception:
+                BlobStore.release(blob.sha256)
+                raise
+        StorageLayout.remove_flat_file(user_id, filename)
+
+        image = ImageRepo.get_by_filename(user_id, filename)
+        if image:
+            previous_sha256 = image.blob_sha256
+            ImageRepo.update(image.id, blob_sha256=blob.sha256)
+            BlobStore.release(previous_sha256)
+            cls._schedule_processing(image)
+            AnnotationWorkerService.enqueue([image.id])
+        else:
+            # No image owns the reference; a linked file stays, packed
+            # content is dropped
+            BlobStore.release(blob.sha256)
         return file_path
+
+    @classmethod
+    def create_images(
+        cls,
+        user_id: UUID,
+        files: Sequence[Tuple[str, BlobRef]],
+        is_public: bool = False,
+    ) -> List[Tuple[UUID, str]]:
+        """Create images of a user for stored blobs, handing each its reference.
+
+        The images are inserted with one statement, see
+        ``ImageRepo.create_many``, and their files linked to the blobs if the
+        backend is local.
+
+        Args:
+            user_id (UUID): The owner of the images.
+            files (Sequence[Tuple[str, BlobRef]]): The requested filename and
+                blob of every image.
+            is_public (bool): The visibility of the images.
+
+        Returns:
+            List[Tuple[UUID, str]]: The id and filename of every image, in order.
+        """
+        try:
+            created = ImageRepo.create_many(
+                user_id,
+                [(filename, blob.sha256) for filename, blob in files],
+                is_public=is_public,
+            )
+        except Exception:
+            for _, blob in files:
+                BlobStore.release(blob.sha256)
+            raise
+
+        if BlobStore.is_local():
+            for (image_id, filename), (_, blob) in zip(created, files):
+                try:
+                    BlobStore.link(
+                        blob.sha256, StorageLayout.get_path(user_id, filename)
+                    )
+                except OSError:
+                    # The image owns its blob and is still read from the store
+                    logger.warning("Linking the file of image %s failed", image_id)
+        for image in ImageRepo.get_many([image_id for image_id, _ in created]):
+            cls._schedule_processing(image)
+        AnnotationWorkerService.enqueue(image_id for image_id, _ in created)
+        return created
+
+    @classmethod
+    def _schedule_processing(cls, image: Image) -> None:
+        """Start rendering the derivatives and tiles of a saved image.
+
+        The image is saved already, so failing to schedule is only logged;
+        missing derivatives and tiles are rendered on demand.
+        """
+        try:
+            source = cls.get_image_source(image)
+            if source is not None:
+                DerivativeService.schedule(image, source)
+                TileService.schedule(image, source)
+        except Exception:
+            logger.exception("Scheduling the processing of image %s failed", image.id)
+
+    @classmethod
+    def delete_image(cls, image_id: UUID) -> bool:
+        """Delete an image and its file, collecting its blob if now unused."""
+        image = ImageRepo.get(image_id)
+        if not image:
+            return False
+        blob_sha256 = image.blob_sha256
+        file_path = cls.get_image_file_path(image.user_id, image.filename)
+        if not ImageRepo.delete(image.id):
+            return False
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        BlobStore.release(blob_sha256)
+        return True
+
+    @classmethod
+    def delete_user_images(cls, user_id: UUID) -> int:
+        """Delete all images of a user, see ``delete_image``.
+
+        Deleting the user would delete the images too, without releasing
+        their blobs, so this runs first.
+
+        Returns:
+            int: The number of images deleted.
+        """
+        image_ids = [image.id for image in ImageRepo.get_by_user_id(user_id, user_id)]
+        return sum(cls.delete_image(image_id) for image_id in image_ids)
+
+    @classmethod
+    def get_image_file_path(cls, user_id: UUID, filename: str) -> str:
+        """Get the path an image of the user is stored at, see StorageLayout."""
+        return StorageLayout.resolve_path(user_id, filename)
+
+    @classmethod
+    def get_image_source(cls, image: Image) -> Optional[ImageSource]:
+        """Get the content of an image for reading.
+
+        With a remote backend images are always read by their blob, as a
+        file at the image path may be left from an image deleted by another
+        host.
+
+        Returns:
+            Optional[ImageSource]: The path of the image file, the content of
+            its blob if there is no file on this host, or None if the image has
+            no content.
+        """
+        if image.blob_sha256 and not BlobStore.is_local():
+            return BlobStore.get_source(image.blob_sha256)
+        file_path = cls.get_image_file_path(image.user_id, image.filename)
+        if os.path.isfile(file_path):
+            return file_path
+        if image.blob_sha256:
+            return BlobStore.get_source(image.blob_sha256)
+        return None
@@ -0,0 +1,268 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+from uuid import UUID
+
+from flask import Flask
+
+from app.api.serializers.image_summary import ImageSummarySchema
+from app.repos.image import ImageRepo
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    loaded_at: float
+    is_stale: bool
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+
+class _InflightLoad:
+    def __init__(self):
+        self.done = threading.Event()
+        self.invalidated = False
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class StaleWhileRevalidateCache:
+    """Read-through LRU cache that serves stale entries while refreshing them.
+
+    A miss loads the key in the calling thread; concurrent misses for the same
+    key wait for that single load. A hit on an entry that is older than
+    ``ttl_seconds`` or has been marked stale is served as is, and at most one
+    background ``revalidate`` per key is started to replace it. Loaders return
+    None for keys that should not be cached.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[Hashable], Any],
+        revalidate: Callable[[Hashable], Any],
+        ttl_seconds: float,
+        max_size: int,
+        max_workers: int,
+        is_stale: Callable[[Any], bool] = lambda value: False,
+    ):
+        self._load = load
+        self._revalidate = revalidate
+        self._ttl_seconds = ttl_seconds
+        self._max_size = max_size
+        self._is_stale = is_stale
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, _InflightLoad] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="summary-revalidate"
+        )
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.is_stale or entry.age_seconds > self._ttl_seconds:
+                    self._stale_hits += 1
+                    if key not in self._inflight:
+                        self._start_refresh(key)
+                    return entry._replace(is_stale=True)
+                self._hits += 1
+                return entry
+
+            self._misses += 1
+            inflight = self._inflight.get(key)
+            is_leader = inflight is None
+            if is_leader:
+                inflight = self._inflight[key] = _InflightLoad()
+
+        if is_leader:
+            self._run_load(key, inflight, self._load)
+        else:
+            inflight.done.wait()
+        if inflight.error is not None:
+            raise inflight.error
+        if inflight.value is None:
+            return None
+
+        entry = CacheEntry(
+            inflight.value, time.monotonic(), self._is_stale(inflight.value)
+        )
+        if is_leader and entry.is_stale:
+            with self._lock:
+                if key not in self._inflight:
+                    self._start_refresh(key)
+        return entry
+
+    def mark_stale(self, key: Hashable) -> None:
+        """Keep serving the cached entry, but refresh it on its next read."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = entry._replace(is_stale=True)
+            if key in self._inflight:
+                self._inflight[key].invalidated = True
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the cached entry; the next read loads it again."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if key in self._inflight:
+                self._inflight[key].invalidated = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for inflight in self._inflight.values():
+                inflight.invalidated = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "refreshes": self._refreshes,
+                "refreshing": len(self._inflight),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _start_refresh(self, key: Hashable) -> None:
+        # Must be called with self._lock held
+        inflight = self._inflight[key] = _InflightLoad()
+        self._refreshes += 1
+        try:
+            self._executor.submit(self._run_load, key, inflight, self._revalidate)
+        except RuntimeError:
+            # The executor is shut down, keep serving what is cached
+            del self._inflight[key]
+
+    def _run_load(
+        self, key: Hashable, inflight: _InflightLoad, load: Callable[[Hashable], Any]
+    ) -> None:
+        try:
+            inflight.value = load(key)
+        except Exception as error:
+            inflight.error = error
+            logger.exception("Loading summary cache entry %s failed", key)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if inflight.value is None:
+                    self._entries.pop(key, None)
+                elif not inflight.invalidated:
+                    self._entries[key] = CacheEntry(
+                        inflight.value,
+                        time.monotonic(),
+                        self._is_stale(inflight.value),
+                    )
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self._max_size:
+                        self._entries.popitem(last=False)
+            inflight.done.set()
+
+
+class CachedImageSummary(NamedTuple):
+    owner_id: UUID
+    is_public: bool
+    # ImageSummarySchema dump, or None if the image has no summary yet
+    payload: Optional[dict]
+    is_summary_stale: bool
+
+
+class ImageSummaryCacheService:
+    _cache: Optional[StaleWhileRevalidateCache] = None
+    _schema = ImageSummarySchema()
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        def revalidate(image_id: UUID) -> Optional[CachedImageSummary]:
+            # Imported here to avoid circular imports
+            from app.services.image_summary_service import ImageSummaryService
+
+            with app.app_context():
+                ImageSummaryService.get_fresh_image_summary(image_id)
+                return cls.load(image_id)
+
+        cls.shutdown()
+        cls._cache = StaleWhileRevalidateCache(
+            load=cls.load,
+            revalidate=revalidate,
+            ttl_seconds=app.config.get("SUMMARY_READ_CACHE_TTL_SECONDS", 30.0),
+            max_size=app.config.get("SUMMARY_READ_CACHE_SIZE", 4096),
+            max_workers=app.config.get("SUMMARY_READ_CACHE_REFRESH_WORKERS", 2),
+            is_stale=lambda cached: cached.is_summary_stale,
+        )
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def load(cls, image_id: UUID) -> Optional[CachedImageSummary]:
+        """Read the image owner, visibility and stored summary in one query."""
+        row = ImageRepo.get_with_summary(image_id)
+        if row is None:
+            return None
+        image, image_summary = row
+        return CachedImageSummary(
+            owner_id=UUID(str(image.user_id)),
+            is_public=bool(image.is_public),
+            payload=cls._schema.dump(image_summary) if image_summary else None,
+            is_summary_stale=bool(image_summary and image_summary.is_summary_stale),
+        )
+
+    @classmethod
+    def get(cls, image_id: UUID) -> Optional[CacheEntry]:
+        """Get the cached summary of an image without waiting for a refresh.
+
+        Returns:
+            Optional[CacheEntry]: Entry whose value is a CachedImageSummary, or
+                None if the image does not exist.
+        """
+        if cls._cache is None:
+            cached = cls.load(image_id)
+            if cached is None:
+                return None
+            return CacheEntry(cached, time.monotonic(), cached.is_summary_stale)
+
+        entry = cls._cache.get(image_id)
+        if entry and entry.is_stale and entry.value.payload is None:
+            # Do not keep answering "no summary" once comments were added
+            cls._cache.invalidate(image_id)
+            entry = cls._cache.get(image_id)
+        return entry
+
+    @classmethod
+    def mark_stale(cls, image_id: UUID) -> None:
+        if cls._cache:
+            cls._cache.mark_stale(image_id)
+
+    @classmethod
+    def invalidate(cls, image_id: UUID) -> None:
+        if cls._cache:
+            cls._cache.invalidate(image_id)
+
+    @classmethod
+    def stats(cls) -> dict:
+        if cls._cache:
+            return cls._cache.stats()
+        return {}
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._cache:
+            cls._cache.shutdown()
+            cls._cache = None
@@ -1,75 +1,334 @@
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 from uuid import UUID
 
 import nltk
+import numpy as np
 from flask import Flask
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.summarizers.lsa import LsaSummarizer
 
+from app.errors import NlpExecutionError
+from app.models.image_summary import ImageSummary
 from app.repos.comment import CommentRepo
+from app.repos.image_commenter import ImageCommenterRepo
 from app.repos.image_summary import ImageSummaryRepo
+from app.services.comment_summarizer import CommentSummarizer, SummaryResult
+from app.services.image_summary_cache_service import ImageSummaryCacheService
+from app.services.nlp_model_registry import NlpModelRegistry
+from app.services.nlp_process_pool import NlpProcessPool
+from app.services.summary_worker_service import SummaryWorkerService
+
+logger = logging.getLogger(__name__)
+
+
+class CommentsSummary(NamedTuple):
+    summary_result: SummaryResult
+    summary_fingerprint: Optional[str]
+    sentiment_score: int
+    new_sentiment_scores: List[Tuple[UUID, float]]
 
 
 class ImageSummaryService:
+    NLTK_RESOURCES: Dict[str, str] = {
+        "punkt": "tokenizers/punkt",
+        "vader_lexicon": "sentiment/vader_lexicon.zip",
+    }
+
+    sentiment_aggregation: str = "mean"
+    resource_load_seconds: Optional[float] = None
+    _checked_nltk_data_dir: Optional[str] = None
+
     @classmethod
     def initialize(cls, app: Flask):
-        with app.app_context():
-            nltk.download("punkt")
-            nltk.download("vader_lexicon")
+        cls.sentiment_aggregation = app.config.get("SENTIMENT_AGGREGATION", "mean")
+        start = time.perf_counter()
+        nltk_data_dir = app.config.get("NLTK_DATA_DIR")
+        if nltk_data_dir and nltk_data_dir not in nltk.data.path:
+            nltk.data.path.insert(0, nltk_data_dir)
+
+        if cls._checked_nltk_data_dir != nltk_data_dir:
+            missing_resources = cls._find_missing_nltk_resources()
+            if missing_resources and app.config.get("NLTK_DOWNLOAD_MISSING"):
+                for name in missing_resources:
+                    nltk.download(name, download_dir=nltk_data_dir, quiet=True)
+                missing_resources = cls._find_missing_nltk_resources()
+            if missing_resources:
+                app.logger.warning(
+                    "NLTK resources %s not found in %s",
+                    ", ".join(missing_resources),
+                    nltk.data.path,
+                )
+            cls._checked_nltk_data_dir = nltk_data_dir
+
+        NlpModelRegistry.initialize(app)
+        CommentSummarizer.initialize(app)
+        cls.resource_load_seconds = time.perf_counter() - start
+        app.logger.info("NLP resources loaded in %.3fs", cls.resource_load_seconds)
+
+    @classmethod
+    def _find_missing_nltk_resources(cls) -> List[str]:
+        missing_resources = []
+        for name, resource_path in cls.NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource_path)
+            except LookupError:
+                missing_resources.append(name)
+        return missing_resources
+
+    @staticmethod
+    def record_comment_created(image_id: UUID, user_id: UUID, body: str) -> None:
+        """Add a new comment to the image summary aggregates in O(1)."""
+        is_new_commenter = ImageCommenterRepo.increment(image_id, user_id) == 1
+        ImageSummaryRepo.apply_comment_delta(
+            image_id,
+            comment_count_delta=1,
+            comment_length_delta=len(body or ""),
+            users_commented_delta=1 if is_new_commenter else 0,
+        )
+        SummaryWorkerService.mark_dirty(image_id)
+        ImageSummaryCacheService.mark_stale(image_id)
+
+    @staticmethod
+    def record_comment_updated(image_id: UUID, previous_body: str, body: str) -> None:
+        """Apply an edited comment body to the image summary aggregates in O(1)."""
+        ImageSummaryRepo.apply_comment_delta(
+            image_id, comment_length_delta=len(body or "") - len(previous_body or "")
+        )
+        SummaryWorkerService.mark_dirty(image_id)
+        ImageSummaryCacheService.mark_stale(image_id)
+
+    @staticmethod
+    def record_comment_deleted(image_id: UUID, user_id: UUID, body: str) -> None:
+        """Remove a deleted comment from the image summary aggregates in O(1)."""
+        was_last_comment = ImageCommenterRepo.decrement(image_id, user_id) == 0
+        ImageSummaryRepo.apply_comment_delta(
+            image_id,
+            comment_count_delta=-1,
+            comment_length_delta=-len(body or ""),
+            users_commented_delta=-1 if was_last_comment else 0,
+        )
+        SummaryWorkerService.mark_dirty(image_id)
+        ImageSummaryCacheService.mark_stale(image_id)
+
+    @staticmethod
+    def get_fresh_image_summary(image_id: UUID) -> Optional[ImageSummary]:
+        """Get the image summary, recomputing its text summary if it is stale."""
+        image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        if image_summary and image_summary.is_summary_stale:
+            ImageSummaryService.refresh_comment_summary(image_id)
+            image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        return image_summary
+
+    @staticmethod
+    def refresh_comment_summary(image_id: UUID) -> bool:
+        """Recompute the text summary and sentiment of an image from its comments.
+
+        Returns:
+            bool: True if a newer text summary was stored.
+        """
+        image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        if not image_summary:
+            return False
+        comment_revision = image_summary.comment_revision
+
+        summary_result, summary_fingerprint, sentiment_score = (
+            ImageSummaryService._summarize_comments(image_id, image_summary)
+        )
+        return ImageSummaryRepo.update_text_summary(
+            image_id,
+            summary_revision=comment_revision,
+            comment_summary=summary_result.summary,
+            summary_strategy=summary_result.strategy,
+            summary_fingerprint=summary_fingerprint,
+            sentiment_score=sentiment_score,
+        )
 
     @staticmethod
     def update_image_summary(image_id: UUID):
+        """Rebuild the image summary and its commenter counts from scratch."""
         # Get all comments for the image
         comments = CommentRepo.get_by_image_id(image_id)
         comment_count = len(comments)
-        if comment_count == 0:
-            average_comment_length = 0
-            users_commented_count = 0
-        else:
-            total_comment_length = sum(len(comment.body) for comment in comments)
-            average_comment_length = total_comment_length / comment_count
-            users_commented_count = len(set(comment.user_id for comment in comments))
-
-        comment_text = " ".join(comment.body for comment in comments)
-
-        comment_summary = ImageSummaryService.generate_summary(comment_text)
-        sentiment_score = ImageSummaryService.calculate_sentiment(comment_text)
+        total_comment_length = sum(len(comment.body or "") for comment in comments)
+        average_comment_length = ImageSummary.get_average_comment_length(
+            total_comment_length, comment_count
+        )
+        users_commented_count = ImageCommenterRepo.rebuild_for_image(image_id)
 
         existing_image_summary = ImageSummaryRepo.get_by_image_id(image_id)
 
+        summary_result, summary_fingerprint, sentiment_score = (
+            ImageSummaryService._summarize_comments(image_id, existing_image_summary)
+        )
+
         if existing_image_summary:
             ImageSummaryRepo.update(
                 summary_id=existing_image_summary.id,
-                comment_summary=comment_summary,
+                comment_summary=summary_result.summary,
+                summary_strategy=summary_result.strategy,
+                summary_fingerprint=summary_fingerprint,
                 comment_count=comment_count,
+                total_comment_length=total_comment_length,
                 average_comment_length=average_comment_length,
                 users_commented_count=users_commented_count,
                 sentiment_score=sentiment_score,
+                summary_revision=existing_image_summary.comment_revision,
             )
 
         else:
             ImageSummaryRepo.create(
                 image_id=image_id,
-                comment_summary=comment_summary,
+                comment_summary=summary_result.summary,
+                summary_strategy=summary_result.strategy,
+                summary_fingerprint=summary_fingerprint,
                 comment_count=comment_count,
+                total_comment_length=total_comment_length,
                 average_comment_length=average_comment_length,
                 users_commented_count=users_commented_count,
                 sentiment_score=sentiment_score,
             )
+        ImageSummaryCacheService.mark_stale(image_id)
+
+    @staticmethod
+    def _summarize_comments(
+        image_id: UUID, image_summary: Optional[ImageSummary]
+    ) -> Tuple[SummaryResult, Optional[str], int]:
+        """Summarize an image's comments and aggregate their stored sentiment.
+
+        The summarization is skipped when the comment fingerprint matches the
+        one stored on the image summary or a recently computed result.
+        Comments that have not been scored yet are scored and saved here.
+
+        Returns:
+            Tuple[SummaryResult, Optional[str], int]: The summary, its input
+            fingerprint and the 0-100 sentiment score.
+        """
+        stored_result = None
+        if image_summary and image_summary.summary_fingerprint:
+            stored_result = (
+                image_summary.summary_fingerprint,
+                SummaryResult(
+                    image_summary.comment_summary, image_summary.summary_strategy
+                ),
+            )
+        comments_summary = ImageSummaryService.summarize_comment_rows(
+            CommentRepo.get_summary_rows(image_id), stored_result
+        )
+        CommentRepo.update_sentiment_scores(comments_summary.new_sentiment_scores)
+        return (
+            comments_summary.summary_result,
+            comments_summary.summary_fingerprint,
+            comments_summary.sentiment_score,
+        )
+
+    @staticmethod
+    def summarize_comment_rows(
+        rows: Sequence[Tuple[UUID, str, Optional[float]]],
+        stored_result: Optional[Tuple[str, SummaryResult]] = None,
+    ) -> CommentsSummary:
+        """Summarize comment rows without touching the database.
+
+        Args:
+            rows (Sequence[Tuple[UUID, str, Optional[float]]]): The id, body
+                and stored sentiment score of each comment, oldest first.
+            stored_result (Optional[Tuple[str, SummaryResult]]): The persisted
+                fingerprint and summary of the image, if any.
+
+        Returns:
+            CommentsSummary: The summary, sentiment and the scores of comments
+            that had none yet, which the caller should persist.
+        """
+        bodies = [body or "" for _, body, _ in rows]
+
+        unscored_rows = [
+            (comment_id, body or "")
+            for comment_id, body, sentiment_score in rows
+            if sentiment_score is None
+        ]
+        new_sentiment_scores = []
+        if unscored_rows:
+            new_sentiment_scores = list(
+                zip(
+                    [comment_id for comment_id, _ in unscored_rows],
+                    NlpProcessPool.run(
+                        ImageSummaryService.score_comments,
+                        [body for _, body in unscored_rows],
+                    ),
+                )
+            )
+        rescored = dict(new_sentiment_scores)
+        sentiment_scores = [
+            rescored.get(comment_id, sentiment_score)
+            for comment_id, _, sentiment_score in rows
+        ]
+
+        summary_result, summary_fingerprint = CommentSummarizer.summarize_comments(
+            bodies, stored_result
+        )
+        sentiment_score = ImageSummaryService.aggregate_sentiment(
+            np.array(sentiment_scores, dtype=np.float64),
+            np.array([len(body) for body in bodies], dtype=np.float64),
+        )
+        return CommentsSummary(
+            summary_result, summary_fingerprint, sentiment_score, new_sentiment_scores
+        )
 
     @staticmethod
     def generate_summary(text: str) -> str:
-        parser = PlaintextParser.from_string(text, Tokenizer("english"))
+        return CommentSummarizer.summarize(text).summary
+
+    @staticmethod
+    def score_comment(body: str) -> float:
+        """Get the VADER compound score of a single comment, in the [-1, 1] range."""
+        analyzer = NlpModelRegistry.get_sentiment_analyzer()
+        return analyzer.polarity_scores(body or "")["compound"]
 
-        summarizer = LsaSummarizer()
-        summary = summarizer(parser.document, sentences_count=2)
+    @staticmethod
+    def score_comments(bodies: Sequence[str]) -> List[float]:
+        return [ImageSummaryService.score_comment(body) for body in bodies]
+
+    @staticmethod
+    def try_score_comment(body: str) -> Optional[float]:
+        """Score a new comment, leaving it unscored if the NLP pool is unavailable.
 
-        return " ".join(str(sentence) for sentence in summary)
+        Unscored comments are scored during the next summary refresh.
+        """
+        try:
+            return NlpProcessPool.run(ImageSummaryService.score_comment, body)
+        except NlpExecutionError as e:
+            logger.warning("Comment left unscored: %s", e)
+            return None
 
     @staticmethod
-    def calculate_sentiment(text: str) -> int:
-        analyzer = SentimentIntensityAnalyzer()
-        sentiment_score = analyzer.polarity_scores(text)["compound"]
-        scaled_score = int((sentiment_score + 1) * 50)  # Scale to 0-100 range
+    def scale_sentiment(compound_score: float) -> int:
+        scaled_score = int((compound_score + 1) * 50)  # Scale to 0-100 range
         return max(0, min(100, scaled_score))  # Ensure score is within 0-100 range
+
+    @classmethod
+    def aggregate_sentiment(
+        cls, sentiment_scores: np.ndarray, comment_lengths: np.ndarray
+    ) -> int:
+        """Aggregate per-comment compound scores into a 0-100 image sentiment.
+
+        SENTIMENT_AGGREGATION selects a plain "mean" or a "length_weighted"
+        mean, where longer comments weigh more.
+        """
+        if sentiment_scores.size == 0:
+            return cls.scale_sentiment(0.0)
+        if cls.sentiment_aggregation == "length_weighted" and comment_lengths.sum():
+            compound_score = np.average(sentiment_scores, weights=comment_lengths)
+        else:
+            compound_score = sentiment_scores.mean()
+        return cls.scale_sentiment(float(compound_score))
+
+    @staticmethod
+    def sentiment_histogram(sentiment_scores: np.ndarray, bins: int = 5) -> List[int]:
+        """Count compound scores in equal-width bins over the [-1, 1] range."""
+        counts, _ = np.histogram(sentiment_scores, bins=bins, range=(-1.0, 1.0))
+        return counts.tolist()
+
+    @staticmethod
+    def calculate_sentiment(text: str) -> int:
+        return ImageSummaryService.scale_sentiment(
+            ImageSummaryService.score_comment(text)
+        )
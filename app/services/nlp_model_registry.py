@@ -0,0 +1,69 @@
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+from flask import Flask
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from sumy.nlp.tokenizers import Tokenizer
+from sumy.summarizers.lsa import LsaSummarizer
+
+logger = logging.getLogger(__name__)
+
+
+class NlpModelRegistry:
+    """Process-wide registry of NLP models, each built at most once.
+
+    The registered objects are only read after construction (VADER's lexicon,
+    the Punkt sentence tokenizer and the LSA summarizer's stop words), so a
+    single instance is safely shared by all request and worker threads.
+    """
+
+    LANGUAGE: str = "english"
+
+    _lock = threading.Lock()
+    _models: Dict[str, Any] = {}
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        """Preload the models at worker start unless configured to load lazily."""
+        if not app.config.get("NLP_PRELOAD_MODELS", True):
+            return
+        try:
+            cls.preload()
+        except LookupError as e:
+            app.logger.warning("NLP models will be loaded on first use: %s", e)
+
+    @classmethod
+    def preload(cls) -> None:
+        cls.get_sentiment_analyzer()
+        cls.get_tokenizer()
+        cls.get_summarizer()
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._models = {}
+
+    @classmethod
+    def get_sentiment_analyzer(cls) -> SentimentIntensityAnalyzer:
+        return cls._get_or_load("sentiment_analyzer", SentimentIntensityAnalyzer)
+
+    @classmethod
+    def get_tokenizer(cls) -> Tokenizer:
+        return cls._get_or_load("tokenizer", lambda: Tokenizer(cls.LANGUAGE))
+
+    @classmethod
+    def get_summarizer(cls) -> LsaSummarizer:
+        return cls._get_or_load("summarizer", LsaSummarizer)
+
+    @classmethod
+    def _get_or_load(cls, name: str, factory: Callable[[], Any]) -> Any:
+        model = cls._models.get(name)
+        if model is None:
+            with cls._lock:
+                model = cls._models.get(name)
+                if model is None:
+                    logger.info("Loading NLP model %s", name)
+                    model = factory()
+                    cls._models = {**cls._models, name: model}
+        return model
@@ -0,0 +1,164 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Optional
+
+import nltk
+from flask import Flask
+
+from app.errors import NlpPoolSaturated, NlpTaskTimeout
+
+logger = logging.getLogger(__name__)
+
+WORKER_CONFIG_KEYS = (
+    "NLTK_DATA_DIR",
+    "SUMMARY_SENTENCES_COUNT",
+    "SUMMARY_MAX_SENTENCES",
+    "SUMMARY_SAMPLING",
+    "SUMMARY_TIME_BUDGET_SECONDS",
+    "SUMMARY_LSA_WORKERS",
+    "SENTIMENT_AGGREGATION",
+)
+
+
+def init_nlp_worker(config: dict) -> None:
+    """Configure the NLP services of a worker process and preload its models."""
+    # Imported here to avoid circular imports
+    from app.services.comment_summarizer import CommentSummarizer
+    from app.services.image_summary_service import ImageSummaryService
+    from app.services.nlp_model_registry import NlpModelRegistry
+
+    if config["NLTK_DATA_DIR"] not in nltk.data.path:
+        nltk.data.path.insert(0, config["NLTK_DATA_DIR"])
+    CommentSummarizer.sentences_count = config["SUMMARY_SENTENCES_COUNT"]
+    CommentSummarizer.max_sentences = config["SUMMARY_MAX_SENTENCES"]
+    CommentSummarizer.sampling = config["SUMMARY_SAMPLING"]
+    CommentSummarizer.time_budget_seconds = config["SUMMARY_TIME_BUDGET_SECONDS"]
+    CommentSummarizer.lsa_workers = config["SUMMARY_LSA_WORKERS"]
+    ImageSummaryService.sentiment_aggregation = config["SENTIMENT_AGGREGATION"]
+    NlpModelRegistry.preload()
+
+
+class NlpProcessPool:
+    """Optional process pool for CPU-bound NLP work.
+
+    With NLP_EXECUTION_MODE set to "process", ``run`` executes functions in a
+    pool of NLP_PROCESS_POOL_SIZE spawned worker processes with warm models,
+    so LSA and VADER never hold the GIL of a request-serving process. Calls
+    are thread-safe and work the same from request handlers and background
+    jobs. In the default "inline" mode functions run in the calling thread.
+
+    At most NLP_MAX_PENDING_TASKS tasks are queued or running at once. A task
+    that exceeds NLP_TASK_TIMEOUT_SECONDS, for example because its worker
+    crashed or hung, causes the pool to be replaced with a fresh one.
+    """
+
+    MODE_INLINE: str = "inline"
+    MODE_PROCESS: str = "process"
+
+    task_timeout_seconds: float = 10.0
+    queue_timeout_seconds: float = 5.0
+
+    _pool: Optional[Pool] = None
+    _pool_size: int = 1
+    _worker_config: dict = {}
+    _generation: int = 0
+    _pool_lock = threading.Lock()
+    _slots: Optional[threading.BoundedSemaphore] = None
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.shutdown()
+        if app.config.get("NLP_EXECUTION_MODE", cls.MODE_INLINE) != cls.MODE_PROCESS:
+            return
+
+        cls.task_timeout_seconds = app.config.get("NLP_TASK_TIMEOUT_SECONDS", 10.0)
+        cls.queue_timeout_seconds = app.config.get("NLP_QUEUE_TIMEOUT_SECONDS", 5.0)
+        cls._pool_size = app.config.get("NLP_PROCESS_POOL_SIZE") or os.cpu_count()
+        cls._worker_config = {key: app.config[key] for key in WORKER_CONFIG_KEYS}
+        cls._slots = threading.BoundedSemaphore(
+            app.config.get("NLP_MAX_PENDING_TASKS", 64)
+        )
+        with cls._pool_lock:
+            cls._pool = cls._create_pool()
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return cls._pool is not None
+
+    @classmethod
+    def run(cls, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a picklable function with its arguments and return its result.
+
+        Raises:
+            NlpPoolSaturated: If no queue slot frees up within
+                NLP_QUEUE_TIMEOUT_SECONDS.
+            NlpTaskTimeout: If the task does not finish within
+                NLP_TASK_TIMEOUT_SECONDS.
+        """
+        slots = cls._slots
+        if not cls.is_enabled() or slots is None:
+            return fn(*args)
+
+        if not slots.acquire(timeout=cls.queue_timeout_seconds):
+            raise NlpPoolSaturated("NLP process pool queue is full")
+        try:
+            deadline = time.monotonic() + cls.task_timeout_seconds
+            while True:
+                with cls._pool_lock:
+                    pool, generation = cls._pool, cls._generation
+                if pool is None:
+                    return fn(*args)
+                async_result = pool.apply_async(fn, args)
+                while not async_result.ready():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        cls._restart_pool(generation)
+                        raise NlpTaskTimeout(
+                            f"NLP task {getattr(fn, '__qualname__', fn)} timed out"
+                        )
+                    async_result.wait(min(remaining, 0.1))
+                    if cls._generation != generation:
+                        # The pool was replaced under us, resubmit to the new one
+                        break
+                else:
+                    return async_result.get()
+        finally:
+            slots.release()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.terminate()
+                cls._pool.join()
+                cls._pool = None
+            cls._slots = None
+
+    @classmethod
+    def _create_pool(cls) -> Pool:
+        # Spawn instead of fork: the app already runs background threads
+        context = multiprocessing.get_context("spawn")
+        return context.Pool(
+            cls._pool_size,
+            initializer=init_nlp_worker,
+            initargs=(cls._worker_config,),
+        )
+
+    @classmethod
+    def _restart_pool(cls, generation: int) -> None:
+        """Replace the pool, unless another thread already replaced it."""
+        with cls._pool_lock:
+            if cls._generation != generation or cls._pool is None:
+                return
+            logger.warning("Restarting the NLP process pool")
+            old_pool = cls._pool
+            cls._pool = cls._create_pool()
+            cls._generation += 1
+        old_pool.terminate()
+        old_pool.join()
@@ -0,0 +1,125 @@
+import fcntl
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple
+
+from flask import Flask
+
+
+class PackRef(NamedTuple):
+    segment: int
+    offset: int
+    length: int
+
+
+class PackStore:
+    """Append-only segment files holding many small records each.
+
+    Records are appended to the newest segment of a folder, which is sealed
+    and replaced by a new one once it outgrows ``BLOB_PACK_SEGMENT_BYTES``.
+    The caller keeps the ``PackRef`` of every record. Segments are read
+    through memory maps shared by all threads of a process.
+
+    Records are never removed from a segment; space is reclaimed by copying
+    the live records of a sealed segment to the newest one and removing the
+    sealed segment, see ``BlobStore.compact_packs``.
+    """
+
+    SEGMENT_SUFFIX = ".pack"
+    LOCK_FILE = ".lock"
+
+    segment_bytes: int = 256 * 1024 * 1024
+    _maps: Dict[str, mmap.mmap] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.segment_bytes = app.config.get("BLOB_PACK_SEGMENT_BYTES", cls.segment_bytes)
+
+    @classmethod
+    def get_segment_path(cls, folder: str, segment: int) -> str:
+        return os.path.join(folder, f"{segment:08d}{cls.SEGMENT_SUFFIX}")
+
+    @classmethod
+    def get_segments(cls, folder: str) -> List[int]:
+        """Get the numbers of the segments in a folder, oldest first."""
+        try:
+            filenames = os.listdir(folder)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(filename[: -len(cls.SEGMENT_SUFFIX)])
+            for filename in filenames
+            if filename.endswith(cls.SEGMENT_SUFFIX)
+        )
+
+    @classmethod
+    def append(cls, folder: str, data: bytes) -> PackRef:
+        """Append a record to the newest segment, starting a new one if full."""
+        os.makedirs(folder, exist_ok=True)
+        with cls._folder_lock(folder):
+            segments = cls.get_segments(folder)
+            segment = segments[-1] if segments else 0
+            segment_path = cls.get_segment_path(folder, segment)
+            if os.path.exists(segment_path):
+                size = os.path.getsize(segment_path)
+                if size and size + len(data) > cls.segment_bytes:
+                    segment += 1
+                    segment_path = cls.get_segment_path(folder, segment)
+
+            with open(segment_path, "ab") as segment_file:
+                offset = segment_file.seek(0, os.SEEK_END)
+                segment_file.write(data)
+        return PackRef(segment, offset, len(data))
+
+    @classmethod
+    def read(cls, folder: str, ref: PackRef) -> bytes:
+        """Read a record.
+
+        Raises:
+            FileNotFoundError: If the segment has been compacted away.
+        """
+        if not ref.length:
+            return b""
+        segment_path = cls.get_segment_path(folder, ref.segment)
+        end = ref.offset + ref.length
+        with cls._lock:
+            segment_map = cls._maps.get(segment_path)
+            if segment_map is None or len(segment_map) < end:
+                # Not mapped yet, or mapped before the record was appended
+                with open(segment_path, "rb") as segment_file:
+                    segment_map = mmap.mmap(
+                        segment_file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                cls._maps[segment_path] = segment_map
+        return segment_map[ref.offset : end]
+
+    @classmethod
+    def remove_segment(cls, folder: str, segment: int) -> int:
+        """Remove a segment whose records are no longer used.
+
+        Returns:
+            int: The size of the removed segment.
+        """
+        segment_path = cls.get_segment_path(folder, segment)
+        with cls._lock:
+            # Reads in flight keep their own reference to the map
+            cls._maps.pop(segment_path, None)
+        try:
+            size = os.path.getsize(segment_path)
+            os.remove(segment_path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+    @classmethod
+    @contextmanager
+    def _folder_lock(cls, folder: str) -> Iterator[None]:
+        with open(os.path.join(folder, cls.LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
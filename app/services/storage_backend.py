@@ -0,0 +1,370 @@
+import os
+import shutil
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, List, NamedTuple, Optional, Tuple, Union
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+from flask import Flask
+
+
+class ObjectInfo(NamedTuple):
+    key: str
+    size: int
+
+
+# Part numbers and ETags of the uploaded parts of a multipart upload
+UploadedParts = List[Tuple[int, str]]
+
+
+class StorageBackend(ABC):
+    """Object storage the BlobStore keeps blob contents in.
+
+    Objects are addressed by ``/``-separated keys and written whole: with
+    ``put``, ``put_file``, or a multipart upload of separately sent parts.
+    """
+
+    # True if objects are files on this host, see LocalStorageBackend
+    is_local: bool = False
+
+    def __init__(self, part_size: int = 8 * 1024 * 1024, max_concurrency: int = 4):
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+
+    @abstractmethod
+    def put(self, key: str, stream: BinaryIO) -> ObjectInfo:
+        """Store the content of a stream, read block by block."""
+
+    @abstractmethod
+    def get(self, key: str) -> BinaryIO:
+        """Open an object for streaming reads.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+
+    @abstractmethod
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        """Get the metadata of an object, or None if there is no such object."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete an object; deleting a missing object is not an error."""
+
+    @abstractmethod
+    def create_multipart_upload(self, key: str) -> str:
+        """Start a multipart upload.
+
+        Returns:
+            str: The id of the upload.
+        """
+
+    @abstractmethod
+    def upload_part(
+        self, key: str, upload_id: str, part_number: int, data: bytes
+    ) -> str:
+        """Upload a part of a multipart upload, numbered from 1.
+
+        Returns:
+            str: The ETag of the part, for ``complete_multipart_upload``.
+        """
+
+    @abstractmethod
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, parts: UploadedParts
+    ) -> ObjectInfo:
+        """Assemble the uploaded parts, in part number order, into the object."""
+
+    @abstractmethod
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        pass
+
+    def put_file(self, key: str, path: str) -> ObjectInfo:
+        """Store a copy of a file.
+
+        Files larger than ``part_size`` are sent as a multipart upload with up
+        to ``max_concurrency`` parts in flight.
+        """
+        size = os.path.getsize(path)
+        if size <= self.part_size:
+            with open(path, "rb") as file:
+                return self.put(key, file)
+
+        upload_id = self.create_multipart_upload(key)
+        fd = os.open(path, os.O_RDONLY)
+
+        def upload(part_number: int) -> Tuple[int, str]:
+            offset = (part_number - 1) * self.part_size
+            data = os.pread(fd, self.part_size, offset)
+            return part_number, self.upload_part(key, upload_id, part_number, data)
+
+        try:
+            part_count = -(-size // self.part_size)
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                parts = list(executor.map(upload, range(1, part_count + 1)))
+            return self.complete_multipart_upload(key, upload_id, parts)
+        except BaseException:
+            self.abort_multipart_upload(key, upload_id)
+            raise
+        finally:
+            os.close(fd)
+
+    def download(self, key: str, path: str) -> None:
+        """Write an object to a file, replacing the file atomically.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with self.get(key) as source, open(temp_path, "wb") as target:
+                shutil.copyfileobj(source, target, self.part_size)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+class LocalStorageBackend(StorageBackend):
+    """Objects stored as files below a folder of this host."""
+
+    is_local = True
+
+    def __init__(self, folder: Union[str, Callable[[], str]], **kwargs):
+        """
+        Args:
+            folder: The root folder, or a function returning it; called on
+                every access, for roots that depend on the app config.
+        """
+        super().__init__(**kwargs)
+        self._folder = folder
+
+    def get_path(self, key: str) -> str:
+        folder = self._folder() if callable(self._folder) else self._folder
+        return os.path.join(folder, *key.split("/"))
+
+    def put(self, key: str, stream: BinaryIO) -> ObjectInfo:
+        path = self.get_path(key)
+        fd, temp_path = self._create_temp_file(path)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                shutil.copyfileobj(stream, temp_file, self.part_size)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return ObjectInfo(key, os.path.getsize(path))
+
+    def put_file(self, key: str, path: str) -> ObjectInfo:
+        object_path = self.get_path(key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        temp_path = f"{object_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(path, temp_path)
+        except OSError:
+            # Another filesystem
+            shutil.copyfile(path, temp_path)
+        os.replace(temp_path, object_path)
+        return ObjectInfo(key, os.path.getsize(object_path))
+
+    def get(self, key: str) -> BinaryIO:
+        return open(self.get_path(key), "rb")
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            return ObjectInfo(key, os.path.getsize(self.get_path(key)))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def create_multipart_upload(self, key: str) -> str:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._get_upload_folder(upload_id))
+        return upload_id
+
+    def upload_part(
+        self, key: str, upload_id: str, part_number: int, data: bytes
+    ) -> str:
+        part_path = os.path.join(self._get_upload_folder(upload_id), str(part_number))
+        with open(part_path, "wb") as part_file:
+            part_file.write(data)
+        return str(part_number)
+
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, parts: UploadedParts
+    ) -> ObjectInfo:
+        upload_folder = self._get_upload_folder(upload_id)
+        path = self.get_path(key)
+        fd, temp_path = self._create_temp_file(path)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for part_number, _ in sorted(parts):
+                    with open(
+                        os.path.join(upload_folder, str(part_number)), "rb"
+                    ) as part:
+                        shutil.copyfileobj(part, temp_file, self.part_size)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        shutil.rmtree(upload_folder, ignore_errors=True)
+        return ObjectInfo(key, os.path.getsize(path))
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        shutil.rmtree(self._get_upload_folder(upload_id), ignore_errors=True)
+
+    def _get_upload_folder(self, upload_id: str) -> str:
+        return self.get_path(f"tmp/multipart-{upload_id}")
+
+    def _create_temp_file(self, path: str) -> Tuple[int, str]:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+
+
+class S3StorageBackend(StorageBackend):
+    """Objects stored in a bucket of S3 or an S3-compatible service.
+
+    One client, and so one connection pool of ``max_pool_connections``, is
+    shared by all threads.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        max_pool_connections: int = 10,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            config=BotoConfig(
+                max_pool_connections=max_pool_connections,
+                retries={"mode": "standard"},
+            ),
+        )
+
+    def get_object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, stream: BinaryIO) -> ObjectInfo:
+        # Large streams are sent as multipart uploads, parts in parallel
+        self.client.upload_fileobj(
+            stream,
+            self.bucket,
+            self.get_object_key(key),
+            Config=TransferConfig(
+                multipart_chunksize=self.part_size,
+                multipart_threshold=self.part_size,
+                max_concurrency=self.max_concurrency,
+            ),
+        )
+        return self.head(key)
+
+    def get(self, key: str) -> BinaryIO:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self.get_object_key(key)
+            )
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(key)
+        return response["Body"]
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            response = self.client.head_object(
+                Bucket=self.bucket, Key=self.get_object_key(key)
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectInfo(key, response["ContentLength"])
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.get_object_key(key))
+
+    def create_multipart_upload(self, key: str) -> str:
+        response = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=self.get_object_key(key)
+        )
+        return response["UploadId"]
+
+    def upload_part(
+        self, key: str, upload_id: str, part_number: int, data: bytes
+    ) -> str:
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.get_object_key(key),
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return response["ETag"]
+
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, parts: UploadedParts
+    ) -> ObjectInfo:
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.get_object_key(key),
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": part_number, "ETag": etag}
+                    for part_number, etag in sorted(parts)
+                ]
+            },
+        )
+        return self.head(key)
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.get_object_key(key), UploadId=upload_id
+        )
+
+
+def create_storage_backend(
+    app: Flask, local_folder: Union[str, Callable[[], str]]
+) -> StorageBackend:
+    """Create the backend configured with ``STORAGE_BACKEND``.
+
+    Args:
+        app (Flask): The app whose config is used.
+        local_folder: The root folder of the local backend.
+    """
+    options = {
+        "part_size": app.config.get("STORAGE_PART_SIZE", 8 * 1024 * 1024),
+        "max_concurrency": app.config.get("STORAGE_MAX_CONCURRENCY", 4),
+    }
+    backend_name = app.config.get("STORAGE_BACKEND", "local")
+    if backend_name == "local":
+        return LocalStorageBackend(local_folder, **options)
+    if backend_name == "s3":
+        return S3StorageBackend(
+            bucket=app.config["S3_BUCKET"],
+            prefix=app.config.get("S3_PREFIX", ""),
+            endpoint_url=app.config.get("S3_ENDPOINT_URL"),
+            region_name=app.config.get("S3_REGION"),
+            max_pool_connections=app.config.get("S3_MAX_POOL_CONNECTIONS", 10),
+            **options,
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend_name!r}")
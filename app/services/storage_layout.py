@@ -0,0 +1,116 @@
+import hashlib
+import os
+import posixpath
+from typing import Optional
+from uuid import UUID
+
+from flask import Flask, current_app
+from werkzeug.utils import secure_filename
+
+
+class StorageLayout:
+    """Where image files are stored below ``UPLOAD_FOLDER``.
+
+    The files of a user are fanned out over ``UPLOAD_SHARD_LEVELS`` levels of
+    directories, named after hex prefixes of the hash of the filename:
+    ``<user_id>/3f/a2/<filename>``. With 0 levels, all files of a user are
+    in ``<user_id>/``, the layout used before sharding.
+
+    Files still in the flat layout are found too, so existing files can be
+    moved with ``flask storage migrate-layout`` while the service runs.
+    """
+
+    shard_levels: int = 2
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.shard_levels = app.config.get("UPLOAD_SHARD_LEVELS", cls.shard_levels)
+
+    @classmethod
+    def get_relative_path(
+        cls, user_id: UUID, filename: str, shard_levels: Optional[int] = None
+    ) -> str:
+        """Get the path of an image file relative to ``UPLOAD_FOLDER``.
+
+        Args:
+            user_id (UUID): The owner of the image.
+            filename (str): The filename of the image.
+            shard_levels (Optional[int]): Levels of the layout, defaults to
+                ``UPLOAD_SHARD_LEVELS``.
+        """
+        if shard_levels is None:
+            shard_levels = cls.shard_levels
+        filename = secure_filename(filename)
+        digest = hashlib.sha256(filename.encode()).hexdigest()
+        shards = [digest[level * 2 : level * 2 + 2] for level in range(shard_levels)]
+        return posixpath.join(str(user_id), *shards, filename)
+
+    @classmethod
+    def get_path(
+        cls, user_id: UUID, filename: str, shard_levels: Optional[int] = None
+    ) -> str:
+        return os.path.join(
+            current_app.config["UPLOAD_FOLDER"],
+            cls.get_relative_path(user_id, filename, shard_levels),
+        )
+
+    @classmethod
+    def resolve_relative_path(cls, user_id: UUID, filename: str) -> str:
+        """Get the relative path an image file is stored at.
+
+        This is the path in the configured layout, unless the file is only
+        found in the flat layout because it has not been migrated yet.
+        """
+        relative_path = cls.get_relative_path(user_id, filename)
+        if cls.shard_levels == 0:
+            return relative_path
+        upload_folder = current_app.config["UPLOAD_FOLDER"]
+        if os.path.exists(os.path.join(upload_folder, relative_path)):
+            return relative_path
+        flat_relative_path = cls.get_relative_path(user_id, filename, shard_levels=0)
+        if os.path.exists(os.path.join(upload_folder, flat_relative_path)):
+            return flat_relative_path
+        return relative_path
+
+    @classmethod
+    def resolve_path(cls, user_id: UUID, filename: str) -> str:
+        return os.path.join(
+            current_app.config["UPLOAD_FOLDER"],
+            cls.resolve_relative_path(user_id, filename),
+        )
+
+    @classmethod
+    def migrate_file(cls, user_id: UUID, filename: str) -> bool:
+        """Move an image file from the flat layout to the configured one.
+
+        The file is first linked at its new path and then unlinked from the
+        old one, so it can be found by readers at all times.
+
+        Returns:
+            bool: True if the file was moved.
+        """
+        if cls.shard_levels == 0:
+            return False
+        flat_path = cls.get_path(user_id, filename, shard_levels=0)
+        path = cls.get_path(user_id, filename)
+        if not os.path.exists(flat_path):
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(flat_path, path)
+        except FileExistsError:
+            # Saved again since the migration started; the new file wins
+            pass
+        cls.remove_flat_file(user_id, filename)
+        return True
+
+    @classmethod
+    def remove_flat_file(cls, user_id: UUID, filename: str) -> None:
+        """Remove the flat layout copy of a file stored in the configured layout."""
+        if cls.shard_levels == 0:
+            return
+        try:
+            os.remove(cls.get_path(user_id, filename, shard_levels=0))
+        except FileNotFoundError:
+            pass
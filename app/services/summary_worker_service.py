@@ -0,0 +1,174 @@
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional, Set
+from uuid import UUID
+
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingDispatcher:
+    """Run a handler in a bounded thread pool, once per burst of events per key.
+
+    The first event for a key schedules a run ``debounce_seconds`` later; every
+    further event for the same key before that run starts is coalesced into it.
+    Events arriving while the key is running schedule exactly one follow-up run.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Hashable], None],
+        debounce_seconds: float,
+        max_workers: int,
+    ):
+        self._handler = handler
+        self._debounce_seconds = debounce_seconds
+        self._max_workers = max_workers
+        self._pending: Dict[Hashable, float] = {}
+        self._running: Set[Hashable] = set()
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher_thread: Optional[threading.Thread] = None
+        self._stopped = True
+        self._submitted = 0
+        self._coalesced = 0
+        self._completed = 0
+        self._failed = 0
+
+    def start(self) -> None:
+        with self._condition:
+            if not self._stopped:
+                return
+            self._stopped = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="summary-worker"
+        )
+        self._dispatcher_thread = threading.Thread(
+            target=self._dispatch_loop, name="summary-dispatcher", daemon=True
+        )
+        self._dispatcher_thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop dispatching; pending keys that have not started yet are dropped."""
+        with self._condition:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify_all()
+        self._dispatcher_thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def submit(self, key: Hashable) -> bool:
+        """Mark a key as dirty.
+
+        Returns:
+            bool: True if the event was coalesced into an already pending run.
+        """
+        with self._condition:
+            self._submitted += 1
+            if key in self._pending:
+                self._coalesced += 1
+                return True
+            self._pending[key] = time.monotonic() + self._debounce_seconds
+            self._condition.notify()
+            return False
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "queue_depth": len(self._pending),
+                "in_flight": len(self._running),
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def _dispatch_loop(self) -> None:
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                next_deadline = None
+                for key, deadline in sorted(self._pending.items(), key=lambda i: i[1]):
+                    if len(self._running) >= self._max_workers:
+                        break
+                    if key in self._running:
+                        continue
+                    if deadline > now:
+                        next_deadline = deadline
+                        break
+                    del self._pending[key]
+                    self._running.add(key)
+                    self._executor.submit(self._run, key)
+
+                timeout = None if next_deadline is None else next_deadline - now
+                self._condition.wait(timeout)
+
+    def _run(self, key: Hashable) -> None:
+        failed = False
+        try:
+            self._handler(key)
+        except Exception:
+            failed = True
+            logger.exception("Summary worker failed for %s", key)
+        finally:
+            with self._condition:
+                self._running.discard(key)
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._condition.notify()
+
+
+class SummaryWorkerService:
+    _dispatcher: Optional[CoalescingDispatcher] = None
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        """Start the background summary worker if it is enabled in the app config."""
+        if not app.config.get("SUMMARY_WORKER_ENABLED", True):
+            return
+
+        def refresh_comment_summary(image_id: UUID) -> None:
+            # Imported here to avoid circular imports
+            from app.services.image_summary_service import ImageSummaryService
+
+            with app.app_context():
+                ImageSummaryService.refresh_comment_summary(image_id)
+
+        cls.shutdown()
+        cls._dispatcher = CoalescingDispatcher(
+            refresh_comment_summary,
+            debounce_seconds=app.config.get("SUMMARY_DEBOUNCE_SECONDS", 2.0),
+            max_workers=app.config.get("SUMMARY_WORKER_POOL_SIZE", 2),
+        )
+        cls._dispatcher.start()
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def mark_dirty(cls, image_id: UUID) -> None:
+        """Request a background recompute of the image's text summary.
+
+        When the worker is disabled the summary is still recomputed lazily on
+        read.
+        """
+        if cls._dispatcher:
+            cls._dispatcher.submit(image_id)
+
+    @classmethod
+    def stats(cls) -> dict:
+        if cls._dispatcher:
+            return {"enabled": True, **cls._dispatcher.stats()}
+        return {"enabled": False}
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._dispatcher:
+            cls._dispatcher.stop()
+            cls._dispatcher = None
@@ -0,0 +1,504 @@
+import atexit
+import fcntl
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from flask import Flask
+from PIL import Image as PilImage
+
+from app.models.image import Image
+from app.services.blob_store import ImageSource
+from app.services.derivative_service import (
+    DERIVATIVE_FORMATS,
+    DerivativeService,
+    open_image,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TileSettings(NamedTuple):
+    tile_size: int
+    overlap: int
+    format_name: str
+    quality: int
+    # Decompression bomb limit for the source image, see PIL.Image.MAX_IMAGE_PIXELS
+    max_pixels: int
+
+
+def set_max_pixels(max_pixels: int) -> None:
+    """Set the decompression bomb limit of Pillow in this process.
+
+    The limit is global to the process, so it is set once when the app is
+    initialized and when a tile pool task starts, never per request.
+    """
+    PilImage.MAX_IMAGE_PIXELS = max_pixels or None
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on ``path``, across threads and processes."""
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class TilePyramid:
+    """The Deep Zoom (DZI) tile pyramid of one image.
+
+    Level ``max_level`` is the image at full size and every level below it
+    halves the previous one, down to a single pixel at level 0. The pyramid
+    folder holds:
+
+    - ``pyramid.json``: the image size and tile settings.
+    - ``source.rgb``: the decoded image as raw RGB rows, memory-mapped to
+      render tiles without decoding the original again.
+    - ``tiles.pack``: every rendered tile, appended one after the other.
+    - ``tiles.index``: the ``(offset, length)`` of every tile in the pack,
+      with length 0 for tiles that are not rendered yet.
+    """
+
+    META_FILE = "pyramid.json"
+    SOURCE_FILE = "source.rgb"
+    PACK_FILE = "tiles.pack"
+    INDEX_FILE = "tiles.index"
+    LOCK_FILE = ".lock"
+
+    def __init__(
+        self,
+        folder: str,
+        image_source: ImageSource,
+        width: int,
+        height: int,
+        settings: TileSettings,
+    ):
+        self.folder = folder
+        self.image_source = image_source
+        self.width = width
+        self.height = height
+        self.settings = settings
+        self.max_level = math.ceil(math.log2(max(width, height, 1)))
+        self._level_offsets: List[int] = []
+        self.tile_count = 0
+        for level in range(self.max_level + 1):
+            self._level_offsets.append(self.tile_count)
+            columns, rows = self.get_grid(level)
+            self.tile_count += columns * rows
+        self._index: Optional[np.memmap] = None
+        self._source: Optional[np.memmap] = None
+
+    @classmethod
+    def open(
+        cls, folder: str, image_source: ImageSource, settings: TileSettings
+    ) -> "TilePyramid":
+        """Open the pyramid in ``folder``, creating it on first use.
+
+        An existing pyramid keeps the settings it was created with.
+        """
+        meta_path = os.path.join(folder, cls.META_FILE)
+        if not os.path.exists(meta_path):
+            os.makedirs(folder, exist_ok=True)
+            with file_lock(os.path.join(folder, cls.LOCK_FILE)):
+                if not os.path.exists(meta_path):
+                    with open_image(image_source) as source:
+                        width, height = source.size
+                    pyramid = cls(folder, image_source, width, height, settings)
+                    pyramid._create_files()
+                    return pyramid
+
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        return cls(
+            folder,
+            image_source,
+            meta["width"],
+            meta["height"],
+            TileSettings(**meta["settings"]),
+        )
+
+    def get_level_size(self, level: int) -> Tuple[int, int]:
+        factor = 2 ** (self.max_level - level)
+        return math.ceil(self.width / factor), math.ceil(self.height / factor)
+
+    def get_grid(self, level: int) -> Tuple[int, int]:
+        """Get the number of tile columns and rows of a level."""
+        level_width, level_height = self.get_level_size(level)
+        tile_size = self.settings.tile_size
+        return math.ceil(level_width / tile_size), math.ceil(level_height / tile_size)
+
+    def get_tile_number(self, level: int, x: int, y: int) -> Optional[int]:
+        """Get the position of a tile in the index, or None if there is no such tile."""
+        if not 0 <= level <= self.max_level:
+            return None
+        columns, rows = self.get_grid(level)
+        if not (0 <= x < columns and 0 <= y < rows):
+            return None
+        return self._level_offsets[level] + y * columns + x
+
+    def get_tile_box(self, level: int, x: int, y: int) -> Tuple[int, int, int, int]:
+        """Get the ``(left, top, right, bottom)`` of a tile in level pixels."""
+        level_width, level_height = self.get_level_size(level)
+        tile_size, overlap = self.settings.tile_size, self.settings.overlap
+        left = x * tile_size - (overlap if x > 0 else 0)
+        top = y * tile_size - (overlap if y > 0 else 0)
+        right = min((x + 1) * tile_size + overlap, level_width)
+        bottom = min((y + 1) * tile_size + overlap, level_height)
+        return left, top, right, bottom
+
+    def get_descriptor(self) -> str:
+        """Get the DZI XML descriptor of the pyramid."""
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008"'
+            f' TileSize="{self.settings.tile_size}"'
+            f' Overlap="{self.settings.overlap}"'
+            f' Format="{DERIVATIVE_FORMATS[self.settings.format_name].extension}">'
+            f'<Size Width="{self.width}" Height="{self.height}"/>'
+            "</Image>"
+        )
+
+    def read_tile(self, tile_number: int) -> Optional[bytes]:
+        """Read a rendered tile from the pack, or None if it is not rendered yet."""
+        index = self._get_index()
+        length = int(index[tile_number, 1])
+        if not length:
+            return None
+        offset = int(index[tile_number, 0])
+        with open(self._path(self.PACK_FILE), "rb") as pack_file:
+            return os.pread(pack_file.fileno(), length, offset)
+
+    def get_tile(self, level: int, x: int, y: int) -> Optional[bytes]:
+        """Get a tile, rendering it into the pack if it is not there yet.
+
+        Returns:
+            Optional[bytes]: The encoded tile, or None if there is no such tile.
+        """
+        tile_number = self.get_tile_number(level, x, y)
+        if tile_number is None:
+            return None
+        tile = self.read_tile(tile_number)
+        if tile is None:
+            tile = self.render_tile(level, x, y)
+            self.store_tile(tile_number, tile)
+        return tile
+
+    def render_tile(self, level: int, x: int, y: int) -> bytes:
+        source = self._get_source()
+        factor = 2 ** (self.max_level - level)
+        left, top, right, bottom = self.get_tile_box(level, x, y)
+        # Subsample the source rows and columns, leaving at most a 2x
+        # reduction to the resampling filter
+        step = max(factor // 2, 1)
+        region = source[
+            top * factor : min(bottom * factor, self.height) : step,
+            left * factor : min(right * factor, self.width) : step,
+        ]
+        tile = PilImage.fromarray(np.ascontiguousarray(region))
+        size = (right - left, bottom - top)
+        if tile.size != size:
+            tile = tile.resize(size, PilImage.Resampling.LANCZOS)
+
+        tile_format = DERIVATIVE_FORMATS[self.settings.format_name]
+        buffer = io.BytesIO()
+        tile.save(buffer, tile_format.pil_format, quality=self.settings.quality)
+        return buffer.getvalue()
+
+    def store_tile(self, tile_number: int, tile: bytes) -> None:
+        """Append a tile to the pack, unless another writer already stored it."""
+        index = self._get_index()
+        with file_lock(self._path(self.LOCK_FILE)):
+            if index[tile_number, 1]:
+                return
+            with open(self._path(self.PACK_FILE), "ab") as pack_file:
+                offset = pack_file.seek(0, os.SEEK_END)
+                pack_file.write(tile)
+            # Readers check the length first, so it is written last
+            index[tile_number, 0] = offset
+            index[tile_number, 1] = len(tile)
+
+    def build(self) -> int:
+        """Render every tile that is not in the pack yet.
+
+        Returns:
+            int: The number of tiles rendered.
+        """
+        rendered = 0
+        for level in range(self.max_level, -1, -1):
+            columns, rows = self.get_grid(level)
+            for y in range(rows):
+                for x in range(columns):
+                    tile_number = self.get_tile_number(level, x, y)
+                    if not self._get_index()[tile_number, 1]:
+                        self.store_tile(tile_number, self.render_tile(level, x, y))
+                        rendered += 1
+        self._get_index().flush()
+        return rendered
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.folder, filename)
+
+    def _create_files(self) -> None:
+        np.zeros((self.tile_count, 2), dtype=np.int64).tofile(
+            self._path(self.INDEX_FILE)
+        )
+        open(self._path(self.PACK_FILE), "wb").close()
+        meta = {
+            "width": self.width,
+            "height": self.height,
+            "settings": self.settings._asdict(),
+        }
+        # The metadata file marks the pyramid as created, so it comes last
+        temp_path = self._path(f"{self.META_FILE}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(temp_path, self._path(self.META_FILE))
+
+    def _get_index(self) -> np.memmap:
+        if self._index is None:
+            self._index = np.memmap(
+                self._path(self.INDEX_FILE),
+                dtype=np.int64,
+                mode="r+",
+                shape=(self.tile_count, 2),
+            )
+        return self._index
+
+    def has_source(self) -> bool:
+        """Whether the source image is decoded already, see ``SOURCE_FILE``."""
+        return self._source is not None or os.path.exists(self._path(self.SOURCE_FILE))
+
+    def _get_source(self) -> np.memmap:
+        if self._source is None:
+            decoded_path = self._path(self.SOURCE_FILE)
+            if not os.path.exists(decoded_path):
+                with file_lock(self._path(self.LOCK_FILE)):
+                    if not os.path.exists(decoded_path):
+                        self._decode_source(decoded_path)
+            self._source = np.memmap(
+                decoded_path,
+                dtype=np.uint8,
+                mode="r",
+                shape=(self.height, self.width, 3),
+            )
+        return self._source
+
+    def _decode_source(self, path: str) -> None:
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open_image(self.image_source) as original:
+            pixels = np.memmap(
+                temp_path, dtype=np.uint8, mode="w+", shape=(self.height, self.width, 3)
+            )
+            # Pillow decodes the whole original; converting it to RGB strip by
+            # strip keeps a converted copy of it from being held as well
+            strip_height = max(1, (64 * 1024 * 1024) // (self.width * 3))
+            for top in range(0, self.height, strip_height):
+                bottom = min(top + strip_height, self.height)
+                strip = original.crop((0, top, self.width, bottom)).convert("RGB")
+                pixels[top:bottom] = np.asarray(strip)
+            pixels.flush()
+            del pixels
+        os.replace(temp_path, path)
+
+
+def build_tile_pyramid(
+    folder: str, image_source: ImageSource, settings: TileSettings
+) -> int:
+    """Build the whole tile pyramid of an image. Runs in a TileService worker."""
+    set_max_pixels(settings.max_pixels)
+    return TilePyramid.open(folder, image_source, settings).build()
+
+
+def decode_tile_source(
+    folder: str, image_source: ImageSource, settings: TileSettings
+) -> None:
+    """Decode the source image of a pyramid. Runs in a TileService worker."""
+    set_max_pixels(settings.max_pixels)
+    TilePyramid.open(folder, image_source, settings)._get_source()
+
+
+class TileService:
+    """Deep Zoom tile pyramids of large images.
+
+    Pyramids of images with at least ``TILE_MIN_PIXELS`` pixels are built
+    on a process pool right after the image is saved; tiles of any other
+    image, or of a pyramid still being built, are rendered on demand. A tile
+    is rendered by one request at a time in a process, and stored once.
+    Source images are only ever decoded in a process, as decoding a large
+    image takes as much memory as its pixels. Decodes for tile requests run
+    on a pool of their own, so they never wait for the builds queued before
+    them; one racing the build of its own image waits only until the build
+    has decoded the source.
+    """
+
+    POOL_BUILD = "build"
+    POOL_DECODE = "decode"
+
+    settings = TileSettings(
+        tile_size=256,
+        overlap=1,
+        format_name="jpeg",
+        quality=80,
+        max_pixels=PilImage.MAX_IMAGE_PIXELS or 0,
+    )
+    min_pixels: int = 16_000_000
+    timeout_seconds: float = 60.0
+    _pool_sizes: Dict[str, Optional[int]] = {}
+    _executors: Dict[str, ProcessPoolExecutor] = {}
+    _inflight: Dict[str, Future] = {}
+    _lock = threading.Lock()
+    # Striped locks, so concurrent requests for one tile render it once
+    _tile_locks = [threading.Lock() for _ in range(64)]
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.shutdown()
+        format_name = app.config.get("TILE_FORMAT", cls.settings.format_name)
+        if format_name not in DERIVATIVE_FORMATS:
+            format_name = cls.settings.format_name
+        cls.settings = TileSettings(
+            tile_size=app.config.get("TILE_SIZE", cls.settings.tile_size),
+            overlap=app.config.get("TILE_OVERLAP", cls.settings.overlap),
+            format_name=format_name,
+            quality=app.config.get("TILE_QUALITY", cls.settings.quality),
+            max_pixels=app.config.get("TILE_MAX_PIXELS", cls.settings.max_pixels),
+        )
+        set_max_pixels(cls.settings.max_pixels)
+        cls.min_pixels = app.config.get("TILE_MIN_PIXELS", cls.min_pixels)
+        cls.timeout_seconds = app.config.get(
+            "TILE_TIMEOUT_SECONDS", cls.timeout_seconds
+        )
+        cls._pool_sizes = {
+            cls.POOL_BUILD: app.config.get("TILE_POOL_SIZE"),
+            cls.POOL_DECODE: app.config.get("TILE_DECODE_POOL_SIZE"),
+        }
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def get_pyramid_folder(cls, image: Image, image_source: ImageSource) -> str:
+        return os.path.join(
+            DerivativeService.get_derivative_folder(image, image_source), "tiles"
+        )
+
+    @classmethod
+    def get_pyramid(cls, image: Image, image_source: ImageSource) -> TilePyramid:
+        return TilePyramid.open(
+            cls.get_pyramid_folder(image, image_source), image_source, cls.settings
+        )
+
+    @classmethod
+    def get_tile(
+        cls, pyramid: TilePyramid, level: int, x: int, y: int
+    ) -> Optional[bytes]:
+        """Get an encoded tile, or None if the pyramid has no such tile.
+
+        Raises:
+            concurrent.futures.TimeoutError: If decoding the source image
+                takes longer than ``TILE_TIMEOUT_SECONDS``.
+        """
+        tile_number = pyramid.get_tile_number(level, x, y)
+        if tile_number is None:
+            return None
+        tile = pyramid.read_tile(tile_number)
+        if tile is None:
+            if not pyramid.has_source():
+                decode_path = os.path.join(pyramid.folder, TilePyramid.SOURCE_FILE)
+                future = cls._submit(
+                    cls.POOL_DECODE,
+                    decode_path,
+                    decode_tile_source,
+                    pyramid.folder,
+                    pyramid.image_source,
+                    pyramid.settings,
+                )
+                future.result(timeout=cls.timeout_seconds)
+            lock = cls._tile_locks[hash((pyramid.folder, tile_number)) % 64]
+            with lock:
+                tile = pyramid.get_tile(level, x, y)
+        return tile
+
+    @classmethod
+    def schedule(cls, image: Image, image_source: ImageSource) -> Optional[Future]:
+        """Start building the pyramid of an image if it is large enough."""
+        try:
+            with open_image(image_source) as source:
+                width, height = source.size
+        except (OSError, PilImage.DecompressionBombError) as e:
+            logger.warning("Not building tiles of image %s: %s", image.id, e)
+            return None
+        if width * height < cls.min_pixels:
+            return None
+
+        folder = cls.get_pyramid_folder(image, image_source)
+        return cls._submit(
+            cls.POOL_BUILD,
+            folder,
+            build_tile_pyramid,
+            folder,
+            image_source,
+            cls.settings,
+        )
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._lock:
+            executors, cls._executors = cls._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _create_executor(cls, pool: str) -> ProcessPoolExecutor:
+        # Workers are started lazily, when tasks are submitted
+        return ProcessPoolExecutor(
+            max_workers=cls._pool_sizes.get(pool),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    @classmethod
+    def _submit(
+        cls, pool: str, key: str, task: Callable[..., Any], *args: Any
+    ) -> Future:
+        """Run a task on a pool, unless one for ``key`` is running already.
+
+        Args:
+            pool (str): ``POOL_BUILD`` or ``POOL_DECODE``.
+
+        Returns:
+            Future: The running task for ``key``.
+        """
+        with cls._lock:
+            if key in cls._inflight:
+                return cls._inflight[key]
+            if pool not in cls._executors:
+                cls._executors[pool] = cls._create_executor(pool)
+            try:
+                future = cls._executors[pool].submit(task, *args)
+            except BrokenProcessPool:
+                # A worker died and took the pool down; start a new one
+                logger.warning("Tile %s pool is broken, restarting it", pool)
+                cls._executors[pool] = cls._create_executor(pool)
+                future = cls._executors[pool].submit(task, *args)
+            cls._inflight[key] = future
+
+        def forget(done: Future) -> None:
+            with cls._lock:
+                if cls._inflight.get(key) is done:
+                    del cls._inflight[key]
+            if not done.cancelled() and done.exception():
+                logger.warning("Tile task for %s failed: %s", key, done.exception())
+
+        future.add_done_callback(forget)
+        return future
@@ -0,0 +1,234 @@
+import os
+from datetime import datetime, timedelta
+from typing import BinaryIO, List, NamedTuple, Tuple
+from uuid import UUID
+
+from flask import Flask
+
+from app.errors import (
+    InvalidUploadChunk,
+    TooManyUploadSessions,
+    UploadIncomplete,
+    UploadQuotaExceeded,
+    UploadSessionNotFound,
+)
+from app.models.image import Image
+from app.models.upload_session import UploadSession
+from app.repos.image import ImageRepo
+from app.repos.upload_session import UploadSessionRepo
+from app.services.blob_store import BlobStore
+from app.services.core_services import db
+from app.services.image_service import ImageService
+
+
+class UploadProgress(NamedTuple):
+    # Length of the contiguous prefix received so far; resume from here
+    offset: int
+    received_bytes: int
+    missing_ranges: List[Tuple[int, int]]
+
+
+class UploadService:
+    """Resumable uploads written in place.
+
+    An upload session preallocates a partial file in the BlobStore. Chunks
+    are written into it at their offsets as they are streamed from the
+    request, in any order and concurrently, and the file is renamed into the
+    store when the upload is completed.
+    """
+
+    block_size: int = 1024 * 1024
+    session_ttl: timedelta = timedelta(hours=24)
+    max_open_sessions: int = 10
+    max_reserved_bytes: int = 1024 * 1024 * 1024
+
+    @classmethod
+    def initialize(cls, app: Flask) -> None:
+        cls.block_size = app.config.get("UPLOAD_BLOCK_SIZE", cls.block_size)
+        cls.max_open_sessions = app.config.get(
+            "UPLOAD_MAX_OPEN_SESSIONS", cls.max_open_sessions
+        )
+        cls.max_reserved_bytes = app.config.get(
+            "UPLOAD_MAX_RESERVED_BYTES", cls.max_reserved_bytes
+        )
+        cls.session_ttl = timedelta(
+            seconds=app.config.get(
+                "UPLOAD_SESSION_TTL_SECONDS", cls.session_ttl.total_seconds()
+            )
+        )
+
+    @classmethod
+    def get_partial_file_path(cls, upload_session: UploadSession) -> str:
+        # Kept inside the blob store so completing the upload is a rename
+        return os.path.join(
+            BlobStore.get_blob_folder(), "tmp", f"upload-{upload_session.id}.part"
+        )
+
+    @classmethod
+    def create_session(
+        cls, user_id: UUID, filename: str, total_size: int, is_public: bool = False
+    ) -> UploadSession:
+        """Start an upload and preallocate its partial file.
+
+        Raises:
+            TooManyUploadSessions: If the user has ``max_open_sessions`` open.
+            UploadQuotaExceeded: If the user's open uploads would reserve more
+                than ``max_reserved_bytes``.
+        """
+        cls.purge_expired(user_id)
+        # Locked until the session is created, so concurrent requests of the
+        # user cannot pass the limits together
+        open_sessions, reserved_bytes = UploadSessionRepo.lock_usage(user_id)
+        try:
+            if open_sessions >= cls.max_open_sessions:
+                raise TooManyUploadSessions(
+                    f"At most {cls.max_open_sessions} uploads can be open at once"
+                )
+            if reserved_bytes + total_size > cls.max_reserved_bytes:
+                raise UploadQuotaExceeded(
+                    f"Open uploads can reserve at most {cls.max_reserved_bytes} bytes"
+                )
+        except Exception:
+            db.session.rollback()
+            raise
+        upload_session = UploadSessionRepo.create(
+            user_id=user_id,
+            filename=filename,
+            total_size=total_size,
+            is_public=is_public,
+            expires_at=datetime.now() + cls.session_ttl,
+        )
+        partial_file_path = cls.get_partial_file_path(upload_session)
+        os.makedirs(os.path.dirname(partial_file_path), exist_ok=True)
+        with open(partial_file_path, "wb") as partial_file:
+            partial_file.truncate(total_size)
+        return upload_session
+
+    @classmethod
+    def write_chunk(
+        cls, upload_session: UploadSession, offset: int, length: int, stream: BinaryIO
+    ) -> int:
+        """Stream a chunk from ``stream`` into the partial file at ``offset``.
+
+        Whatever was written is recorded even if the stream ends early, so a
+        dropped connection only loses the unwritten rest of the chunk.
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            InvalidUploadChunk: If the chunk does not fit inside the upload.
+        """
+        if offset < 0 or length < 0 or offset + length > upload_session.total_size:
+            raise InvalidUploadChunk(
+                f"Chunk {offset}+{length} is outside of the "
+                f"{upload_session.total_size} bytes upload"
+            )
+
+        written = 0
+        fd = os.open(cls.get_partial_file_path(upload_session), os.O_WRONLY)
+        try:
+            while written < length:
+                block = stream.read(min(cls.block_size, length - written))
+                if not block:
+                    break
+                view = memoryview(block)
+                while view:
+                    count = os.pwrite(fd, view, offset + written)
+                    written += count
+                    view = view[count:]
+        finally:
+            os.close(fd)
+            if written:
+                UploadSessionRepo.record_chunk(upload_session.id, offset, written)
+        return written
+
+    @classmethod
+    def get_progress(cls, upload_session: UploadSession) -> UploadProgress:
+        """Merge the received chunks into the received and missing ranges."""
+        received_bytes = 0
+        missing_ranges = []
+        covered_until = 0
+        for start, length in UploadSessionRepo.get_chunk_ranges(upload_session.id):
+            end = start + length
+            if start > covered_until:
+                missing_ranges.append((covered_until, start))
+            if end > covered_until:
+                received_bytes += end - max(start, covered_until)
+                covered_until = end
+        if covered_until < upload_session.total_size:
+            missing_ranges.append((covered_until, upload_session.total_size))
+
+        offset = missing_ranges[0][0] if missing_ranges else upload_session.total_size
+        return UploadProgress(offset, received_bytes, missing_ranges)
+
+    @classmethod
+    def complete(cls, upload_session: UploadSession) -> Image:
+        """Create the image of a fully received upload and move its file in place.
+
+        The file becomes the image's blob, or is dropped if the same content is
+        already stored. The session is claimed first, so concurrent calls
+        create the image once.
+
+        Raises:
+            UploadSessionNotFound: If the session is being completed by
+                another call, or was completed or aborted.
+            UploadIncomplete: If parts of the upload have not been received.
+        """
+        if not UploadSessionRepo.claim(upload_session.id):
+            raise UploadSessionNotFound(
+                f"Upload session {upload_session.id} is no longer open"
+            )
+        try:
+            image = cls._create_image(upload_session)
+        except Exception:
+            UploadSessionRepo.unclaim(upload_session.id)
+            raise
+        UploadSessionRepo.delete(upload_session.id)
+        return image
+
+    @classmethod
+    def _create_image(cls, upload_session: UploadSession) -> Image:
+        progress = cls.get_progress(upload_session)
+        if progress.missing_ranges:
+            raise UploadIncomplete(
+                f"Upload is missing {upload_session.total_size - progress.received_bytes}"
+                " bytes"
+            )
+
+        image = ImageRepo.create(
+            user_id=upload_session.user_id,
+            filename=upload_session.filename,
+            is_public=upload_session.is_public,
+        )
+        try:
+            blob = BlobStore.put_file(cls.get_partial_file_path(upload_session))
+            ImageService.attach_blob(image.user_id, image.filename, blob)
+        except OSError:
+            ImageRepo.delete(image.id)
+            raise
+        return image
+
+    @classmethod
+    def abort(cls, upload_session: UploadSession) -> None:
+        cls._remove_partial_file(upload_session)
+        UploadSessionRepo.delete(upload_session.id)
+
+    @classmethod
+    def purge_expired(cls, user_id: UUID) -> int:
+        """Abort the user's expired upload sessions.
+
+        Returns:
+            int: The number of sessions removed.
+        """
+        expired_sessions = UploadSessionRepo.get_expired(user_id)
+        for upload_session in expired_sessions:
+            cls.abort(upload_session)
+        return len(expired_sessions)
+
+    @classmethod
+    def _remove_partial_file(cls, upload_session: UploadSession) -> None:
+        try:
+            os.remove(cls.get_partial_file_path(upload_session))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,130 @@
+"""Throughput of the annotation workers leasing jobs from the database.
+
+For every batch size and worker count, a temporary user gets ``--jobs``
+images of the same JPEG with an annotation job each, and
+AnnotationWorkerService is started with that many worker threads until all
+jobs are done. Images are decoded on the annotation pool like in
+production; the annotator then sleeps ``--batch-ms`` per batch plus
+``--item-ms`` per image, standing in for a model that is faster per image
+on larger batches. Run several copies at once to see the workers of
+several instances share the same jobs.
+
+Needs the database of the app config.
+
+Usage:
+    python -m benchmarks.annotation_job_throughput [--workers 1,4,16]
+        [--batch-sizes 1,16] [--jobs 2000] [--batch-ms 20] [--item-ms 1]
+"""
+
+import argparse
+import time
+import uuid
+from typing import Any, List, Sequence
+from uuid import UUID
+
+from sqlalchemy import delete, insert
+
+from annotations_app import create_app
+from app.models.image import Image
+from app.repos.annotation_job import AnnotationJobRepo
+from app.repos.user import UserRepo
+from app.services.annotation_service import AnnotationService
+from app.services.annotation_worker_service import AnnotationWorkerService
+from app.services.annotator import BatchAnnotator
+from app.services.blob_store import BlobStore
+from app.services.core_services import db
+
+IMAGE_PATH = "tests/data/mini_car.jpg"
+SEED_BATCH_SIZE = 10_000
+
+
+class SleepingAnnotator(BatchAnnotator):
+    def __init__(self, batch_ms: float, item_ms: float):
+        self.batch_ms = batch_ms
+        self.item_ms = item_ms
+
+    def annotate(self, images: Sequence[Any], vocabulary: List[str]) -> List[List[str]]:
+        time.sleep((self.batch_ms + self.item_ms * len(images)) / 1000)
+        return [vocabulary[:1] for _ in images]
+
+
+def seed(user_id: UUID, blob_sha256: str, count: int) -> None:
+    image_ids = [uuid.uuid4() for _ in range(count)]
+    for start in range(0, count, SEED_BATCH_SIZE):
+        db.session.execute(
+            insert(Image),
+            [
+                {
+                    "id": image_id,
+                    "user_id": user_id,
+                    "_filename": f"{image_id}.jpg",
+                    "blob_sha256": blob_sha256,
+                }
+                for image_id in image_ids[start : start + SEED_BATCH_SIZE]
+            ],
+        )
+    db.session.commit()
+    for start in range(0, count, SEED_BATCH_SIZE):
+        AnnotationJobRepo.enqueue(image_ids[start : start + SEED_BATCH_SIZE])
+
+
+def measure(app, blob_sha256: str, workers: int, jobs: int) -> float:
+    """Annotate ``jobs`` images with ``workers`` threads.
+
+    Returns:
+        float: The images annotated per second.
+    """
+    user_id = UserRepo.create(
+        username=f"bench_{uuid.uuid4().hex[:8]}",
+        email=f"bench_{uuid.uuid4().hex[:8]}@example.com",
+        password="password",
+    ).id
+    try:
+        seed(user_id, blob_sha256, jobs)
+        app.config["ANNOTATION_WORKER_POOL_SIZE"] = workers
+        start = time.perf_counter()
+        AnnotationWorkerService.start(app)
+        while AnnotationJobRepo.count():
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        AnnotationWorkerService.shutdown()
+        return jobs / elapsed
+    finally:
+        AnnotationWorkerService.shutdown()
+        db.session.rollback()
+        db.session.execute(delete(Image).where(Image.user_id == user_id))
+        db.session.commit()
+        UserRepo.delete(user_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,4,16")
+    parser.add_argument("--batch-sizes", default="1,16")
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--batch-ms", type=float, default=20)
+    parser.add_argument("--item-ms", type=float, default=1)
+    args = parser.parse_args()
+
+    app = create_app()
+    AnnotationWorkerService.poll_seconds = 0.05
+    AnnotationService.annotator = SleepingAnnotator(args.batch_ms, args.item_ms)
+    with app.app_context():
+        with open(IMAGE_PATH, "rb") as image_file:
+            blob = BlobStore.put_stream(image_file)
+        try:
+            for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+                AnnotationWorkerService.batch_size = batch_size
+                for workers in [int(workers) for workers in args.workers.split(",")]:
+                    throughput = measure(app, blob.sha256, workers, args.jobs)
+                    print(
+                        f"batch size {batch_size:>3}   {workers:>3} workers   "
+                        f"{throughput:9.1f} images/s"
+                    )
+        finally:
+            BlobStore.release(blob.sha256)
+        AnnotationService.shutdown()
+
+
+if __name__ == "__main__":
+    main()
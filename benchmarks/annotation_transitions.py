@@ -0,0 +1,106 @@
+"""Cost of annotating many images: Queued to Processing to Success.
+
+"per-image" moves every image on its own, loading it, committing every
+status change and loading the annotations for every image, like the GET
+handler that advanced annotation statuses used to. "bulk" uses one
+``UPDATE ... RETURNING`` per transition, loads the annotations once and
+inserts all annotation rows with one statement, like AnnotationService.
+
+Needs the database of the app config; a temporary user is created, given
+images and deleted again for every size.
+
+Usage:
+    python -m benchmarks.annotation_transitions [--sizes 100,1000]
+"""
+
+import argparse
+import time
+import uuid
+from typing import Callable, List
+from uuid import UUID
+
+from sqlalchemy import delete, event, insert
+
+from annotations_app import create_app
+from app.enums import AnnotationStatus
+from app.models.image import Image
+from app.repos.annotation import AnnotationRepo
+from app.repos.image import ImageRepo
+from app.repos.user import UserRepo
+from app.services.core_services import db
+
+
+def per_image(image_ids: List[UUID]) -> None:
+    for image_id in image_ids:
+        ImageRepo.get(image_id)
+        ImageRepo.update(image_id, annotation_status=AnnotationStatus.Processing)
+        annotations = AnnotationRepo.get_all()[:2]
+        ImageRepo.update(
+            image_id,
+            annotations=annotations,
+            annotation_status=AnnotationStatus.Success,
+        )
+
+
+def bulk(image_ids: List[UUID]) -> None:
+    started = ImageRepo.transition_annotation_status(
+        image_ids, AnnotationStatus.Processing, AnnotationStatus.Queued
+    )
+    annotation_ids = list(AnnotationRepo.get_ids_by_name().values())[:2]
+    ImageRepo.complete_annotation({image_id: annotation_ids for image_id in started})
+
+
+def measure(transition: Callable[[List[UUID]], None], size: int) -> None:
+    user_id = UserRepo.create(
+        username=f"bench_{uuid.uuid4().hex[:8]}",
+        email=f"bench_{uuid.uuid4().hex[:8]}@example.com",
+        password="password",
+    ).id
+    image_ids = [uuid.uuid4() for _ in range(size)]
+    statements = 0
+
+    def count(*args) -> None:
+        nonlocal statements
+        statements += 1
+
+    try:
+        db.session.execute(
+            insert(Image),
+            [
+                {"id": image_id, "user_id": user_id, "_filename": f"{image_id}.jpg"}
+                for image_id in image_ids
+            ],
+        )
+        db.session.commit()
+        db.session.expunge_all()
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        start = time.perf_counter()
+        transition(image_ids)
+        elapsed = time.perf_counter() - start
+        event.remove(db.engine, "before_cursor_execute", count)
+        print(
+            f"{transition.__name__:<10} {size:>6} images   {elapsed * 1000:10.1f} ms"
+            f"   {statements:>6} statements"
+        )
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(Image).where(Image.user_id == user_id))
+        db.session.commit()
+        UserRepo.delete(user_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for size in [int(size) for size in args.sizes.split(",")]:
+            measure(per_image, size)
+            measure(bulk, size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Latency of creating an image with a taken filename, by library size.
+
+"scan" allocates the filename like the ``Image.filename`` setter used to: it
+loads every image of the user and probes suffixes in a Python list. "indexed"
+is ``ImageRepo.create``, which looks up only the requested filename and
+takes the next suffix from the user's ImageFilenameCounter.
+
+Needs the database of the app config; a temporary user is created, filled
+with images and deleted again for every library size.
+
+Usage:
+    python -m benchmarks.image_filename_allocation [--sizes 10,1000,100000]
+        [--uploads 20]
+"""
+
+import argparse
+import os
+import statistics
+import time
+import uuid
+from typing import Callable, List
+from uuid import UUID
+
+from sqlalchemy import delete, insert
+
+from annotations_app import create_app
+from app.models.image import Image
+from app.models.image_filename_counter import ImageFilenameCounter
+from app.repos.image import ImageRepo
+from app.repos.user import UserRepo
+from app.services.core_services import db
+
+FILENAME = "photo.jpg"
+SEED_BATCH_SIZE = 10_000
+
+
+def scan_create(user_id: UUID, filename: str) -> Image:
+    existing_filenames = [
+        image._filename for image in Image.query.filter_by(user_id=user_id).all()
+    ]
+    new_filename = filename
+    name, extension = os.path.splitext(filename)
+    counter = 0
+    while new_filename in existing_filenames:
+        counter += 1
+        new_filename = f"{name}_{counter}{extension}"
+    image = Image(user_id=user_id)
+    image._filename = new_filename
+    db.session.add(image)
+    db.session.commit()
+    return image
+
+
+def indexed_create(user_id: UUID, filename: str) -> Image:
+    return ImageRepo.create(user_id=user_id, filename=filename)
+
+
+def seed(user_id: UUID, size: int) -> None:
+    """Give the user ``size`` images, one of them named FILENAME."""
+    filenames = [FILENAME] + [f"image_{index}.jpg" for index in range(size - 1)]
+    for start in range(0, size, SEED_BATCH_SIZE):
+        db.session.execute(
+            insert(Image),
+            [
+                {"id": uuid.uuid4(), "user_id": user_id, "_filename": filename}
+                for filename in filenames[start : start + SEED_BATCH_SIZE]
+            ],
+        )
+    db.session.commit()
+
+
+def measure(
+    create: Callable[[UUID, str], Image], size: int, uploads: int
+) -> List[float]:
+    user_id = UserRepo.create(
+        username=f"bench_{uuid.uuid4().hex[:8]}",
+        email=f"bench_{uuid.uuid4().hex[:8]}@example.com",
+        password="password",
+    ).id
+    try:
+        seed(user_id, size)
+        timings = []
+        for _ in range(uploads):
+            start = time.perf_counter()
+            create(user_id, FILENAME)
+            timings.append((time.perf_counter() - start) * 1000)
+            db.session.expunge_all()
+        return timings
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(Image).where(Image.user_id == user_id))
+        db.session.execute(
+            delete(ImageFilenameCounter).where(ImageFilenameCounter.user_id == user_id)
+        )
+        db.session.commit()
+        UserRepo.delete(user_id)
+
+
+def report(name: str, size: int, timings: List[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print(
+        f"{name:<8} {size:>8} images   mean {statistics.mean(timings):9.3f} ms   "
+        f"p50 {statistics.median(timings):9.3f} ms   p95 {p95:9.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000")
+    parser.add_argument("--uploads", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for size in [int(size) for size in args.sizes.split(",")]:
+            report("scan", size, measure(scan_create, size, args.uploads))
+            report("indexed", size, measure(indexed_create, size, args.uploads))
+
+
+if __name__ == "__main__":
+    main()
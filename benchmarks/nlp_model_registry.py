@@ -0,0 +1,79 @@
+"""Per-call latency of the comment summary NLP steps, cold vs warm models.
+
+"cold" rebuilds the VADER analyzer, the sumy tokenizer and the LSA summarizer
+on every call, as ImageSummaryService used to. "warm" reuses the instances
+held by NlpModelRegistry.
+
+Usage:
+    python -m benchmarks.nlp_model_registry [--calls 200]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from sumy.nlp.tokenizers import Tokenizer
+from sumy.parsers.plaintext import PlaintextParser
+from sumy.summarizers.lsa import LsaSummarizer
+
+from app.services.nlp_model_registry import NlpModelRegistry
+
+COMMENT_TEXT = (
+    "What a great shot of the old harbour. The colours at sunset are amazing. "
+    "I would crop a little bit of the sky though. Lovely composition overall!"
+)
+
+
+def cold_sentiment() -> None:
+    SentimentIntensityAnalyzer().polarity_scores(COMMENT_TEXT)
+
+
+def warm_sentiment() -> None:
+    NlpModelRegistry.get_sentiment_analyzer().polarity_scores(COMMENT_TEXT)
+
+
+def cold_summary() -> None:
+    parser = PlaintextParser.from_string(COMMENT_TEXT, Tokenizer("english"))
+    LsaSummarizer()(parser.document, sentences_count=2)
+
+
+def warm_summary() -> None:
+    parser = PlaintextParser.from_string(COMMENT_TEXT, NlpModelRegistry.get_tokenizer())
+    NlpModelRegistry.get_summarizer()(parser.document, sentences_count=2)
+
+
+def measure(fn: Callable[[], None], calls: int) -> List[float]:
+    fn()  # Exclude one-off import and file system cache effects
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: List[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{name:<16} mean {statistics.mean(timings):8.3f} ms   "
+        f"p50 {statistics.median(timings):8.3f} ms   p95 {p95:8.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    NlpModelRegistry.preload()
+    report("sentiment cold", measure(cold_sentiment, args.calls))
+    report("sentiment warm", measure(warm_sentiment, args.calls))
+    report("summary cold", measure(cold_summary, args.calls))
+    report("summary warm", measure(warm_summary, args.calls))
+
+
+if __name__ == "__main__":
+    main()
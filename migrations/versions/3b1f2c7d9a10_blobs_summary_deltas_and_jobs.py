@@ -0,0 +1,240 @@
+"""Blob storage, image summary deltas, uploads and annotation jobs
+
+Brings a database created by ``db.create_all()`` before these features to
+the current models. The app creates missing tables itself on start, also
+when running ``flask db upgrade``, so every step checks what exists first;
+the changes to existing tables are what this revision is needed for.
+
+The commenter counts and summary aggregates are backfilled from the
+comments, so the O(1) comment deltas start from correct values.
+
+Revision ID: 3b1f2c7d9a10
+Revises:
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f2c7d9a10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(table):
+    return _inspector().has_table(table)
+
+
+def _has_column(table, column):
+    return column in {c['name'] for c in _inspector().get_columns(table)}
+
+
+def _has_index(table, index):
+    return index in {i['name'] for i in _inspector().get_indexes(table)}
+
+
+def _foreign_key(table, column):
+    for foreign_key in _inspector().get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column]:
+            return foreign_key
+    return None
+
+
+def _has_unique_constraint(table, columns):
+    return any(
+        constraint['column_names'] == columns
+        for constraint in _inspector().get_unique_constraints(table)
+    )
+
+
+def _create_tables():
+    if not _has_table('imageblob'):
+        op.create_table('imageblob',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('pack_segment', sa.Integer(), nullable=True),
+        sa.Column('pack_offset', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+        )
+        op.create_index(op.f('ix_imageblob_pack_segment'), 'imageblob', ['pack_segment'], unique=False)
+    if not _has_table('imagefilenamecounter'):
+        op.create_table('imagefilenamecounter',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('filename', sa.String(length=128), nullable=False),
+        sa.Column('last_suffix', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'filename')
+        )
+    if not _has_table('uploadsession'):
+        op.create_table('uploadsession',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('filename', sa.String(length=128), nullable=False),
+        sa.Column('is_public', sa.Boolean(), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('completing', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_table('uploadchunk'):
+        op.create_table('uploadchunk',
+        sa.Column('session_id', sa.UUID(), nullable=False),
+        sa.Column('offset', sa.BigInteger(), nullable=False),
+        sa.Column('length', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['uploadsession.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('session_id', 'offset')
+        )
+    if not _has_table('annotationjob'):
+        op.create_table('annotationjob',
+        sa.Column('image_id', sa.UUID(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.String(length=128), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['image_id'], ['image.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('image_id')
+        )
+        op.create_index(op.f('ix_annotationjob_lease_expires_at'), 'annotationjob', ['lease_expires_at'], unique=False)
+    if not _has_table('imagecommenter'):
+        op.create_table('imagecommenter',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('image_id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('comment_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['image_id'], ['image.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('image_id', 'user_id', name='unique_image_commenter')
+        )
+
+
+def _alter_tables():
+    if not _has_column('comment', 'sentiment_score'):
+        op.add_column('comment', sa.Column('sentiment_score', sa.Float(), nullable=True))
+
+    if not _has_column('image', 'blob_sha256'):
+        op.add_column('image', sa.Column('blob_sha256', sa.String(length=64), nullable=True))
+    if _foreign_key('image', 'blob_sha256') is None:
+        op.create_foreign_key('image_blob_sha256_fkey', 'image', 'imageblob', ['blob_sha256'], ['sha256'])
+    if not _has_index('image', 'ix_image__annotation_status'):
+        op.create_index(op.f('ix_image__annotation_status'), 'image', ['_annotation_status'], unique=False)
+
+    association_fkey = _foreign_key('image_annotation_association', 'image_id')
+    if association_fkey is not None and association_fkey['options'].get('ondelete') != 'CASCADE':
+        op.drop_constraint(association_fkey['name'], 'image_annotation_association', type_='foreignkey')
+        op.create_foreign_key('image_annotation_association_image_id_fkey', 'image_annotation_association', 'image', ['image_id'], ['id'], ondelete='CASCADE')
+
+    if not _has_column('uploadsession', 'completing'):
+        op.add_column('uploadsession', sa.Column('completing', sa.Boolean(), nullable=False, server_default=sa.false()))
+        op.alter_column('uploadsession', 'completing', server_default=None)
+
+    if not _has_column('imagesummary', 'summary_strategy'):
+        op.add_column('imagesummary', sa.Column('summary_strategy', sa.String(length=32), nullable=True))
+    if not _has_column('imagesummary', 'summary_fingerprint'):
+        op.add_column('imagesummary', sa.Column('summary_fingerprint', sa.String(length=64), nullable=True))
+    if not _has_column('imagesummary', 'total_comment_length'):
+        op.add_column('imagesummary', sa.Column('total_comment_length', sa.Integer(), nullable=True))
+    for column in ('comment_revision', 'summary_revision'):
+        if not _has_column('imagesummary', column):
+            op.add_column('imagesummary', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+            op.alter_column('imagesummary', column, server_default=None)
+    if not _has_unique_constraint('imagesummary', ['image_id']):
+        # Keep the latest summary of every image
+        op.execute(
+            "DELETE FROM imagesummary WHERE id IN ("
+            " SELECT id FROM ("
+            "  SELECT id, row_number() OVER ("
+            "   PARTITION BY image_id ORDER BY updated_at DESC NULLS LAST, id"
+            "  ) AS position FROM imagesummary"
+            " ) AS ranked WHERE position > 1"
+            ")"
+        )
+        op.create_unique_constraint('imagesummary_image_id_key', 'imagesummary', ['image_id'])
+
+
+def _backfill():
+    # Recounted from the comments, as ImageCommenterRepo.rebuild_for_images does
+    op.execute(
+        "INSERT INTO imagecommenter"
+        " (id, image_id, user_id, comment_count, created_at, updated_at)"
+        " SELECT gen_random_uuid(), image_id, user_id, count(*), now(), now()"
+        " FROM comment GROUP BY image_id, user_id"
+        " ON CONFLICT ON CONSTRAINT unique_image_commenter"
+        " DO UPDATE SET comment_count = EXCLUDED.comment_count"
+    )
+    op.execute(
+        "UPDATE imagesummary SET"
+        " comment_count = counts.comment_count,"
+        " total_comment_length = counts.total_comment_length,"
+        " average_comment_length = CASE WHEN counts.comment_count > 0"
+        "  THEN round(counts.total_comment_length::numeric / counts.comment_count)"
+        "  ELSE 0 END,"
+        " users_commented_count = counts.users_commented_count"
+        " FROM ("
+        "  SELECT imagesummary.image_id,"
+        "   count(comment.id) AS comment_count,"
+        "   coalesce(sum(length(comment.body)), 0) AS total_comment_length,"
+        "   count(DISTINCT comment.user_id) AS users_commented_count"
+        "  FROM imagesummary LEFT JOIN comment"
+        "   ON comment.image_id = imagesummary.image_id"
+        "  GROUP BY imagesummary.image_id"
+        " ) AS counts"
+        " WHERE imagesummary.image_id = counts.image_id"
+    )
+    op.execute("UPDATE imagesummary SET summary_strategy = '' WHERE summary_strategy IS NULL")
+
+
+def upgrade():
+    _create_tables()
+    _alter_tables()
+    _backfill()
+
+
+def downgrade():
+    op.drop_constraint('imagesummary_image_id_key', 'imagesummary', type_='unique')
+    op.drop_column('imagesummary', 'summary_revision')
+    op.drop_column('imagesummary', 'comment_revision')
+    op.drop_column('imagesummary', 'total_comment_length')
+    op.drop_column('imagesummary', 'summary_fingerprint')
+    op.drop_column('imagesummary', 'summary_strategy')
+    op.drop_constraint('image_annotation_association_image_id_fkey', 'image_annotation_association', type_='foreignkey')
+    op.create_foreign_key('image_annotation_association_image_id_fkey', 'image_annotation_association', 'image', ['image_id'], ['id'])
+    op.drop_index(op.f('ix_image__annotation_status'), table_name='image')
+    op.drop_constraint('image_blob_sha256_fkey', 'image', type_='foreignkey')
+    op.drop_column('image', 'blob_sha256')
+    op.drop_column('comment', 'sentiment_score')
+    op.drop_table('imagecommenter')
+    op.drop_index(op.f('ix_annotationjob_lease_expires_at'), table_name='annotationjob')
+    op.drop_table('annotationjob')
+    op.drop_table('uploadchunk')
+    op.drop_table('uploadsession')
+    op.drop_table('imagefilenamecounter')
+    op.drop_index(op.f('ix_imageblob_pack_segment'), table_name='imageblob')
+    op.drop_table('imageblob')
@@ -19,6 +19,8 @@ from app.services.core_services import db
 def app(request):
     """Create and configure a new Flask application for testing."""
     app = create_app()
+    # Tests start the annotation workers themselves when they need them
+    app.config["ANNOTATION_WORKER_ENABLED"] = False
 
     # Clear the database before each test
     with app.app_context():
@@ -1,12 +1,27 @@
+import hashlib
+import io
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest.mock import patch
+
 import pytest
 from flask import json
+from PIL import Image as PilImage
+from werkzeug.datastructures import FileStorage
 from werkzeug.test import Client as FlaskClient
 
 from app.models.image_summary import ImageSummary
 from app.models.user import User
 from app.repos.image import ImageRepo
+from app.repos.image_blob import ImageBlobRepo
 from app.repos.image_summary import ImageSummaryRepo
 from app.repos.user import UserRepo
+from app.services.annotation_worker_service import AnnotationWorkerService
+from app.services.blob_store import BlobStore
+from app.services.derivative_service import DerivativeService
+from app.services.image_service import ImageService
+from app.services.storage_layout import StorageLayout
+from app.services.tile_service import TileService
 from app.utils.auth import AuthUtils
 
 
@@ -73,6 +88,257 @@ class TestImageEndpoints:
         assert response.status_code == 200
         assert json.loads(response.data)["comment_count"] == 5
         assert json.loads(response.data)["sentiment_score"] == 80
+        assert json.loads(response.data)["is_stale"] is False
+        assert json.loads(response.data)["cache_age_seconds"] >= 0
+
+    def test_get_image_content(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            image_bytes = image_file.read()
+        image = ImageRepo.create(user_id=test_user.id, filename="content.jpg")
+        ImageService.save_image(
+            FileStorage(stream=io.BytesIO(image_bytes)), test_user, image.filename
+        )
+        sha256 = ImageRepo.get(image.id).blob_sha256
+
+        response = client.get(f"/image/{image.id}/content", headers=headers)
+        assert response.status_code == 200
+        assert response.data == image_bytes
+        assert response.mimetype == "image/jpeg"
+        assert response.headers["ETag"] == f'"{sha256}"'
+        assert "private" in response.headers["Cache-Control"]
+
+        response = client.get(
+            f"/image/{image.id}/content",
+            headers={**headers, "If-None-Match": f'"{sha256}"'},
+        )
+        assert response.status_code == 304
+
+        response = client.get(
+            f"/image/{image.id}/content", headers={**headers, "Range": "bytes=0-9"}
+        )
+        assert response.status_code == 206
+        assert response.data == image_bytes[:10]
+        assert response.headers["Content-Range"] == f"bytes 0-9/{len(image_bytes)}"
+
+        other_user = UserRepo.create(
+            username="test_user_content",
+            email="test_user_content@example.com",
+            password="password",
+        )
+        other_token = AuthUtils.authenticate(
+            username=other_user.username, password="password"
+        )
+        response = client.get(
+            f"/image/{image.id}/content",
+            headers={"Authorization": f"Bearer {other_token}"},
+        )
+        assert response.status_code == 404
+
+        UserRepo.delete(other_user.id)
+        ImageService.delete_image(image.id)
+
+    def test_get_packed_image(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(BlobStore, "pack_max_bytes", 1024 * 1024)
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        image = ImageRepo.create(user_id=test_user.id, filename="packed.jpg")
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            image_bytes = image_file.read()
+            image_file.seek(0)
+            file_path = ImageService.save_image(
+                FileStorage(stream=image_file), test_user, image.filename
+            )
+        assert not os.path.exists(file_path)
+
+        response = client.get(f"/image/{image.id}/content", headers=headers)
+        assert response.status_code == 200
+        assert response.data == image_bytes
+
+        response = client.get(
+            f"/image/{image.id}/content", headers={**headers, "Range": "bytes=0-9"}
+        )
+        assert response.status_code == 206
+        assert response.data == image_bytes[:10]
+
+        response = client.get(f"/image/{image.id}/thumbnail?size=128", headers=headers)
+        assert response.status_code == 200
+
+        signed_url = client.get(f"/image/{image.id}/signed-url", headers=headers).json[
+            "url"
+        ]
+        response = client.get(signed_url)
+        assert response.status_code == 200
+        assert response.data == image_bytes
+
+        ImageService.delete_image(image.id)
+
+    def test_get_image_thumbnail(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        image = ImageRepo.create(user_id=test_user.id, filename="thumbnail.jpg")
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            ImageService.save_image(
+                FileStorage(stream=image_file), test_user, image.filename
+            )
+
+        response = client.get(
+            f"/image/{image.id}/thumbnail?size=128",
+            headers={**headers, "Accept": "image/webp,image/*"},
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "image/webp"
+        with PilImage.open(io.BytesIO(response.data)) as thumbnail:
+            assert max(thumbnail.size) == 128
+
+        response = client.get(f"/image/{image.id}/thumbnail?size=512", headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == "image/jpeg"
+
+        response = client.get(f"/image/{image.id}/thumbnail?size=7", headers=headers)
+        assert response.status_code == 400
+
+        ImageService.delete_image(image.id)
+
+    def test_get_image_thumbnail_of_invalid_image(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        image = ImageRepo.create(user_id=test_user.id, filename="invalid.jpg")
+        ImageService.save_image(
+            FileStorage(stream=io.BytesIO(b"not an image")), test_user, image.filename
+        )
+
+        response = client.get(f"/image/{image.id}/thumbnail?size=128", headers=headers)
+        assert response.status_code == 422
+        assert response.json == {"message": "The image file cannot be decoded"}
+
+        with patch.object(
+            DerivativeService, "get_derivative", side_effect=FutureTimeoutError
+        ):
+            response = client.get(
+                f"/image/{image.id}/thumbnail?size=128", headers=headers
+            )
+        assert response.status_code == 503
+        assert response.json == {"message": "Rendering the thumbnail timed out"}
+
+        ImageService.delete_image(image.id)
+
+    def test_get_image_tiles_of_invalid_image(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        image = ImageRepo.create(user_id=test_user.id, filename="invalid_tiles.jpg")
+        ImageService.save_image(
+            FileStorage(stream=io.BytesIO(b"not an image")), test_user, image.filename
+        )
+
+        for url in (f"/image/{image.id}/tiles.dzi", f"/image/{image.id}/tiles/0/0/0"):
+            response = client.get(url, headers=headers)
+            assert response.status_code == 422
+            assert response.json == {"message": "The image file cannot be decoded"}
+
+        ImageService.delete_image(image.id)
+
+    def test_get_image_tiles(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        image = ImageRepo.create(user_id=test_user.id, filename="tiles.jpg")
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            ImageService.save_image(
+                FileStorage(stream=image_file), test_user, image.filename
+            )
+
+        response = client.get(f"/image/{image.id}/tiles.dzi", headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == "application/xml"
+        assert b"deepzoom" in response.data
+
+        pyramid = TileService.get_pyramid(
+            image, ImageService.get_image_file_path(test_user.id, image.filename)
+        )
+        tile_url = f"/image/{image.id}/tiles/{pyramid.max_level}/0/0"
+        response = client.get(tile_url, headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == "image/jpeg"
+        assert response.cache_control.max_age == 365 * 24 * 60 * 60
+        assert response.cache_control.private
+        with PilImage.open(io.BytesIO(response.data)) as tile:
+            assert tile.size == (257, 257)
+
+        response = client.get(
+            tile_url, headers={**headers, "If-None-Match": response.headers["ETag"]}
+        )
+        assert response.status_code == 304
+
+        response = client.get(
+            f"/image/{image.id}/tiles/{pyramid.max_level}/99/0", headers=headers
+        )
+        assert response.status_code == 404
+
+        ImageService.delete_image(image.id)
+
+    def test_signed_urls(self, app, authenticated_client, test_user: User) -> None:
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        image = ImageRepo.create(user_id=test_user.id, filename="signed.jpg")
+        admin = UserRepo.get_by_username(app.config["ADMIN_USERNAME"])
+        private_image = ImageRepo.create(user_id=admin.id, filename="private.jpg")
+
+        response = client.post(
+            "/image/signed-urls",
+            json={"image_ids": [str(image.id), str(private_image.id)]},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert list(response.json) == [str(image.id)]
+        signed_url = response.json[str(image.id)]["url"]
+        assert signed_url.startswith(f"/media/{test_user.id}/signed.jpg?")
+
+        response = client.get(signed_url)
+        assert response.status_code == 200
+        assert response.data == b""
+        relative_path = StorageLayout.get_relative_path(test_user.id, "signed.jpg")
+        assert response.headers["X-Accel-Redirect"] == (
+            f"/protected-media/{relative_path}"
+        )
+
+        response = client.get(signed_url.replace("signed.jpg", "other.jpg"))
+        assert response.status_code == 403
+
+        # The image is deleted and another one uploaded under its name
+        ImageRepo.delete(image.id)
+        image = ImageRepo.create(user_id=test_user.id, filename="signed.jpg")
+        response = client.get(signed_url)
+        assert response.status_code == 403
+
+        response = client.get(f"/image/{private_image.id}/signed-url", headers=headers)
+        assert response.status_code == 404
+
+        response = client.get("/image/images?signed_urls=true", headers=headers)
+        content_urls = {item["id"]: item["content_url"] for item in response.json}
+        assert content_urls[str(image.id)].startswith(f"/media/{test_user.id}/")
+        assert str(private_image.id) not in content_urls
+
+        ImageRepo.delete(image.id)
+        ImageRepo.delete(private_image.id)
 
     @pytest.mark.usefixtures("authenticated_client")
     def test_create_image(self, authenticated_client, test_user: User) -> None:
@@ -95,6 +361,31 @@ class TestImageEndpoints:
 
         ImageRepo.delete(json.loads(response.data)["id"])
 
+    def test_upload_image_failing_to_save(
+        self, app, authenticated_client, test_user: User, tmp_path, monkeypatch
+    ) -> None:
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        client, token = authenticated_client
+        image_bytes = os.urandom(1024)
+
+        with patch.object(
+            AnnotationWorkerService, "enqueue", side_effect=OSError("disk full")
+        ):
+            response = client.post(
+                "/image/upload",
+                data={
+                    "file": (io.BytesIO(image_bytes), "failing.jpg"),
+                    "user_id": str(test_user.id),
+                    "filename": "failing.jpg",
+                    "is_public": "true",
+                },
+                content_type="multipart/form-data",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        assert response.status_code == 500
+        assert ImageRepo.get_by_filename(test_user.id, "failing.jpg") is None
+        assert ImageBlobRepo.get(hashlib.sha256(image_bytes).hexdigest()) is None
+
     @pytest.mark.usefixtures("authenticated_client")
     def test_delete_image(self, authenticated_client, test_user: User) -> None:
         client, token = authenticated_client
@@ -0,0 +1,224 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from app.models.user import User
+from app.repos.image import ImageRepo
+from app.repos.user import UserRepo
+from app.services.image_service import ImageService
+from app.services.upload_service import UploadService
+from app.utils.auth import AuthUtils
+
+
+class TestUploadEndpoints:
+    @pytest.fixture(scope="class")
+    def test_user(self) -> User:
+        user: User = UserRepo.create(
+            username="test_user_upload",
+            email="test_user_upload@example.com",
+            password="password",
+        )
+        yield user
+        UserRepo.delete(user.id)
+
+    @pytest.fixture(scope="class")
+    def authenticated_client(self, app, test_user: User):
+        with app.test_client() as client:
+            token = AuthUtils.authenticate(
+                username=test_user.username, password="password"
+            )
+            yield client, token
+
+    @pytest.fixture
+    def upload_folder(self, app, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        return tmp_path
+
+    @pytest.fixture
+    def image_bytes(self) -> bytes:
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            return image_file.read()
+
+    def put_chunk(self, client, token, session_id, image_bytes, start, end):
+        return client.put(
+            f"/image/uploads/{session_id}",
+            data=image_bytes[start:end],
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Range": f"bytes {start}-{end - 1}/{len(image_bytes)}",
+            },
+        )
+
+    def test_chunked_upload(
+        self, authenticated_client, test_user, upload_folder, image_bytes
+    ) -> None:
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        total_size = len(image_bytes)
+
+        response = client.post(
+            "/image/uploads",
+            json={"filename": "chunked.jpg", "total_size": total_size},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        session_id = response.json["id"]
+        assert response.json["offset"] == 0
+
+        middle = total_size // 2
+        response = self.put_chunk(
+            client, token, session_id, image_bytes, middle, total_size
+        )
+        assert response.status_code == 200
+        assert response.json["offset"] == 0
+        assert response.json["missing_ranges"] == [[0, middle]]
+
+        response = client.post(f"/image/uploads/{session_id}/complete", headers=headers)
+        assert response.status_code == 409
+        assert ImageRepo.get_by_user_id(test_user.id, test_user.id) == []
+
+        response = self.put_chunk(client, token, session_id, image_bytes, 0, middle)
+        assert response.status_code == 200
+        assert response.json["offset"] == total_size
+        assert response.json["received_bytes"] == total_size
+
+        response = client.post(f"/image/uploads/{session_id}/complete", headers=headers)
+        assert response.status_code == 201
+        assert response.json["filename"] == "chunked.jpg"
+        image_id = response.json["id"]
+
+        file_path = ImageService.get_image_file_path(test_user.id, "chunked.jpg")
+        with open(file_path, "rb") as uploaded_file:
+            assert uploaded_file.read() == image_bytes
+        assert os.listdir(os.path.dirname(file_path)) == ["chunked.jpg"]
+
+        response = client.get(f"/image/uploads/{session_id}", headers=headers)
+        assert response.status_code == 404
+
+        ImageRepo.delete(image_id)
+
+    def test_chunk_outside_of_upload_is_rejected(
+        self, authenticated_client, upload_folder
+    ) -> None:
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        response = client.post(
+            "/image/uploads",
+            json={"filename": "small.jpg", "total_size": 4},
+            headers=headers,
+        )
+        session_id = response.json["id"]
+
+        response = client.put(
+            f"/image/uploads/{session_id}",
+            data=b"too long",
+            headers={**headers, "Content-Range": "bytes 0-7/*"},
+        )
+        assert response.status_code == 400
+
+        response = client.put(f"/image/uploads/{session_id}", data=b"1234")
+        assert response.status_code == 401
+
+        response = client.delete(f"/image/uploads/{session_id}", headers=headers)
+        assert response.status_code == 204
+        assert os.listdir(upload_folder / ".blobs" / "tmp") == []
+
+    def test_open_uploads_are_limited(
+        self, authenticated_client, upload_folder, monkeypatch
+    ) -> None:
+        client, token = authenticated_client
+        headers = {"Authorization": f"Bearer {token}"}
+        monkeypatch.setattr(UploadService, "max_open_sessions", 1)
+        monkeypatch.setattr(UploadService, "max_reserved_bytes", 10)
+
+        response = client.post(
+            "/image/uploads",
+            json={"filename": "large.jpg", "total_size": 11},
+            headers=headers,
+        )
+        assert response.status_code == 413
+
+        response = client.post(
+            "/image/uploads",
+            json={"filename": "first.jpg", "total_size": 4},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        session_id = response.json["id"]
+
+        response = client.post(
+            "/image/uploads",
+            json={"filename": "second.jpg", "total_size": 4},
+            headers=headers,
+        )
+        assert response.status_code == 429
+
+        client.delete(f"/image/uploads/{session_id}", headers=headers)
+
+    def test_bulk_upload_files(
+        self, authenticated_client, test_user, upload_folder, image_bytes
+    ) -> None:
+        client, token = authenticated_client
+        response = client.post(
+            "/image/upload/bulk",
+            data={
+                "files": [
+                    (io.BytesIO(image_bytes), "first.jpg"),
+                    (io.BytesIO(b"second"), "second.jpg"),
+                ],
+                "is_public": "true",
+            },
+            headers={"Authorization": f"Bearer {token}"},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        assert response.json["created"] == 2
+        assert [result["filename"] for result in response.json["results"]] == [
+            "first.jpg",
+            "second.jpg",
+        ]
+
+        for result in response.json["results"]:
+            image = ImageRepo.get(result["image_id"])
+            assert image.is_public is True
+            ImageService.delete_image(image.id)
+
+    def test_bulk_upload_archive(
+        self, authenticated_client, test_user, upload_folder, image_bytes
+    ) -> None:
+        client, token = authenticated_client
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as z:
+            z.writestr("dataset/car.jpg", image_bytes)
+            z.writestr("dataset/car copy.jpg", image_bytes)
+
+        response = client.post(
+            "/image/upload/bulk",
+            data=archive.getvalue(),
+            headers={"Authorization": f"Bearer {token}"},
+            content_type="application/zip",
+        )
+        assert response.status_code == 201
+        assert response.json["error"] is None
+        results = response.json["results"]
+        assert [result["filename"] for result in results] == [
+            "car.jpg",
+            "car_copy.jpg",
+        ]
+
+        file_path = ImageService.get_image_file_path(test_user.id, "car_copy.jpg")
+        with open(file_path, "rb") as uploaded_file:
+            assert uploaded_file.read() == image_bytes
+        for result in results:
+            ImageService.delete_image(result["image_id"])
+
+        response = client.post(
+            "/image/upload/bulk",
+            data=b"not an archive",
+            headers={"Authorization": f"Bearer {token}"},
+            content_type="application/zip",
+        )
+        assert response.status_code == 400
+        assert response.json["error"] == "Invalid archive: Not a zip archive"
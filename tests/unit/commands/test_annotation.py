@@ -0,0 +1,56 @@
+import io
+
+from sqlalchemy import delete
+
+from app.commands.annotation import enqueue_queued, requeue
+from app.enums import AnnotationStatus
+from app.repos.annotation_job import AnnotationJobRepo
+from app.repos.image import ImageRepo
+from app.services.blob_store import BlobStore
+from app.services.core_services import db
+from app.services.image_service import ImageService
+
+
+class TestAnnotationCommands:
+    def test_requeue(self, app, new_image):
+        ImageRepo.transition_annotation_status(
+            [new_image.id], AnnotationStatus.Fail, AnnotationStatus.Queued
+        )
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(requeue, ["--batch-size", "1"])
+
+        assert result.exit_code == 0
+        assert "Requeue complete, 1 images requeued" in result.output
+        db.session.expire_all()
+        image = ImageRepo.get(new_image.id)
+        assert image.annotation_status == AnnotationStatus.Queued.value
+        assert AnnotationJobRepo.get(new_image.id) is not None
+
+    def test_enqueue_queued(self, app, new_user, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        created = ImageService.create_images(
+            new_user.id,
+            [
+                (f"queued_{index}.jpg", BlobStore.put_stream(io.BytesIO(b"image")))
+                for index in range(3)
+            ],
+        )
+        image_ids = [image_id for image_id, _ in created]
+        # Images queued before annotation jobs existed
+        db.session.execute(
+            delete(AnnotationJobRepo.model).where(
+                AnnotationJobRepo.model.image_id.in_(image_ids)
+            )
+        )
+        db.session.commit()
+        try:
+            runner = app.test_cli_runner()
+            result = runner.invoke(enqueue_queued, ["--batch-size", "2"])
+
+            assert result.exit_code == 0, result.output
+            assert "Enqueue complete" in result.output
+            assert all(AnnotationJobRepo.get(image_id) for image_id in image_ids)
+        finally:
+            for image_id in image_ids:
+                ImageService.delete_image(image_id)
@@ -0,0 +1,13 @@
+from app.commands.comment import backfill_sentiment
+from app.repos.comment import CommentRepo
+
+
+class TestCommentCommands:
+    def test_backfill_sentiment(self, app, new_comment):
+        runner = app.test_cli_runner()
+        result = runner.invoke(backfill_sentiment, ["--batch-size", "1"])
+
+        assert result.exit_code == 0
+        assert "Backfill complete" in result.output
+        assert CommentRepo.get_by_id(new_comment.id).sentiment_score is not None
+        assert CommentRepo.get_unscored(limit=1) == []
@@ -0,0 +1,52 @@
+import os
+
+from app.commands.image_summary import rebuild
+from app.repos.image_commenter import ImageCommenterRepo
+from app.repos.image_summary import ImageSummaryRepo
+
+
+class TestImageSummaryCommands:
+    def test_rebuild(self, app, comments, tmp_path):
+        checkpoint_file = str(tmp_path / "rebuild.json")
+        runner = app.test_cli_runner()
+        result = runner.invoke(
+            rebuild,
+            [
+                "--chunk-size",
+                "2",
+                "--workers",
+                "1",
+                "--checkpoint-file",
+                checkpoint_file,
+                "--restart",
+            ],
+        )
+
+        assert result.exit_code == 0, result.output
+        assert "Rebuild complete" in result.output
+        assert "images/s" in result.output
+        assert not os.path.exists(checkpoint_file)
+        for comment in comments:
+            image_summary = ImageSummaryRepo.get_by_image_id(comment.image_id)
+            assert image_summary.comment_count == 1
+            assert image_summary.average_comment_length == len(comment.body)
+            assert image_summary.users_commented_count == 1
+            assert not image_summary.is_summary_stale
+            assert ImageCommenterRepo.get(comment.image_id, comment.user_id)
+            ImageSummaryRepo.delete(image_summary.id)
+
+    def test_rebuild_resumes_from_checkpoint(self, app, comments, tmp_path):
+        image_ids = sorted(comment.image_id for comment in comments)
+        checkpoint_file = tmp_path / "rebuild.json"
+        checkpoint_file.write_text(
+            f'{{"last_image_id": "{image_ids[-1]}", "processed": 3}}'
+        )
+        runner = app.test_cli_runner()
+        result = runner.invoke(
+            rebuild,
+            ["--workers", "1", "--checkpoint-file", str(checkpoint_file)],
+        )
+
+        assert result.exit_code == 0, result.output
+        assert f"Resuming after image {image_ids[-1]}" in result.output
+        assert ImageSummaryRepo.get_by_image_id(image_ids[-1]) is None
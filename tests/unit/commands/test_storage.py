@@ -0,0 +1,25 @@
+import os
+
+from app.commands.storage import migrate_layout
+from app.services.storage_layout import StorageLayout
+
+
+class TestStorageCommands:
+    def test_migrate_layout(self, app, new_image, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        flat_path = StorageLayout.get_path(
+            new_image.user_id, new_image.filename, shard_levels=0
+        )
+        os.makedirs(os.path.dirname(flat_path))
+        with open(flat_path, "wb") as flat_file:
+            flat_file.write(b"image")
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(migrate_layout, ["--batch-size", "1"])
+
+        assert result.exit_code == 0, result.output
+        assert "Migration complete" in result.output
+        assert not os.path.exists(flat_path)
+        assert os.path.exists(
+            StorageLayout.get_path(new_image.user_id, new_image.filename)
+        )
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import delete, text
+
+from app.repos.annotation_job import AnnotationJobRepo
+from app.repos.image import ImageRepo
+from app.services.core_services import db
+
+
+class TestAnnotationJobRepo:
+    @pytest.fixture
+    def image_ids(self, app, new_user):
+        db.session.execute(delete(AnnotationJobRepo.model))
+        db.session.commit()
+        image_ids = [
+            ImageRepo.create(user_id=new_user.id, filename=f"job_{index}.jpg").id
+            for index in range(3)
+        ]
+        yield image_ids
+        for image_id in image_ids:
+            ImageRepo.delete(image_id)
+
+    def test_claim_in_batches(self, image_ids):
+        AnnotationJobRepo.enqueue(image_ids)
+        AnnotationJobRepo.enqueue(image_ids[:1])
+        assert AnnotationJobRepo.count() == 3
+
+        first = AnnotationJobRepo.claim("worker-a", limit=2, lease_seconds=60)
+        second = AnnotationJobRepo.claim("worker-b", limit=2, lease_seconds=60)
+
+        assert len(first) == 2 and len(second) == 1
+        assert {job.image_id for job in first + second} == set(image_ids)
+        assert all(job.attempts == 1 for job in first + second)
+        assert AnnotationJobRepo.claim("worker-c", limit=2, lease_seconds=60) == []
+
+    def test_claim_skips_locked_jobs(self, image_ids):
+        AnnotationJobRepo.enqueue(image_ids)
+        with db.engine.connect() as connection:
+            with connection.begin():
+                connection.execute(
+                    text(
+                        "SELECT * FROM annotationjob WHERE image_id = :image_id "
+                        "FOR UPDATE"
+                    ),
+                    {"image_id": image_ids[0]},
+                )
+                jobs = AnnotationJobRepo.claim("worker-a", limit=3, lease_seconds=60)
+
+        assert {job.image_id for job in jobs} == set(image_ids[1:])
+
+    def test_expired_lease_is_claimed_again(self, image_ids):
+        AnnotationJobRepo.enqueue(image_ids[:1])
+        AnnotationJobRepo.claim("crashed", limit=1, lease_seconds=-1)
+
+        jobs = AnnotationJobRepo.claim("worker-a", limit=1, lease_seconds=60)
+
+        assert jobs[0].image_id == image_ids[0]
+        assert jobs[0].attempts == 2
+        assert AnnotationJobRepo.complete(image_ids[:1], "crashed") == []
+        assert AnnotationJobRepo.complete(image_ids[:1], "worker-a") == image_ids[:1]
+        assert AnnotationJobRepo.count() == 0
+
+    def test_heartbeat_extends_lease(self, image_ids):
+        AnnotationJobRepo.enqueue(image_ids[:1])
+        AnnotationJobRepo.claim("worker-a", limit=1, lease_seconds=-1)
+
+        assert AnnotationJobRepo.heartbeat(["worker-a"], lease_seconds=60) == 1
+        assert AnnotationJobRepo.claim("worker-b", limit=1, lease_seconds=60) == []
+
+    def test_release(self, image_ids):
+        AnnotationJobRepo.enqueue(image_ids[:2])
+        AnnotationJobRepo.claim("worker-a", limit=2, lease_seconds=60)
+
+        AnnotationJobRepo.release(image_ids[:1], "worker-a", error="boom")
+        AnnotationJobRepo.release(image_ids[1:2], "worker-a", count_attempt=False)
+
+        jobs = AnnotationJobRepo.claim("worker-b", limit=2, lease_seconds=60)
+        assert {job.image_id: job.attempts for job in jobs} == {
+            image_ids[0]: 2,
+            image_ids[1]: 1,
+        }
+        db.session.expire_all()
+        assert AnnotationJobRepo.get(image_ids[0]).last_error == "boom"
@@ -36,3 +36,15 @@ class TestCommentRepo:
         comment_id = new_comment.id
         assert CommentRepo.delete(comment_id) is True
         assert CommentRepo.get_by_id(comment_id) is None
+
+    def test_update_sentiment_scores(self, new_comment):
+        assert new_comment.id in [
+            comment_id for comment_id, _ in CommentRepo.get_unscored(limit=1000)
+        ]
+
+        CommentRepo.update_sentiment_scores([(new_comment.id, 0.5)])
+
+        assert CommentRepo.get_by_id(new_comment.id).sentiment_score == 0.5
+        assert new_comment.id not in [
+            comment_id for comment_id, _ in CommentRepo.get_unscored(limit=1000)
+        ]
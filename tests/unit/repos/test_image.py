@@ -1,5 +1,6 @@
 import pytest
 
+from app.enums import AnnotationStatus
 from app.repos.image import ImageRepo
 from app.services.core_services import db
 
@@ -26,3 +27,66 @@ class TestImageRepo:
         ImageRepo.delete(new_image.id)
         deleted_image = ImageRepo.get_by_id(new_image.id, new_image.user_id)
         assert deleted_image is None
+
+    def test_create_many_images(self, new_image):
+        created = ImageRepo.create_many(
+            new_image.user_id,
+            [
+                ("test_image.jpg", None),
+                ("other image.jpg", None),
+                ("test_image.jpg", None),
+            ],
+        )
+        try:
+            assert [filename for _, filename in created] == [
+                "test_image_1.jpg",
+                "other_image.jpg",
+                "test_image_2.jpg",
+            ]
+            image = ImageRepo.get(created[0][0])
+            assert image.filename == "test_image_1.jpg"
+            assert image.is_public is False
+        finally:
+            for image_id, _ in created:
+                ImageRepo.delete(image_id)
+
+    def test_transition_annotation_status(self, new_image, new_annotation):
+        created = ImageRepo.create_many(
+            new_image.user_id, [("failed.jpg", None), ("other.jpg", None)]
+        )
+        image_ids = [image_id for image_id, _ in created]
+        try:
+            moved = ImageRepo.transition_annotation_status(
+                image_ids, AnnotationStatus.Fail, AnnotationStatus.Queued
+            )
+            assert set(moved) == set(image_ids)
+            assert (
+                ImageRepo.transition_annotation_status(
+                    image_ids, AnnotationStatus.Success, AnnotationStatus.Queued
+                )
+                == []
+            )
+
+            first = ImageRepo.transition_annotation_status(
+                None, AnnotationStatus.Queued, AnnotationStatus.Fail, limit=1
+            )
+            second = ImageRepo.transition_annotation_status(
+                None, AnnotationStatus.Queued, AnnotationStatus.Fail, limit=1
+            )
+            assert set(first + second) == set(image_ids)
+
+            assert ImageRepo.transition_annotation_status(
+                [new_image.id], AnnotationStatus.Processing, AnnotationStatus.Queued
+            ) == [new_image.id]
+            assert ImageRepo.complete_annotation(
+                {new_image.id: [new_annotation.id], image_ids[0]: [new_annotation.id]}
+            ) == [new_image.id]
+            db.session.expire_all()
+            image = ImageRepo.get(new_image.id)
+            assert image.annotation_status == AnnotationStatus.Success.value
+            assert [annotation.id for annotation in image.annotations] == [
+                new_annotation.id
+            ]
+        finally:
+            for image_id in image_ids:
+                ImageRepo.delete(image_id)
@@ -0,0 +1,44 @@
+from app.repos.image_commenter import ImageCommenterRepo
+from app.repos.user import UserRepo
+from app.services.core_services import db
+
+
+class TestImageCommenterRepo:
+    def test_increment_and_decrement(self, new_user, new_image):
+        assert ImageCommenterRepo.increment(new_image.id, new_user.id) == 1
+        assert ImageCommenterRepo.increment(new_image.id, new_user.id) == 2
+
+        assert ImageCommenterRepo.decrement(new_image.id, new_user.id) == 1
+        assert ImageCommenterRepo.decrement(new_image.id, new_user.id) == 0
+        assert ImageCommenterRepo.get(new_image.id, new_user.id) is None
+
+    def test_decrement_missing_commenter(self, new_user, new_image):
+        assert ImageCommenterRepo.decrement(new_image.id, new_user.id) == 0
+
+    def test_rebuild_for_image(self, new_comment):
+        users_commented_count = ImageCommenterRepo.rebuild_for_image(
+            new_comment.image_id
+        )
+        assert users_commented_count == 1
+
+        commenter = ImageCommenterRepo.get(new_comment.image_id, new_comment.user_id)
+        assert commenter.comment_count == 1
+
+    def test_rebuild_for_images_overwrites_existing_rows(self, new_comment):
+        image_id, user_id = new_comment.image_id, new_comment.user_id
+        ImageCommenterRepo.increment(image_id, user_id)
+        ImageCommenterRepo.increment(image_id, user_id)
+        other_user = UserRepo.create(
+            username="former_commenter",
+            email="former_commenter@example.com",
+            password="password",
+        )
+        # A commenter whose comments are gone
+        ImageCommenterRepo.increment(image_id, other_user.id)
+
+        assert ImageCommenterRepo.rebuild_for_images([image_id]) == {image_id: 1}
+
+        db.session.expire_all()
+        assert ImageCommenterRepo.get(image_id, user_id).comment_count == 1
+        assert ImageCommenterRepo.get(image_id, other_user.id) is None
+        UserRepo.delete(other_user.id)
@@ -0,0 +1,60 @@
+import pytest
+
+from app.repos.image import ImageRepo
+from app.repos.image_filename import ImageFilenameRepo
+
+
+class TestImageFilenameRepo:
+    @pytest.fixture
+    def created_ids(self):
+        image_ids = []
+        yield image_ids
+        for image_id in image_ids:
+            ImageRepo.delete(image_id)
+
+    def create(self, user_id, filename, created_ids):
+        image = ImageRepo.create(user_id=user_id, filename=filename)
+        created_ids.append(image.id)
+        return image
+
+    def test_taken_filenames_get_the_next_suffix(self, new_user, created_ids):
+        filenames = [
+            self.create(new_user.id, "photo.jpg", created_ids).filename
+            for _ in range(3)
+        ]
+        assert filenames == ["photo.jpg", "photo_1.jpg", "photo_2.jpg"]
+
+        allocated = ImageFilenameRepo.allocate(
+            new_user.id, ["photo.jpg", "new.jpg", "photo.jpg", "new.jpg"]
+        )
+        assert allocated == ["photo_3.jpg", "new.jpg", "photo_4.jpg", "new_1.jpg"]
+
+    def test_suffixes_taken_by_uploads_are_skipped(self, new_user, created_ids):
+        self.create(new_user.id, "scan.png", created_ids)
+        self.create(new_user.id, "scan_1.png", created_ids)
+
+        image = self.create(new_user.id, "scan.png", created_ids)
+        assert image.filename == "scan_2.png"
+
+    def test_rename_to_own_filename(self, new_user, created_ids):
+        image = self.create(new_user.id, "mine.jpg", created_ids)
+        other = self.create(new_user.id, "other.jpg", created_ids)
+
+        assert ImageRepo.update(image.id, filename="mine.jpg").filename == "mine.jpg"
+        assert ImageRepo.update(other.id, filename="mine.jpg").filename == "mine_1.jpg"
+
+    def test_filename_taken_concurrently_is_retried(
+        self, new_user, created_ids, monkeypatch
+    ):
+        self.create(new_user.id, "race.jpg", created_ids)
+        get_taken = ImageFilenameRepo.get_taken
+        calls = []
+
+        def miss_first_lookup(*args, **kwargs):
+            # As if the other image was inserted right after the lookup
+            calls.append(args)
+            return set() if len(calls) == 1 else get_taken(*args, **kwargs)
+
+        monkeypatch.setattr(ImageFilenameRepo, "get_taken", miss_first_lookup)
+        image = self.create(new_user.id, "race.jpg", created_ids)
+        assert image.filename == "race_1.jpg"
@@ -1,4 +1,6 @@
+from app.models.image_summary import ImageSummary
 from app.repos.image_summary import ImageSummaryRepo
+from app.services.core_services import db
 
 
 class TestImageSummaryRepo:
@@ -46,3 +48,48 @@ class TestImageSummaryRepo:
         summary_id = new_image_summary.id
         assert ImageSummaryRepo.delete(summary_id) is True
         assert ImageSummaryRepo.get_by_id(summary_id) is None
+
+    def test_bulk_upsert_skips_summaries_changed_since_read(self, new_image):
+        image_id = new_image.id
+        ImageSummaryRepo.apply_comment_delta(image_id, 1, 10, 1)
+        comment_revision = ImageSummaryRepo.get_comment_revisions([image_id])[image_id]
+        # A comment written while the summary is computed
+        ImageSummaryRepo.apply_comment_delta(image_id, 1, 5, 0)
+
+        summary = {
+            "image_id": image_id,
+            "comment_count": 1,
+            "total_comment_length": 10,
+            "comment_revision": comment_revision,
+        }
+        assert ImageSummaryRepo.bulk_upsert([summary]) == []
+        db.session.expire_all()
+        image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        assert image_summary.comment_count == 2
+        assert image_summary.is_summary_stale
+
+        summary["comment_revision"] = comment_revision + 1
+        assert ImageSummaryRepo.bulk_upsert([summary]) == [image_id]
+        db.session.expire_all()
+        image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        assert image_summary.comment_count == 1
+        assert not image_summary.is_summary_stale
+        ImageSummaryRepo.delete(image_summary.id)
+
+    def test_apply_comment_delta_rounds_average_like_rebuild(self, new_image):
+        image_id = new_image.id
+        ImageSummaryRepo.apply_comment_delta(image_id, 1, 3, 1)
+        ImageSummaryRepo.apply_comment_delta(image_id, 1, 4, 0)
+        db.session.expire_all()
+        image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        assert image_summary.average_comment_length == 4
+        assert ImageSummary.get_average_comment_length(7, 2) == 4
+
+        # The comment of length 4 is replaced by one of length 2
+        ImageSummaryRepo.apply_comment_delta(image_id, -1, -4, 0)
+        ImageSummaryRepo.apply_comment_delta(image_id, 1, 2, 0)
+        db.session.expire_all()
+        image_summary = ImageSummaryRepo.get_by_image_id(image_id)
+        assert image_summary.average_comment_length == 3
+        assert ImageSummary.get_average_comment_length(5, 2) == 3
+        ImageSummaryRepo.delete(image_summary.id)
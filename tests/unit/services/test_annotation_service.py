@@ -1,34 +1,103 @@
-from unittest.mock import MagicMock, patch
-from uuid import uuid4
+import io
+from unittest.mock import patch
+
+import pytest
 
 from app.enums import AnnotationStatus
-from app.errors import ImageNotFound
+from app.repos.image import ImageRepo
 from app.services.annotation_service import AnnotationService
+from app.services.annotator import BatchAnnotator, RandomAnnotator, load_annotator
+from app.services.blob_store import BlobStore
+from app.services.core_services import db
+from app.services.image_service import ImageService
+
+
+class FixedAnnotator(BatchAnnotator):
+    def __init__(self, names, error=None):
+        self.names = names
+        self.error = error
+        self.batches = []
+
+    def annotate(self, images, vocabulary):
+        self.batches.append(list(images))
+        if self.error:
+            raise self.error
+        return [self.names for _ in images]
 
 
 class TestAnnotationService:
-    @patch("app.repos.image.ImageRepo.get_by_id")
-    @patch("app.repos.annotation.AnnotationRepo.get_all")
-    @patch("app.repos.image.ImageRepo.update")
-    def test_simulate_annotation_queued(
-        self,
-        mock_update,
-        mock_get_all_annotations,
-        mock_get_by_id,
-        new_user,
-        new_annotation,
-        new_image,
-    ):
-        mock_user_id = new_user.id
-
-        mock_image = MagicMock()
-        mock_image.annotation_status = AnnotationStatus.Queued.value
-        mock_get_by_id.return_value = mock_image
-
-        mock_get_all_annotations.return_value = [new_annotation]
-
-        AnnotationService.simulate_annotation(new_image.id, mock_user_id)
-
-        mock_update.assert_called_once_with(
-            image_id=new_image.id, annotation_status=AnnotationStatus.Processing
+    @pytest.fixture
+    def image_ids(self, app, new_user, tmp_path, monkeypatch):
+        """A JPEG image and an image whose content is not an image."""
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            contents = [image_file.read(), b"not an image"]
+        created = ImageService.create_images(
+            new_user.id,
+            [
+                (f"batch_{index}.jpg", BlobStore.put_stream(io.BytesIO(content)))
+                for index, content in enumerate(contents)
+            ],
         )
+        image_ids = [image_id for image_id, _ in created]
+        yield image_ids
+        for image_id in image_ids:
+            ImageService.delete_image(image_id)
+
+    def test_annotate_batch(self, image_ids, new_image, new_annotation):
+        annotator = FixedAnnotator([new_annotation.name])
+
+        with patch.object(AnnotationService, "annotator", annotator):
+            result = AnnotationService.annotate_batch(image_ids + [new_image.id])
+
+        assert result.annotated == image_ids[:1]
+        assert set(result.failed) == {image_ids[1], new_image.id}
+        assert result.skipped == []
+        # Prepared on the pool, and annotated in one batch
+        assert [len(batch) for batch in annotator.batches] == [1]
+        assert len(annotator.batches[0][0]) == 224 * 224 * 3
+
+        db.session.expire_all()
+        annotated = ImageRepo.get(image_ids[0])
+        undecodable = ImageRepo.get(image_ids[1])
+        assert annotated.annotation_status == AnnotationStatus.Success.value
+        assert [annotation.name for annotation in annotated.annotations] == [
+            new_annotation.name
+        ]
+        assert undecodable.annotation_status == AnnotationStatus.Processing.value
+
+    def test_annotate_batch_failing_annotator(self, image_ids):
+        annotator = FixedAnnotator([], error=RuntimeError("boom"))
+
+        with patch.object(AnnotationService, "annotator", annotator):
+            result = AnnotationService.annotate_batch(image_ids[:1])
+
+        assert result.annotated == []
+        assert "boom" in result.failed[image_ids[0]]
+
+    def test_annotate_batch_unknown_annotation(self, image_ids):
+        with patch.object(AnnotationService, "annotator", FixedAnnotator(["?"])):
+            result = AnnotationService.annotate_batch(image_ids[:1])
+
+        assert "Unknown annotations" in result.failed[image_ids[0]]
+
+    def test_annotate_batch_skips_annotated_image(self, image_ids):
+        ImageRepo.transition_annotation_status(
+            image_ids[:1], AnnotationStatus.Success, AnnotationStatus.Queued
+        )
+
+        result = AnnotationService.annotate_batch(image_ids[:1])
+
+        assert result.skipped == image_ids[:1]
+
+    def test_random_annotator(self):
+        vocabulary = ["a", "b", "c"]
+        names = RandomAnnotator().annotate([None, None], vocabulary)
+        assert [len(image_names) for image_names in names] == [2, 2]
+        assert set(names[0]) <= set(vocabulary)
+
+    def test_load_annotator(self):
+        annotator = load_annotator("app.services.annotator:RandomAnnotator")
+        assert isinstance(annotator, RandomAnnotator)
+        with pytest.raises(TypeError):
+            load_annotator("app.services.annotator:BatchAnnotator")
@@ -0,0 +1,90 @@
+import io
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.enums import AnnotationStatus
+from app.repos.annotation_job import AnnotationJobRepo
+from app.repos.image import ImageRepo
+from app.services.annotation_service import AnnotationService
+from app.services.annotation_worker_service import AnnotationWorkerService
+from app.services.blob_store import BlobStore
+from app.services.core_services import db
+from app.services.image_service import ImageService
+from tests.unit.services.test_annotation_service import FixedAnnotator
+
+
+def wait_for_status(image_id, status, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if ImageRepo.get(image_id).annotation_status == status.value:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def wait_for_job_completed(image_id, timeout=30):
+    # The status is committed before the worker deletes the job
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if AnnotationJobRepo.get(image_id) is None:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestAnnotationWorkerService:
+    @pytest.fixture(autouse=True)
+    def workers(self, app):
+        AnnotationWorkerService.start(app)
+        yield
+        AnnotationWorkerService.shutdown()
+
+    def test_uploaded_images_are_annotated(
+        self, app, new_user, new_annotation, tmp_path, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            content = image_file.read()
+        annotator = FixedAnnotator([new_annotation.name])
+
+        with patch.object(AnnotationService, "annotator", annotator):
+            created = ImageService.create_images(
+                new_user.id,
+                [
+                    (f"worker_{index}.jpg", BlobStore.put_stream(io.BytesIO(content)))
+                    for index in range(3)
+                ],
+            )
+            try:
+                for image_id, _ in created:
+                    assert wait_for_status(image_id, AnnotationStatus.Success)
+                    assert wait_for_job_completed(image_id)
+            finally:
+                for image_id, _ in created:
+                    ImageService.delete_image(image_id)
+
+    def test_failing_image_is_retried_until_it_fails(self, app, new_image):
+        # The image has no content, so every attempt fails
+        with patch.object(AnnotationWorkerService, "max_attempts", 2):
+            AnnotationWorkerService.enqueue([new_image.id])
+            assert wait_for_status(new_image.id, AnnotationStatus.Fail)
+
+        assert wait_for_job_completed(new_image.id)
+
+    def test_workers_start_with_first_request(self, app, client, monkeypatch):
+        AnnotationWorkerService.shutdown()
+        assert AnnotationWorkerService._threads == []
+
+        client.get("/annotation/annotations")
+        assert AnnotationWorkerService._threads == []
+
+        monkeypatch.setitem(app.config, "ANNOTATION_WORKER_ENABLED", True)
+        client.get("/annotation/annotations")
+        assert all(thread.is_alive() for thread in AnnotationWorkerService._threads)
+        assert len(AnnotationWorkerService._threads) == (
+            app.config["ANNOTATION_WORKER_POOL_SIZE"] + 1
+        )
@@ -0,0 +1,108 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from app.errors import InvalidArchive
+from app.services.archive_stream import iter_tar_entries, iter_zip_entries
+
+
+class UnseekableStream(io.RawIOBase):
+    """A request body: read front to back, in pieces of any size."""
+
+    def __init__(self, data: bytes, piece_size: int = 7):
+        self._data = io.BytesIO(data)
+        self._piece_size = piece_size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(min(len(buffer), self._piece_size))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def write(self, data):
+        raise io.UnsupportedOperation
+
+
+class UnseekableWriter(io.RawIOBase):
+    """Makes zipfile write data descriptors, like streaming zippers do."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+FILES = {
+    "a.jpg": b"a" * 1000,
+    "folder/b.png": bytes(range(256)) * 50,
+    "empty.jpg": b"",
+}
+
+
+def read_entries(entries):
+    return {entry.name: b"".join(entry.chunks) for entry in entries}
+
+
+def make_zip(compression=zipfile.ZIP_DEFLATED, streamed=False) -> bytes:
+    target = UnseekableWriter() if streamed else io.BytesIO()
+    with zipfile.ZipFile(target, "w", compression=compression) as archive:
+        archive.mkdir("folder")
+        for name, content in FILES.items():
+            archive.writestr(name, content)
+    return (target.buffer if streamed else target).getvalue()
+
+
+class TestArchiveStream:
+    @pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+    def test_zip_entries(self, compression):
+        entries = iter_zip_entries(UnseekableStream(make_zip(compression)), 64)
+        assert read_entries(entries) == FILES
+
+    def test_streamed_zip_entries(self):
+        data = make_zip(streamed=True)
+        assert read_entries(iter_zip_entries(UnseekableStream(data), 64)) == FILES
+
+    def test_unread_zip_entries_are_skipped(self):
+        entries = iter_zip_entries(UnseekableStream(make_zip(streamed=True)), 64)
+        assert [entry.name for entry in entries] == list(FILES)
+
+    def test_corrupt_zip_entry(self):
+        data = make_zip(zipfile.ZIP_STORED).replace(b"a" * 10, b"x" * 10, 1)
+        with pytest.raises(InvalidArchive, match="CRC"):
+            read_entries(iter_zip_entries(UnseekableStream(data)))
+
+    def test_not_a_zip(self):
+        with pytest.raises(InvalidArchive, match="Not a zip archive"):
+            read_entries(iter_zip_entries(UnseekableStream(b"GIF89a" * 10)))
+
+    def test_truncated_zip(self):
+        data = make_zip()
+        with pytest.raises(InvalidArchive):
+            read_entries(iter_zip_entries(UnseekableStream(data[: len(data) // 2])))
+
+    @pytest.mark.parametrize("mode", ["w", "w:gz"])
+    def test_tar_entries(self, mode):
+        target = io.BytesIO()
+        with tarfile.open(fileobj=target, mode=mode) as archive:
+            directory = tarfile.TarInfo("folder")
+            directory.type = tarfile.DIRTYPE
+            archive.addfile(directory)
+            for name, content in FILES.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+
+        entries = iter_tar_entries(UnseekableStream(target.getvalue()), 64)
+        assert read_entries(entries) == FILES
+
+    def test_not_a_tar(self):
+        with pytest.raises(InvalidArchive):
+            read_entries(iter_tar_entries(UnseekableStream(b"GIF89a" * 100)))
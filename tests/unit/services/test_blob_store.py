@@ -0,0 +1,138 @@
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.repos.image import ImageRepo
+from app.repos.image_blob import ImageBlobRepo
+from app.repos.user import UserRepo
+from app.services.blob_store import BlobStore
+from app.services.image_service import ImageService
+from app.services.pack_store import PackStore
+
+
+class NonSeekableStream(io.RawIOBase):
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._stream.readinto(buffer)
+
+
+class TestBlobStore:
+    @pytest.fixture(autouse=True)
+    def upload_folder(self, app, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        return tmp_path
+
+    @pytest.fixture
+    def images(self, new_user):
+        images = [
+            ImageRepo.create(user_id=new_user.id, filename=f"meme_{index}.jpg")
+            for index in range(2)
+        ]
+        yield images
+        for image in images:
+            ImageService.delete_image(image.id)
+
+    def save(self, image, data: bytes) -> str:
+        uploaded_file = FileStorage(stream=io.BytesIO(data), filename=image.filename)
+        return ImageService.save_image(uploaded_file, image.user, image.filename)
+
+    def test_duplicate_content_is_stored_once(self, images):
+        first_path = self.save(images[0], b"same bytes")
+        second_path = self.save(images[1], b"same bytes")
+
+        sha256 = ImageRepo.get(images[0].id).blob_sha256
+        assert ImageRepo.get(images[1].id).blob_sha256 == sha256
+        assert ImageBlobRepo.get(sha256).ref_count == 2
+        blob_path = BlobStore.get_blob_path(sha256)
+        assert os.stat(first_path).st_ino == os.stat(blob_path).st_ino
+        assert os.stat(second_path).st_ino == os.stat(blob_path).st_ino
+        assert os.listdir(os.path.dirname(blob_path)) == [sha256]
+
+    def test_deleting_last_image_collects_blob(self, images):
+        self.save(images[0], b"shared")
+        self.save(images[1], b"shared")
+        sha256 = ImageRepo.get(images[0].id).blob_sha256
+
+        assert ImageService.delete_image(images[0].id)
+        assert ImageBlobRepo.get(sha256).ref_count == 1
+        assert os.path.exists(BlobStore.get_blob_path(sha256))
+
+        assert ImageService.delete_image(images[1].id)
+        assert ImageBlobRepo.get(sha256) is None
+        assert not os.path.exists(BlobStore.get_blob_path(sha256))
+
+    def test_deleting_user_images_collects_blobs(self, app):
+        user = UserRepo.create(
+            username="leaving_user", email="leaving@example.com", password="password"
+        )
+        image = ImageRepo.create(user_id=user.id, filename="leaving.jpg")
+        self.save(image, b"leaving")
+        sha256 = ImageRepo.get(image.id).blob_sha256
+
+        assert ImageService.delete_user_images(user.id) == 1
+        assert UserRepo.delete(user.id)
+        assert ImageBlobRepo.get(sha256) is None
+        assert not os.path.exists(BlobStore.get_blob_path(sha256))
+
+    def test_replacing_content_releases_previous_blob(self, images):
+        self.save(images[0], b"before")
+        previous_sha256 = ImageRepo.get(images[0].id).blob_sha256
+
+        file_path = self.save(images[0], b"after")
+        assert ImageBlobRepo.get(previous_sha256) is None
+        with open(file_path, "rb") as image_file:
+            assert image_file.read() == b"after"
+
+    def test_non_seekable_stream(self, upload_folder):
+        blob = BlobStore.put_stream(NonSeekableStream(b"streamed"))
+        assert blob.size == 8
+        with open(BlobStore.get_blob_path(blob.sha256), "rb") as blob_file:
+            assert blob_file.read() == b"streamed"
+
+        assert BlobStore.put_stream(NonSeekableStream(b"streamed")) == blob
+        assert ImageBlobRepo.get(blob.sha256).ref_count == 2
+        assert os.listdir(upload_folder / ".blobs" / "tmp") == []
+
+        assert not BlobStore.release(blob.sha256)
+        assert BlobStore.release(blob.sha256)
+
+    def test_small_blobs_are_packed(self, images, upload_folder, monkeypatch):
+        monkeypatch.setattr(BlobStore, "pack_max_bytes", 16)
+        file_path = self.save(images[0], b"small")
+        self.save(images[1], b"small")
+
+        image = ImageRepo.get(images[0].id)
+        assert not os.path.exists(file_path)
+        assert not os.path.exists(BlobStore.get_blob_path(image.blob_sha256))
+        assert ImageService.get_image_source(image) == b"small"
+        assert ImageBlobRepo.get(image.blob_sha256).ref_count == 2
+        pack_folder = BlobStore.get_pack_folder()
+        assert os.path.getsize(PackStore.get_segment_path(pack_folder, 0)) == 5
+
+        large_path = self.save(images[1], b"larger than sixteen bytes")
+        with open(large_path, "rb") as image_file:
+            assert image_file.read() == b"larger than sixteen bytes"
+
+    def test_compact_packs(self, images, new_user, monkeypatch):
+        monkeypatch.setattr(BlobStore, "pack_max_bytes", 16)
+        monkeypatch.setattr(BlobStore, "COMPACT_MIN_AGE_SECONDS", 0)
+        monkeypatch.setattr(PackStore, "segment_bytes", 12)
+        dropped_image = ImageRepo.create(user_id=new_user.id, filename="dropped.jpg")
+        self.save(images[0], b"kept")
+        self.save(dropped_image, b"dropped")
+        self.save(images[1], b"newest")
+        pack_folder = BlobStore.get_pack_folder()
+        assert PackStore.get_segments(pack_folder) == [0, 1]
+
+        ImageService.delete_image(dropped_image.id)
+        assert BlobStore.compact_packs(min_dead_ratio=0.5) == (1, 7)
+        assert PackStore.get_segments(pack_folder) == [1]
+        assert ImageService.get_image_source(ImageRepo.get(images[0].id)) == b"kept"
+        assert ImageService.get_image_source(ImageRepo.get(images[1].id)) == b"newest"
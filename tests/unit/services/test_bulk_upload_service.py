@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from app.errors import InvalidArchive
+from app.repos.image import ImageRepo
+from app.services.archive_stream import ArchiveEntry
+from app.services.blob_store import BlobStore
+from app.services.bulk_upload_service import BulkUploadService
+from app.services.image_service import ImageService
+
+
+def make_entries(files):
+    return [ArchiveEntry(name, iter([content])) for name, content in files]
+
+
+class TestBulkUploadService:
+    @pytest.fixture
+    def upload_folder(self, app, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(BulkUploadService, "batch_size", 2)
+        return tmp_path
+
+    @pytest.fixture
+    def image_bytes(self) -> bytes:
+        with open("tests/data/mini_car.jpg", "rb") as image_file:
+            return image_file.read()
+
+    @pytest.fixture
+    def uploaded_ids(self):
+        image_ids = []
+        yield image_ids
+        for image_id in image_ids:
+            ImageService.delete_image(image_id)
+
+    def test_upload(self, new_user, upload_folder, image_bytes, uploaded_ids):
+        report = BulkUploadService.upload(
+            new_user.id,
+            make_entries(
+                [
+                    ("car.jpg", image_bytes),
+                    ("photos/car.jpg", image_bytes),
+                    ("../", b""),
+                    ("other.jpg", b"other"),
+                ]
+            ),
+        )
+        uploaded_ids.extend(r.image_id for r in report.results if r.image_id)
+
+        assert report.error is None
+        assert [result.filename for result in report.results] == [
+            "car.jpg",
+            "car_1.jpg",
+            None,
+            "other.jpg",
+        ]
+        assert report.results[2].error == "Invalid filename"
+        first, second = ImageRepo.get(uploaded_ids[0]), ImageRepo.get(uploaded_ids[1])
+        assert first.blob_sha256 == second.blob_sha256
+        file_path = ImageService.get_image_file_path(new_user.id, "car_1.jpg")
+        with open(file_path, "rb") as image_file:
+            assert image_file.read() == image_bytes
+
+    def test_large_files_are_spooled_to_disk(
+        self, new_user, upload_folder, image_bytes, uploaded_ids, monkeypatch
+    ):
+        monkeypatch.setattr(BulkUploadService, "spool_bytes", 100)
+        monkeypatch.setattr(BulkUploadService, "max_bytes", len(image_bytes))
+        chunks = [image_bytes[i : i + 64] for i in range(0, len(image_bytes), 64)]
+        entries = [
+            ArchiveEntry("spooled.jpg", iter(chunks)),
+            ArchiveEntry("large.jpg", iter([image_bytes, b"!"])),
+        ]
+
+        report = BulkUploadService.upload(new_user.id, entries)
+        uploaded_ids.extend(r.image_id for r in report.results if r.image_id)
+
+        assert report.results[0].filename == "spooled.jpg"
+        assert report.results[1].error == "Image is too large"
+        image = ImageRepo.get(report.results[0].image_id)
+        with open(BlobStore.get_blob_path(image.blob_sha256), "rb") as blob_file:
+            assert blob_file.read() == image_bytes
+        assert os.listdir(os.path.join(BlobStore.get_blob_folder(), "tmp")) == []
+
+    def test_invalid_archive_keeps_stored_files(
+        self, new_user, upload_folder, image_bytes, uploaded_ids
+    ):
+        def entries():
+            yield ArchiveEntry("before.jpg", iter([image_bytes]))
+            raise InvalidArchive("Unexpected end of archive")
+
+        report = BulkUploadService.upload(new_user.id, entries())
+        uploaded_ids.extend(r.image_id for r in report.results if r.image_id)
+
+        assert report.error == "Invalid archive: Unexpected end of archive"
+        assert [result.filename for result in report.results] == ["before.jpg"]
@@ -0,0 +1,105 @@
+import time
+from unittest.mock import patch
+
+from app.services.comment_summarizer import CommentSummarizer
+
+TEXT = (
+    "The lighting is great. The lighting is great. "
+    "I love the colours of the sky. The boat in the corner is distracting. "
+    "Great composition overall."
+)
+
+
+class TestCommentSummarizer:
+    def test_summarize_empty_text(self):
+        result = CommentSummarizer.summarize("")
+        assert result.summary == ""
+        assert result.strategy == CommentSummarizer.STRATEGY_EMPTY
+
+    def test_summarize_with_lsa(self):
+        result = CommentSummarizer.summarize(TEXT)
+        assert result.strategy == CommentSummarizer.STRATEGY_LSA
+        assert result.summary.count("The lighting is great.") <= 1
+
+    def test_deduplicate(self):
+        sentences = ["Nice shot.", "nice   SHOT.", "Love it."]
+        assert CommentSummarizer._deduplicate(sentences) == ["Nice shot.", "Love it."]
+
+    @patch.object(CommentSummarizer, "max_sentences", 2)
+    def test_summarize_samples_recent_sentences(self):
+        with patch.object(CommentSummarizer, "sampling", "recent"):
+            sampled = CommentSummarizer._sample(["a.", "bbb.", "cc.", "d."])
+            assert sampled == ["cc.", "d."]
+        with patch.object(CommentSummarizer, "sampling", "longest"):
+            sampled = CommentSummarizer._sample(["a.", "bbb.", "cc.", "d."])
+            assert sampled == ["bbb.", "cc."]
+
+        result = CommentSummarizer.summarize(TEXT)
+        assert result.strategy == CommentSummarizer.STRATEGY_LSA_SAMPLED
+
+    @patch.object(CommentSummarizer, "time_budget_seconds", 0.05)
+    def test_summarize_falls_back_when_over_budget(self):
+        def slow_lsa_summary(sentences):
+            time.sleep(0.5)
+            return ""
+
+        with patch.object(CommentSummarizer, "_lsa_summary", slow_lsa_summary):
+            result = CommentSummarizer.summarize(TEXT)
+
+        assert result.strategy == CommentSummarizer.STRATEGY_FREQUENCY
+        assert result.summary
+
+    @patch.object(CommentSummarizer, "time_budget_seconds", 0.05)
+    @patch.object(CommentSummarizer, "lsa_workers", 1)
+    def test_runs_over_budget_do_not_pile_up(self, monkeypatch):
+        monkeypatch.setattr(CommentSummarizer, "_executor", None)
+        started = []
+
+        def slow_lsa_summary(sentences):
+            started.append(sentences)
+            time.sleep(0.5)
+            return ""
+
+        with patch.object(CommentSummarizer, "_lsa_summary", slow_lsa_summary):
+            for _ in range(3):
+                result = CommentSummarizer.summarize(TEXT)
+                assert result.strategy == CommentSummarizer.STRATEGY_FREQUENCY
+            CommentSummarizer._executor.shutdown(wait=True)
+
+        # The runs queued behind the first one were cancelled
+        assert len(started) == 1
+
+    def test_fingerprint(self):
+        fingerprint = CommentSummarizer.fingerprint(["Nice shot.", "Love it."])
+        assert fingerprint == CommentSummarizer.fingerprint(["Nice shot.", "Love it."])
+        assert fingerprint != CommentSummarizer.fingerprint(["Love it.", "Nice shot."])
+        assert fingerprint != CommentSummarizer.fingerprint(["Nice shot.Love it."])
+
+    def test_summarize_comments_is_memoized(self):
+        CommentSummarizer.clear_cache()
+        bodies = ["I love the colours of the sky.", "Great composition overall."]
+
+        with patch.object(
+            CommentSummarizer, "summarize", wraps=CommentSummarizer.summarize
+        ) as mock_summarize:
+            result, fingerprint = CommentSummarizer.summarize_comments(bodies)
+            cached_result, _ = CommentSummarizer.summarize_comments(bodies)
+            stored_result, _ = CommentSummarizer.summarize_comments(
+                ["Changed."], stored_result=(fingerprint, result)
+            )
+            assert mock_summarize.call_count == 2
+
+        assert cached_result == result
+        assert stored_result != result
+        stats = CommentSummarizer.cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["size"] == 2
+
+    @patch.object(CommentSummarizer, "cache_size", 1)
+    def test_summarize_comments_evicts_least_recently_used(self):
+        CommentSummarizer.clear_cache()
+        CommentSummarizer.summarize_comments(["First comment."])
+        CommentSummarizer.summarize_comments(["Second comment."])
+
+        assert CommentSummarizer.cache_stats()["size"] == 1
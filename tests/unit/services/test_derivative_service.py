@@ -0,0 +1,75 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image as PilImage
+
+from app.services import derivative_service
+from app.services.derivative_service import DerivativeService, render_derivatives
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = tmp_path / "car.jpg"
+    shutil.copy("tests/data/mini_car.jpg", path)
+    return str(path)
+
+
+class TestDerivativeService:
+    def test_render_derivatives(self, source_path, tmp_path):
+        targets = [
+            (16, "webp", str(tmp_path / "16.webp")),
+            (32, "jpeg", str(tmp_path / "32.jpg")),
+        ]
+        render_derivatives(source_path, targets, quality=80)
+
+        with PilImage.open(source_path) as source:
+            ratio = source.width / source.height
+        for size, format_name, path in targets:
+            with PilImage.open(path) as derivative:
+                assert derivative.format == format_name.upper()
+                assert max(derivative.size) == size
+                assert derivative.width / derivative.height == pytest.approx(
+                    ratio, rel=0.1
+                )
+
+    def test_concurrent_requests_render_once(self, app, source_path, monkeypatch):
+        release = threading.Event()
+        renders = []
+
+        def render(source, targets, quality):
+            renders.append(targets)
+            release.wait(timeout=2)
+            render_derivatives(source, targets, quality)
+
+        monkeypatch.setattr(derivative_service, "render_derivatives", render)
+        monkeypatch.setattr(
+            DerivativeService, "_executor", ThreadPoolExecutor(max_workers=4)
+        )
+        image = SimpleNamespace(blob_sha256=None)
+
+        paths = []
+        threads = [
+            threading.Thread(
+                target=lambda: paths.append(
+                    DerivativeService.get_derivative(image, source_path, 128, "webp")
+                )
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(renders) == 1
+        assert len(paths) == 4 and len(set(paths)) == 1
+        assert os.path.exists(paths[0])
+        assert paths[0].endswith(os.path.join(".derivatives", "car.jpg", "128.webp"))
+
+        DerivativeService.get_derivative(image, source_path, 128, "webp")
+        assert len(renders) == 1
@@ -0,0 +1,156 @@
+import threading
+import time
+
+from app.services.image_summary_cache_service import (
+    ImageSummaryCacheService,
+    StaleWhileRevalidateCache,
+)
+from app.services.image_summary_service import ImageSummaryService
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestStaleWhileRevalidateCache:
+    def test_concurrent_misses_collapse_into_one_load(self):
+        loads = []
+        release = threading.Event()
+
+        def load(key):
+            loads.append(key)
+            release.wait(timeout=2)
+            return f"value-{key}"
+
+        cache = StaleWhileRevalidateCache(
+            load, load, ttl_seconds=60, max_size=10, max_workers=1
+        )
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get("image")))
+            for _ in range(8)
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            assert wait_for(lambda: cache.stats()["misses"] == 8)
+            release.set()
+            for thread in threads:
+                thread.join(timeout=2)
+        finally:
+            cache.shutdown()
+
+        assert loads == ["image"]
+        assert [entry.value for entry in results] == ["value-image"] * 8
+        assert cache.get("image").value == "value-image"
+        assert cache.stats()["hits"] == 1
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        release = threading.Event()
+        refreshes = []
+
+        def revalidate(key):
+            refreshes.append(key)
+            release.wait(timeout=2)
+            return "fresh"
+
+        cache = StaleWhileRevalidateCache(
+            lambda key: "cached", revalidate, ttl_seconds=60, max_size=10, max_workers=2
+        )
+        try:
+            assert cache.get("image").is_stale is False
+            cache.mark_stale("image")
+
+            for _ in range(5):
+                entry = cache.get("image")
+                assert entry.value == "cached"
+                assert entry.is_stale is True
+            assert refreshes == ["image"]
+
+            release.set()
+            assert wait_for(lambda: cache.stats()["refreshing"] == 0)
+            entry = cache.get("image")
+        finally:
+            cache.shutdown()
+
+        assert entry.value == "fresh"
+        assert entry.is_stale is False
+        assert cache.stats()["stale_hits"] == 5
+
+    def test_expired_entry_is_refreshed(self):
+        values = iter(["first", "second"])
+        cache = StaleWhileRevalidateCache(
+            lambda key: next(values),
+            lambda key: next(values),
+            ttl_seconds=0.05,
+            max_size=10,
+            max_workers=1,
+        )
+        try:
+            assert cache.get("image").value == "first"
+            time.sleep(0.1)
+            assert cache.get("image").is_stale is True
+            assert wait_for(lambda: cache.get("image").value == "second")
+        finally:
+            cache.shutdown()
+
+    def test_load_invalidated_while_running_is_not_cached(self):
+        loads = []
+
+        def load(key):
+            loads.append(key)
+            cache.invalidate(key)
+            return "value"
+
+        cache = StaleWhileRevalidateCache(
+            load, load, ttl_seconds=60, max_size=10, max_workers=1
+        )
+        try:
+            assert cache.get("image").value == "value"
+            assert cache.get("image").value == "value"
+        finally:
+            cache.shutdown()
+
+        assert loads == ["image", "image"]
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = StaleWhileRevalidateCache(
+            lambda key: key, lambda key: key, ttl_seconds=60, max_size=2, max_workers=1
+        )
+        try:
+            cache.get("a")
+            cache.get("b")
+            cache.get("a")
+            cache.get("c")
+        finally:
+            cache.shutdown()
+
+        assert cache.stats()["size"] == 2
+        assert cache.stats()["misses"] == 3
+        cache.get("a")
+        assert cache.stats()["misses"] == 3
+
+
+class TestImageSummaryCacheService:
+    def test_comment_write_marks_cached_summary_stale(self, new_comment):
+        image_id = new_comment.image_id
+        ImageSummaryService.record_comment_created(
+            image_id, new_comment.user_id, new_comment.body
+        )
+        ImageSummaryService.get_fresh_image_summary(image_id)
+
+        entry = ImageSummaryCacheService.get(image_id)
+        assert entry.value.payload["comment_count"] == 1
+        assert entry.is_stale is False
+
+        ImageSummaryService.record_comment_updated(
+            image_id, new_comment.body, new_comment.body + "!"
+        )
+        entry = ImageSummaryCacheService.get(image_id)
+        assert entry.is_stale is True
+        assert entry.value.payload["comment_count"] == 1
+
+        assert wait_for(lambda: not ImageSummaryCacheService.get(image_id).is_stale)
@@ -1,9 +1,22 @@
+from unittest.mock import patch
+
+import numpy as np
+
 from app.models.image_summary import ImageSummary
+from app.repos.comment import CommentRepo
 from app.repos.image_summary import ImageSummaryRepo
 from app.services.image_summary_service import ImageSummaryService
 
 
 class TestImageSummaryService:
+    @patch("nltk.download")
+    def test_initialize_does_not_download(self, mock_download, app):
+        ImageSummaryService._checked_nltk_data_dir = None
+        ImageSummaryService.initialize(app)
+
+        mock_download.assert_not_called()
+        assert ImageSummaryService.resource_load_seconds is not None
+
     def test_generate_summary(self):
         text = "This is a test comment. It contains some random text."
         summary = ImageSummaryService.generate_summary(text)
@@ -25,3 +38,94 @@ class TestImageSummaryService:
         assert isinstance(image_summary, ImageSummary)
 
         ImageSummaryRepo.delete(image_summary.id)
+
+    def test_record_comment_lifecycle(self, new_user, new_image):
+        first = CommentRepo.create("Lovely colours.", new_user.id, new_image.id)
+        ImageSummaryService.record_comment_created(
+            new_image.id, new_user.id, first.body
+        )
+        second = CommentRepo.create("Great shot!", new_user.id, new_image.id)
+        ImageSummaryService.record_comment_created(
+            new_image.id, new_user.id, second.body
+        )
+
+        image_summary = ImageSummaryRepo.get_by_image_id(new_image.id)
+        assert image_summary.comment_count == 2
+        assert image_summary.total_comment_length == 26
+        assert image_summary.average_comment_length == 13
+        assert image_summary.users_commented_count == 1
+        assert image_summary.is_summary_stale
+
+        CommentRepo.update(second.id, "Great shot, really!")
+        ImageSummaryService.record_comment_updated(
+            new_image.id, "Great shot!", "Great shot, really!"
+        )
+        CommentRepo.delete(first.id)
+        ImageSummaryService.record_comment_deleted(
+            new_image.id, new_user.id, "Lovely colours."
+        )
+
+        image_summary = ImageSummaryRepo.get_by_image_id(new_image.id)
+        assert image_summary.comment_count == 1
+        assert image_summary.average_comment_length == 19
+        assert image_summary.users_commented_count == 1
+
+        CommentRepo.delete(second.id)
+        ImageSummaryService.record_comment_deleted(
+            new_image.id, new_user.id, "Great shot, really!"
+        )
+
+        image_summary = ImageSummaryRepo.get_by_image_id(new_image.id)
+        assert image_summary.comment_count == 0
+        assert image_summary.average_comment_length == 0
+        assert image_summary.users_commented_count == 0
+
+    def test_get_fresh_image_summary(self, new_comment):
+        image_id = new_comment.image_id
+        ImageSummaryService.record_comment_created(
+            image_id, new_comment.user_id, new_comment.body
+        )
+        assert ImageSummaryRepo.get_by_image_id(image_id).is_summary_stale
+
+        image_summary = ImageSummaryService.get_fresh_image_summary(image_id)
+        assert not image_summary.is_summary_stale
+        assert isinstance(image_summary.comment_summary, str)
+
+    def test_score_comment(self):
+        assert ImageSummaryService.score_comment("I love it, amazing!") > 0
+        assert ImageSummaryService.score_comment("Awful, I hate it.") < 0
+
+    def test_aggregate_sentiment(self):
+        scores = np.array([1.0, -0.5])
+        lengths = np.array([10.0, 30.0])
+
+        with patch.object(ImageSummaryService, "sentiment_aggregation", "mean"):
+            assert ImageSummaryService.aggregate_sentiment(scores, lengths) == 62
+        with patch.object(
+            ImageSummaryService, "sentiment_aggregation", "length_weighted"
+        ):
+            assert ImageSummaryService.aggregate_sentiment(scores, lengths) == 43
+        assert ImageSummaryService.aggregate_sentiment(np.array([]), np.array([])) == 50
+
+    def test_sentiment_histogram(self):
+        histogram = ImageSummaryService.sentiment_histogram(
+            np.array([-1.0, -0.1, 0.1, 0.9, 1.0]), bins=4
+        )
+        assert histogram == [1, 1, 1, 2]
+
+    def test_refresh_skips_nlp_for_unchanged_comments(self, new_comment):
+        image_id = new_comment.image_id
+        ImageSummaryService.record_comment_created(
+            image_id, new_comment.user_id, new_comment.body
+        )
+        ImageSummaryService.refresh_comment_summary(image_id)
+        assert ImageSummaryRepo.get_by_image_id(image_id).summary_fingerprint
+
+        ImageSummaryService.record_comment_updated(
+            image_id, new_comment.body, new_comment.body
+        )
+        with patch(
+            "app.services.comment_summarizer.CommentSummarizer.summarize"
+        ) as mock_summarize:
+            assert ImageSummaryService.refresh_comment_summary(image_id) is True
+            mock_summarize.assert_not_called()
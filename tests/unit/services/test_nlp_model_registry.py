@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.nlp_model_registry import NlpModelRegistry
+
+
+class TestNlpModelRegistry:
+    def test_models_are_built_once(self):
+        NlpModelRegistry.reset()
+        analyzer = NlpModelRegistry.get_sentiment_analyzer()
+        assert NlpModelRegistry.get_sentiment_analyzer() is analyzer
+        assert NlpModelRegistry.get_tokenizer() is NlpModelRegistry.get_tokenizer()
+        assert NlpModelRegistry.get_summarizer() is NlpModelRegistry.get_summarizer()
+
+    def test_concurrent_first_use_shares_one_instance(self):
+        NlpModelRegistry.reset()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            analyzers = list(
+                executor.map(
+                    lambda _: NlpModelRegistry.get_sentiment_analyzer(), range(16)
+                )
+            )
+        assert all(analyzer is analyzers[0] for analyzer in analyzers)
@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+from app.errors import NlpPoolSaturated, NlpTaskTimeout
+from app.services.image_summary_service import ImageSummaryService
+from app.services.nlp_process_pool import NlpProcessPool
+
+
+@pytest.fixture
+def process_pool(app):
+    app.config.update(
+        NLP_EXECUTION_MODE="process",
+        NLP_PROCESS_POOL_SIZE=1,
+        NLP_TASK_TIMEOUT_SECONDS=3.0,
+        NLP_MAX_PENDING_TASKS=1,
+        NLP_QUEUE_TIMEOUT_SECONDS=0.1,
+    )
+    NlpProcessPool.initialize(app)
+    yield NlpProcessPool
+    NlpProcessPool.shutdown()
+    app.config["NLP_EXECUTION_MODE"] = "inline"
+
+
+class TestNlpProcessPool:
+    def test_run_inline(self):
+        assert not NlpProcessPool.is_enabled()
+        assert NlpProcessPool.run(os.getpid) == os.getpid()
+
+    def test_run_in_worker_process(self, process_pool):
+        assert process_pool.run(os.getpid) != os.getpid()
+        scores = process_pool.run(
+            ImageSummaryService.score_comments, ["I love it!", "I hate it."]
+        )
+        assert scores[0] > 0 > scores[1]
+
+    def test_timeout_restarts_pool(self, process_pool):
+        process_pool.task_timeout_seconds = 0.5
+        with pytest.raises(NlpTaskTimeout):
+            process_pool.run(time.sleep, 5)
+
+        process_pool.task_timeout_seconds = 30.0
+        assert process_pool.run(abs, -1) == 1
+
+    def test_crashed_worker_is_recovered(self, process_pool):
+        process_pool.task_timeout_seconds = 2.0
+        with pytest.raises(NlpTaskTimeout):
+            process_pool.run(os._exit, 1)
+
+        process_pool.task_timeout_seconds = 30.0
+        assert process_pool.run(abs, -2) == 2
+
+    def test_saturated_queue(self, process_pool):
+        NlpProcessPool._slots.acquire()
+        try:
+            with pytest.raises(NlpPoolSaturated):
+                process_pool.run(abs, -1)
+        finally:
+            NlpProcessPool._slots.release()
@@ -0,0 +1,28 @@
+import pytest
+
+from app.services.pack_store import PackRef, PackStore
+
+
+class TestPackStore:
+    def test_append_and_read(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(PackStore, "segment_bytes", 8)
+        folder = str(tmp_path)
+
+        first = PackStore.append(folder, b"first")
+        assert first == PackRef(0, 0, 5)
+        assert PackStore.read(folder, first) == b"first"
+
+        # Mapped before the second record was appended
+        second = PackStore.append(folder, b"2nd")
+        assert second == PackRef(0, 5, 3)
+        assert PackStore.read(folder, second) == b"2nd"
+
+        third = PackStore.append(folder, b"third")
+        assert third == PackRef(1, 0, 5)
+        assert PackStore.get_segments(folder) == [0, 1]
+
+        assert PackStore.remove_segment(folder, 0) == 8
+        assert PackStore.get_segments(folder) == [1]
+        with pytest.raises(FileNotFoundError):
+            PackStore.read(folder, first)
+        assert PackStore.read(folder, third) == b"third"
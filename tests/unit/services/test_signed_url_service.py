@@ -0,0 +1,64 @@
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+from app.services.signed_url_service import SignedUrlService
+
+
+class TestSignedUrlService:
+    def mint(self):
+        image = SimpleNamespace(
+            id=uuid4(), user_id=uuid4(), filename="car.jpg", blob_sha256="a" * 64
+        )
+        signed_url = SignedUrlService.mint(image)
+        url = urlparse(signed_url.url)
+        query = {key: value[0] for key, value in parse_qs(url.query).items()}
+        return image, signed_url, url.path, query
+
+    def test_minted_url_verifies(self, app):
+        image, signed_url, path, query = self.mint()
+        assert path == f"/media/{image.user_id}/car.jpg"
+        assert int(query["expires"]) == signed_url.expires
+        assert signed_url.expires > time.time()
+        assert SignedUrlService.verify(image, query["expires"], query["signature"])
+
+    def test_tampered_url_is_rejected(self, app):
+        image, signed_url, _, query = self.mint()
+        renamed_image = SimpleNamespace(**{**vars(image), "filename": "other.jpg"})
+        assert not SignedUrlService.verify(
+            renamed_image, query["expires"], query["signature"]
+        )
+        assert not SignedUrlService.verify(
+            image, str(signed_url.expires + 60), query["signature"]
+        )
+        assert not SignedUrlService.verify(image, "soon", query["signature"])
+        assert not SignedUrlService.verify(image, query["expires"], None)
+
+    def test_url_of_replaced_image_is_rejected(self, app):
+        image, _, _, query = self.mint()
+        # Uploaded again under the same name, or given new content
+        new_image = SimpleNamespace(**{**vars(image), "id": uuid4()})
+        new_content = SimpleNamespace(**{**vars(image), "blob_sha256": "b" * 64})
+        for replaced_image in (new_image, new_content):
+            assert not SignedUrlService.verify(
+                replaced_image, query["expires"], query["signature"]
+            )
+
+    def test_expired_url_is_rejected(self, app):
+        image = SimpleNamespace(
+            id=uuid4(), user_id=uuid4(), filename="car.jpg", blob_sha256=None
+        )
+        expires = int(time.time()) - 1
+        signature = SignedUrlService.sign(image, expires)
+        assert not SignedUrlService.verify(image, str(expires), signature)
+
+    def test_redirect_header(self, app, monkeypatch):
+        media_path = f"{uuid4()}/car.jpg"
+        assert SignedUrlService.get_redirect_header(media_path) == {
+            "X-Accel-Redirect": f"/protected-media/{media_path}"
+        }
+
+        monkeypatch.setattr(SignedUrlService, "redirect_header", "X-Sendfile")
+        header = SignedUrlService.get_redirect_header(media_path)
+        assert header["X-Sendfile"].endswith(f"uploads/{media_path}")
@@ -0,0 +1,132 @@
+import io
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+from moto.s3 import models as moto_s3_models
+
+from app.repos.image import ImageRepo
+from app.services.blob_store import BlobStore
+from app.services.image_service import ImageService
+from app.services.storage_backend import (
+    LocalStorageBackend,
+    ObjectInfo,
+    S3StorageBackend,
+)
+
+PART_SIZE = 1024
+
+
+@pytest.fixture
+def s3_backend(monkeypatch):
+    monkeypatch.setattr(moto_s3_models, "S3_UPLOAD_PART_MIN_SIZE", PART_SIZE)
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="images")
+        yield S3StorageBackend(
+            bucket="images",
+            prefix="blobs",
+            region_name="us-east-1",
+            part_size=PART_SIZE,
+            max_concurrency=3,
+        )
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        return LocalStorageBackend(str(tmp_path), part_size=PART_SIZE)
+    return request.getfixturevalue("s3_backend")
+
+
+class TestStorageBackend:
+    def test_put_get_head_delete(self, backend):
+        assert backend.put("aa/bb/key", io.BytesIO(b"content")) == ObjectInfo(
+            "aa/bb/key", 7
+        )
+        assert backend.head("aa/bb/key") == ObjectInfo("aa/bb/key", 7)
+        with backend.get("aa/bb/key") as stream:
+            assert stream.read() == b"content"
+
+        backend.delete("aa/bb/key")
+        assert backend.head("aa/bb/key") is None
+        with pytest.raises(FileNotFoundError):
+            backend.get("aa/bb/key")
+        backend.delete("aa/bb/key")
+
+    def test_put_file_in_parts(self, backend, tmp_path):
+        content = os.urandom(PART_SIZE * 3 + 100)
+        path = tmp_path / "large.bin"
+        path.write_bytes(content)
+
+        assert backend.put_file("large", str(path)) == ObjectInfo("large", len(content))
+        assert path.read_bytes() == content
+
+        download_path = tmp_path / "downloads" / "large.bin"
+        backend.download("large", str(download_path))
+        assert download_path.read_bytes() == content
+
+    def test_multipart_upload(self, backend):
+        upload_id = backend.create_multipart_upload("parts")
+        parts = [
+            (2, backend.upload_part("parts", upload_id, 2, b"b" * 10)),
+            (1, backend.upload_part("parts", upload_id, 1, b"a" * PART_SIZE)),
+        ]
+        assert backend.complete_multipart_upload("parts", upload_id, parts).size == (
+            PART_SIZE + 10
+        )
+        with backend.get("parts") as stream:
+            assert stream.read() == b"a" * PART_SIZE + b"b" * 10
+
+        upload_id = backend.create_multipart_upload("aborted")
+        backend.upload_part("aborted", upload_id, 1, b"a")
+        backend.abort_multipart_upload("aborted", upload_id)
+        assert backend.head("aborted") is None
+
+
+class TestBlobStoreWithS3:
+    def test_blobs_are_read_back_from_s3(self, app, s3_backend, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(BlobStore, "backend", s3_backend)
+
+        blob = BlobStore.put_stream(io.BytesIO(b"remote content"))
+        key = BlobStore.get_blob_key(blob.sha256)
+        assert s3_backend.head(key).size == len(b"remote content")
+
+        # Another host has no copy of the blob yet
+        os.remove(BlobStore.get_blob_path(blob.sha256))
+        assert BlobStore.put_stream(io.BytesIO(b"remote content")) == blob
+        assert not os.path.exists(BlobStore.get_blob_path(blob.sha256))
+        assert BlobStore.get_source(blob.sha256) == BlobStore.get_blob_path(blob.sha256)
+        with open(BlobStore.get_blob_path(blob.sha256), "rb") as blob_file:
+            assert blob_file.read() == b"remote content"
+
+        BlobStore.release(blob.sha256)
+        assert BlobStore.release(blob.sha256)
+        assert s3_backend.head(key) is None
+
+    def test_images_are_read_by_blob(
+        self, app, s3_backend, new_user, tmp_path, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(BlobStore, "backend", s3_backend)
+        image = ImageRepo.create(user_id=new_user.id, filename="remote.jpg")
+        try:
+            file_path = ImageService.attach_blob(
+                new_user.id,
+                image.filename,
+                BlobStore.put_stream(io.BytesIO(b"first content")),
+            )
+            assert not os.path.exists(file_path)
+
+            # A file left at the image path by another host is not served
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as stale_file:
+                stale_file.write(b"stale content")
+            image = ImageRepo.get(image.id)
+            source = ImageService.get_image_source(image)
+            assert source == BlobStore.get_blob_path(image.blob_sha256)
+            with open(source, "rb") as blob_file:
+                assert blob_file.read() == b"first content"
+        finally:
+            ImageService.delete_image(image.id)
@@ -0,0 +1,48 @@
+import os
+import uuid
+
+import pytest
+
+from app.services.storage_layout import StorageLayout
+
+
+class TestStorageLayout:
+    @pytest.fixture
+    def upload_folder(self, app, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(StorageLayout, "shard_levels", 2)
+        return tmp_path
+
+    def test_get_relative_path(self, upload_folder):
+        user_id = uuid.uuid4()
+        relative_path = StorageLayout.get_relative_path(user_id, "../car photo.jpg")
+
+        parts = relative_path.split("/")
+        assert parts[0] == str(user_id)
+        assert all(len(shard) == 2 for shard in parts[1:3])
+        assert parts[3] == "car_photo.jpg"
+        assert relative_path == StorageLayout.get_relative_path(
+            user_id, "car photo.jpg"
+        )
+        assert StorageLayout.get_relative_path(user_id, "car.jpg", shard_levels=0) == (
+            f"{user_id}/car.jpg"
+        )
+
+    def test_resolve_and_migrate(self, upload_folder):
+        user_id = uuid.uuid4()
+        flat_path = StorageLayout.get_path(user_id, "car.jpg", shard_levels=0)
+        sharded_path = StorageLayout.get_path(user_id, "car.jpg")
+        assert StorageLayout.resolve_path(user_id, "car.jpg") == sharded_path
+
+        os.makedirs(os.path.dirname(flat_path))
+        with open(flat_path, "wb") as flat_file:
+            flat_file.write(b"car")
+        assert StorageLayout.resolve_path(user_id, "car.jpg") == flat_path
+
+        assert StorageLayout.migrate_file(user_id, "car.jpg")
+        assert not os.path.exists(flat_path)
+        assert StorageLayout.resolve_path(user_id, "car.jpg") == sharded_path
+        with open(sharded_path, "rb") as sharded_file:
+            assert sharded_file.read() == b"car"
+
+        assert not StorageLayout.migrate_file(user_id, "car.jpg")
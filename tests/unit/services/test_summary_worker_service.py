@@ -0,0 +1,88 @@
+import threading
+import time
+
+from app.services.summary_worker_service import (
+    CoalescingDispatcher,
+    SummaryWorkerService,
+)
+
+
+class TestCoalescingDispatcher:
+    def test_burst_is_coalesced_into_one_run(self):
+        calls = []
+        done = threading.Event()
+
+        def handler(key):
+            calls.append(key)
+            done.set()
+
+        dispatcher = CoalescingDispatcher(handler, debounce_seconds=0.1, max_workers=2)
+        dispatcher.start()
+        try:
+            assert dispatcher.submit("image") is False
+            for _ in range(4):
+                assert dispatcher.submit("image") is True
+            assert dispatcher.stats()["queue_depth"] == 1
+
+            assert done.wait(timeout=2)
+            time.sleep(0.2)
+        finally:
+            dispatcher.stop()
+
+        assert calls == ["image"]
+        stats = dispatcher.stats()
+        assert stats["submitted"] == 5
+        assert stats["coalesced"] == 4
+        assert stats["completed"] == 1
+        assert stats["queue_depth"] == 0
+
+    def test_event_while_running_schedules_follow_up(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def handler(key):
+            calls.append(key)
+            started.set()
+            release.wait(timeout=2)
+
+        dispatcher = CoalescingDispatcher(handler, debounce_seconds=0, max_workers=1)
+        dispatcher.start()
+        try:
+            dispatcher.submit("image")
+            assert started.wait(timeout=2)
+            dispatcher.submit("image")
+            assert dispatcher.stats()["in_flight"] == 1
+            release.set()
+
+            deadline = time.monotonic() + 2
+            while dispatcher.stats()["completed"] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            dispatcher.stop()
+
+        assert calls == ["image", "image"]
+
+    def test_handler_failure_is_counted(self):
+        done = threading.Event()
+
+        def handler(key):
+            done.set()
+            raise RuntimeError("boom")
+
+        dispatcher = CoalescingDispatcher(handler, debounce_seconds=0, max_workers=1)
+        dispatcher.start()
+        try:
+            dispatcher.submit("image")
+            assert done.wait(timeout=2)
+            time.sleep(0.05)
+        finally:
+            dispatcher.stop()
+
+        assert dispatcher.stats()["failed"] == 1
+
+
+class TestSummaryWorkerService:
+    def test_stats(self, app):
+        assert SummaryWorkerService.stats()["enabled"] is True
+        assert "queue_depth" in SummaryWorkerService.stats()
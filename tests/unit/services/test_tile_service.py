@@ -0,0 +1,126 @@
+import io
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image as PilImage
+
+from app.services.tile_service import (
+    TilePyramid,
+    TileService,
+    TileSettings,
+    build_tile_pyramid,
+)
+
+SETTINGS = TileSettings(
+    tile_size=256, overlap=1, format_name="jpeg", quality=80, max_pixels=10**8
+)
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = tmp_path / "car.jpg"
+    shutil.copy("tests/data/mini_car.jpg", path)
+    return str(path)
+
+
+class TestTilePyramid:
+    def test_geometry(self, source_path, tmp_path):
+        pyramid = TilePyramid.open(str(tmp_path / "tiles"), source_path, SETTINGS)
+        with PilImage.open(source_path) as source:
+            assert (pyramid.width, pyramid.height) == source.size
+
+        assert pyramid.get_level_size(pyramid.max_level) == source.size
+        assert pyramid.get_level_size(0) == (1, 1)
+        assert pyramid.get_grid(0) == (1, 1)
+        columns, rows = pyramid.get_grid(pyramid.max_level)
+        assert columns == -(-source.width // 256) and rows == -(-source.height // 256)
+
+        assert pyramid.get_tile_number(0, 0, 0) == 0
+        assert pyramid.get_tile_number(pyramid.max_level, columns - 1, rows - 1) == (
+            pyramid.tile_count - 1
+        )
+        assert pyramid.get_tile_number(pyramid.max_level, columns, 0) is None
+        assert pyramid.get_tile_number(pyramid.max_level + 1, 0, 0) is None
+
+        assert pyramid.get_tile_box(pyramid.max_level, 1, 1) == (255, 255, 513, 513)
+        assert 'TileSize="256" Overlap="1" Format="jpg"' in pyramid.get_descriptor()
+
+    def test_get_tile_renders_once(self, source_path, tmp_path):
+        folder = str(tmp_path / "tiles")
+        pyramid = TilePyramid.open(folder, source_path, SETTINGS)
+        tile_number = pyramid.get_tile_number(pyramid.max_level, 1, 1)
+        assert pyramid.read_tile(tile_number) is None
+
+        tile = pyramid.get_tile(pyramid.max_level, 1, 1)
+        with PilImage.open(io.BytesIO(tile)) as tile_image:
+            assert tile_image.format == "JPEG"
+            assert tile_image.size == (258, 258)
+        pack_size = os.path.getsize(os.path.join(folder, TilePyramid.PACK_FILE))
+        assert pack_size == len(tile)
+
+        reopened = TilePyramid.open(folder, source_path, SETTINGS)
+        assert reopened.read_tile(tile_number) == tile
+        assert reopened.get_tile(reopened.max_level, 1, 1) == tile
+        assert os.path.getsize(os.path.join(folder, TilePyramid.PACK_FILE)) == (
+            pack_size
+        )
+
+    def test_build(self, source_path, tmp_path):
+        folder = str(tmp_path / "tiles")
+        rendered = build_tile_pyramid(folder, source_path, SETTINGS)
+        pyramid = TilePyramid.open(folder, source_path, SETTINGS)
+        assert rendered == pyramid.tile_count
+        assert build_tile_pyramid(folder, source_path, SETTINGS) == 0
+
+        index = np.fromfile(
+            os.path.join(folder, TilePyramid.INDEX_FILE), dtype=np.int64
+        ).reshape(-1, 2)
+        assert (index[:, 1] > 0).all()
+        assert index[:, 1].sum() == os.path.getsize(
+            os.path.join(folder, TilePyramid.PACK_FILE)
+        )
+
+        with PilImage.open(io.BytesIO(pyramid.get_tile(1, 0, 0))) as tile_image:
+            assert tile_image.size == (2, 2)
+
+
+class TestTileService:
+    def test_schedule_skips_decompression_bomb(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "large.png")
+        PilImage.new("RGB", (100, 100)).save(path)
+        # Pillow refuses images with more than twice this many pixels
+        monkeypatch.setattr(PilImage, "MAX_IMAGE_PIXELS", 1000)
+        monkeypatch.setattr(TileService, "min_pixels", 0)
+        image = SimpleNamespace(id="large", blob_sha256=None)
+
+        assert TileService.schedule(image, path) is None
+
+    def test_get_tile_decodes_source_on_pool(self, source_path, tmp_path, monkeypatch):
+        build_executor = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(
+            TileService,
+            "_executors",
+            {
+                TileService.POOL_BUILD: build_executor,
+                TileService.POOL_DECODE: ThreadPoolExecutor(max_workers=1),
+            },
+        )
+        monkeypatch.setattr(TileService, "timeout_seconds", 5)
+        pyramid = TilePyramid.open(str(tmp_path / "tiles"), source_path, SETTINGS)
+        assert not pyramid.has_source()
+        # A build of another image keeps the build pool busy
+        build_done = threading.Event()
+        build_executor.submit(build_done.wait, 10)
+
+        try:
+            tile = TileService.get_tile(pyramid, pyramid.max_level, 0, 0)
+        finally:
+            build_done.set()
+
+        assert tile is not None
+        assert pyramid.has_source()
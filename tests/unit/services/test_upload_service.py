@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+from app.errors import (
+    InvalidUploadChunk,
+    TooManyUploadSessions,
+    UploadIncomplete,
+    UploadQuotaExceeded,
+    UploadSessionNotFound,
+)
+from app.repos.upload_session import UploadSessionRepo
+from app.services.upload_service import UploadService
+
+
+class TestUploadService:
+    @pytest.fixture
+    def upload_session(self, app, new_user, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+        upload_session = UploadService.create_session(
+            new_user.id, "upload.jpg", total_size=10
+        )
+        yield upload_session
+        UploadService.abort(upload_session)
+
+    def test_dropped_stream_keeps_received_bytes(self, upload_session):
+        written = UploadService.write_chunk(upload_session, 0, 6, io.BytesIO(b"abcd"))
+        assert written == 4
+
+        progress = UploadService.get_progress(upload_session)
+        assert progress.offset == 4
+        assert progress.received_bytes == 4
+
+        UploadService.write_chunk(upload_session, 4, 6, io.BytesIO(b"efghij"))
+        with open(UploadService.get_partial_file_path(upload_session), "rb") as f:
+            assert f.read() == b"abcdefghij"
+
+    def test_progress_merges_overlapping_chunks(self, upload_session):
+        UploadSessionRepo.record_chunk(upload_session.id, 0, 4)
+        UploadSessionRepo.record_chunk(upload_session.id, 2, 3)
+        UploadSessionRepo.record_chunk(upload_session.id, 7, 2)
+        UploadSessionRepo.record_chunk(upload_session.id, 0, 3)
+
+        progress = UploadService.get_progress(upload_session)
+        assert progress.offset == 5
+        assert progress.received_bytes == 7
+        assert progress.missing_ranges == [(5, 7), (9, 10)]
+
+    def test_chunk_past_the_end_is_rejected(self, upload_session):
+        with pytest.raises(InvalidUploadChunk):
+            UploadService.write_chunk(upload_session, 8, 4, io.BytesIO(b"1234"))
+
+    def test_open_sessions_are_limited(self, upload_session, new_user, monkeypatch):
+        monkeypatch.setattr(UploadService, "max_open_sessions", 1)
+        with pytest.raises(TooManyUploadSessions):
+            UploadService.create_session(new_user.id, "second.jpg", total_size=10)
+
+    def test_reserved_bytes_are_limited(self, upload_session, new_user, monkeypatch):
+        monkeypatch.setattr(UploadService, "max_reserved_bytes", 15)
+        with pytest.raises(UploadQuotaExceeded):
+            UploadService.create_session(new_user.id, "second.jpg", total_size=10)
+
+        second_session = UploadService.create_session(
+            new_user.id, "second.jpg", total_size=5
+        )
+        UploadService.abort(second_session)
+
+    def test_claimed_session_is_completed_once(self, upload_session, new_user):
+        assert UploadSessionRepo.claim(upload_session.id)
+        assert UploadSessionRepo.get_by_id(upload_session.id, new_user.id) is None
+        with pytest.raises(UploadSessionNotFound):
+            UploadService.complete(upload_session)
+
+        UploadSessionRepo.unclaim(upload_session.id)
+        assert UploadSessionRepo.get_by_id(upload_session.id, new_user.id)
+
+    def test_incomplete_upload_stays_open(self, upload_session, new_user):
+        with pytest.raises(UploadIncomplete):
+            UploadService.complete(upload_session)
+        assert UploadSessionRepo.get_by_id(upload_session.id, new_user.id)